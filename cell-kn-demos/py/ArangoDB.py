@@ -1,20 +1,192 @@
-import ast
-from glob import glob
+from collections import OrderedDict
+from copy import deepcopy
+from datetime import datetime
+from hashlib import sha1
+import json
 import os
-from traceback import print_exc
+from pathlib import Path
+import re
+import sqlite3
+from time import perf_counter
 
-from arango import ArangoClient
-import pandas as pd
-
-ARANGO_URL = "http://localhost:8529"
-ARANGO_CLIENT = ArangoClient(hosts=ARANGO_URL)
+ARANGO_URL = os.getenv("ARANGO_URL", "http://localhost:8529")
+ARANGO_USERNAME = os.getenv("ARANGO_USERNAME", "root")
 ARANGO_ROOT_PASSWORD = os.getenv("ARANGO_DB_PASSWORD", "")
-SYS_DB = ARANGO_CLIENT.db("_system", username="root", password=ARANGO_ROOT_PASSWORD)
+ARANGO_REQUEST_TIMEOUT = 60
+ARANGO_POOL_SIZE = 10
+
+# Connection settings, and the client and system database, created on
+# first use so that importing this module never touches the network
+ARANGO_CONFIG = {
+    "hosts": ARANGO_URL,
+    "username": ARANGO_USERNAME,
+    "password": ARANGO_ROOT_PASSWORD,
+    "request_timeout": ARANGO_REQUEST_TIMEOUT,
+    "pool_size": ARANGO_POOL_SIZE,
+}
+ARANGO_CONNECTION = {}
 
 DATA_DIR = "../data"
 
 NSFOREST_DIR = f"{DATA_DIR}/nsforest-2024-06-27"
 
+CHECKPOINT_DIR = f"{DATA_DIR}/checkpoints"
+
+INDEX_MAX_KEYS = 2**24
+INDEX_MAX_DOCUMENTS = 2**16
+
+BATCH_MAX_DOCUMENTS = 10000
+BATCH_MAX_SECONDS = 10
+
+# Insert each document, or merge it into an existing document with the
+# same key, taking the sorted union of the values of each attribute in
+# both documents, as an array if either value is an array, or more than
+# one distinct value results, so that the result does not depend on the
+# order of writes, as in merge_documents
+MERGE_DOCUMENTS_QUERY = """
+    FOR document IN @documents
+        UPSERT { _key: document._key }
+        INSERT document
+        UPDATE MERGE(
+            UNION(
+                [document],
+                (
+                    FOR attribute IN ATTRIBUTES(document, true)
+                        FILTER HAS(OLD, attribute)
+                        LET old_value = OLD[attribute]
+                        LET new_value = document[attribute]
+                        LET values = SORTED_UNIQUE(
+                            UNION(
+                                IS_ARRAY(old_value) ? old_value
+                                    : (old_value == null ? [] : [old_value]),
+                                IS_ARRAY(new_value) ? new_value
+                                    : (new_value == null ? [] : [new_value])
+                            )
+                        )
+                        RETURN {
+                            [attribute]: (
+                                IS_ARRAY(old_value)
+                                OR IS_ARRAY(new_value)
+                                OR LENGTH(values) > 1
+                            ) ? values : FIRST(values)
+                        }
+                )
+            )
+        )
+        IN @@collection
+"""
+
+
+def configure_connection(
+    hosts=None, username=None, password=None, request_timeout=None, pool_size=None
+):
+    """Configure the ArangoDB connection, closing any open client so
+    that the next use connects with the new settings.
+
+    Parameters
+    ----------
+    hosts : None | str
+        ArangoDB URL, or comma separated URLs
+    username : None | str
+        ArangoDB username
+    password : None | str
+        ArangoDB password
+    request_timeout : None | float
+        Seconds to wait for a response
+    pool_size : None | int
+        Maximum number of HTTP keep-alive connections per host
+
+    Returns
+    -------
+    None
+    """
+    settings = {
+        "hosts": hosts,
+        "username": username,
+        "password": password,
+        "request_timeout": request_timeout,
+        "pool_size": pool_size,
+    }
+    ARANGO_CONFIG.update({k: v for k, v in settings.items() if v is not None})
+    close_connection()
+
+
+def get_client():
+    """Get the ArangoDB client, creating it on first use.
+
+    Returns
+    -------
+    client : arango.client.ArangoClient
+        ArangoDB client
+    """
+    if "client" not in ARANGO_CONNECTION:
+        from arango import ArangoClient
+        from arango.http import DefaultHTTPClient
+
+        ARANGO_CONNECTION["client"] = ArangoClient(
+            hosts=ARANGO_CONFIG["hosts"],
+            http_client=DefaultHTTPClient(pool_maxsize=ARANGO_CONFIG["pool_size"]),
+            request_timeout=ARANGO_CONFIG["request_timeout"],
+        )
+    return ARANGO_CONNECTION["client"]
+
+
+def get_database(database_name):
+    """Get an ArangoDB database connection, without checking that the
+    database exists.
+
+    Parameters
+    ----------
+    database_name : str
+        Name of the database to get
+
+    Returns
+    -------
+    db : arango.database.StandardDatabase
+        Database
+    """
+    return get_client().db(
+        database_name,
+        username=ARANGO_CONFIG["username"],
+        password=ARANGO_CONFIG["password"],
+    )
+
+
+def get_sys_db():
+    """Get the ArangoDB system database, connecting on first use.
+
+    Returns
+    -------
+    sys_db : arango.database.StandardDatabase
+        System database
+    """
+    if "sys_db" not in ARANGO_CONNECTION:
+        ARANGO_CONNECTION["sys_db"] = get_database("_system")
+    return ARANGO_CONNECTION["sys_db"]
+
+
+def close_connection():
+    """Close the ArangoDB client, if open.
+
+    Returns
+    -------
+    None
+    """
+    client = ARANGO_CONNECTION.pop("client", None)
+    ARANGO_CONNECTION.pop("sys_db", None)
+    if client is not None:
+        client.close()
+
+
+def __getattr__(name):
+    # Create the client and system database formerly created on import
+    # on first access
+    if name == "ARANGO_CLIENT":
+        return get_client()
+    if name == "SYS_DB":
+        return get_sys_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def create_or_get_database(database_name):
     """Create or get an ArangoDB database.
@@ -30,13 +202,14 @@ def create_or_get_database(database_name):
         Database
     """
     # Create database, if needed
-    if not SYS_DB.has_database(database_name):
+    sys_db = get_sys_db()
+    if not sys_db.has_database(database_name):
         print(f"Creating ArangoDB database: {database_name}")
-        SYS_DB.create_database(database_name)
+        sys_db.create_database(database_name)
 
     # Connect to database
     print(f"Getting ArangoDB database: {database_name}")
-    db = ARANGO_CLIENT.db(database_name, username="root", password=ARANGO_ROOT_PASSWORD)
+    db = get_database(database_name)
 
     return db
 
@@ -54,9 +227,10 @@ def delete_database(database_name):
     None
     """
     # Delete database, if needed
-    if SYS_DB.has_database(database_name):
+    sys_db = get_sys_db()
+    if sys_db.has_database(database_name):
         print(f"Deleting ArangoDB database: {database_name}")
-        SYS_DB.delete_database(database_name)
+        sys_db.delete_database(database_name)
 
 
 def create_or_get_graph(db, graph_name):
@@ -205,3 +379,1138 @@ def delete_edge_collection(graph, edge_name):
     if graph.has_edge_definition(edge_name):
         print(f"Deleting graph edge definition and collection: {edge_name}")
         graph.delete_edge_definition(edge_name)
+
+
+class CollectionIndex:
+    """Wrap a vertex or edge collection with an in-process index of
+    its document keys, prefetched with one AQL query, and a write-through
+    cache of its documents, so that repeated has, and get calls during
+    a load need no network round trip.
+
+    The key index is authoritative only while complete: if the
+    collection holds more than max_keys documents, the index is
+    dropped, and has falls back to the server. Documents are cached up
+    to max_documents, least recently used first out, and get falls
+    back to the server for a known key whose document is not cached.
+    Writes which bypass the index, for example import_bulk, are not
+    tracked.
+
+    Given a batch writer, inserts and updates are buffered by the
+    writer instead of sent one by one, and the writer is flushed
+    before any fall back to the server. Inserts, and updates raise an
+    error once the writer is closed, rather than buffer documents
+    which would never be written.
+
+    Parameters
+    ----------
+    collection : arango.collection.StandardCollection
+        Vertex or edge collection to index
+    max_keys : int
+        Maximum number of keys to hold in the index
+    max_documents : int
+        Maximum number of documents to hold in the cache
+    writer : None | BatchWriter
+        Batch writer to buffer inserts and updates
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_keys=INDEX_MAX_KEYS,
+        max_documents=INDEX_MAX_DOCUMENTS,
+        writer=None,
+    ):
+        self.collection = collection
+        self.writer = writer
+        self.max_keys = max_keys
+        self.max_documents = max_documents
+        self.documents = OrderedDict()
+
+        # Prefetch all keys with a single query
+        print(f"Indexing collection keys: {collection.name}")
+        self.keys = set()
+        for key in collection.keys():
+            if len(self.keys) == max_keys:
+                print(f"Too many keys to index, using server: {collection.name}")
+                self.keys = None
+                break
+            self.keys.add(key)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def __len__(self):
+        return len(self.collection)
+
+    def has(self, document):
+        """Check if a document exists in the collection.
+
+        Parameters
+        ----------
+        document : str | dict
+            Document key, or document containing a _key or _id
+
+        Returns
+        -------
+        bool
+            True if the document exists
+        """
+        key = get_document_key(document)
+        if key in self.documents:
+            return True
+        if self.keys is not None:
+            return key in self.keys
+        self.flush()
+        return self.collection.has(key)
+
+    def get(self, document):
+        """Get a document from the cache, or the server on a miss.
+
+        Parameters
+        ----------
+        document : str | dict
+            Document key, or document containing a _key or _id
+
+        Returns
+        -------
+        None | dict
+            Copy of the document, or None if it does not exist
+        """
+        key = get_document_key(document)
+        if key in self.documents:
+            self.documents.move_to_end(key)
+            return deepcopy(self.documents[key])
+        if self.keys is not None and key not in self.keys:
+            return None
+        self.flush()
+        cached = self.collection.get(key)
+        if cached is not None:
+            self.cache_document(cached)
+        return deepcopy(cached)
+
+    def insert(self, document, **kwargs):
+        """Insert a document, and add it to the index and cache.
+
+        Parameters
+        ----------
+        document : dict
+            Document to insert
+        **kwargs
+            Keyword arguments passed to the collection insert
+
+        Returns
+        -------
+        dict
+            Document metadata, without a revision if buffered
+        """
+        if self.writer is not None:
+            self.writer.insert(self.collection, document)
+            metadata = self.get_document_metadata(document)
+        else:
+            metadata = self.collection.insert(document, **kwargs)
+        cached = deepcopy(document)
+        cached.update(metadata)
+        self.cache_document(cached)
+        return metadata
+
+    def update(self, document, **kwargs):
+        """Update a document, and its cached copy, if any.
+
+        Parameters
+        ----------
+        document : dict
+            Document containing a _key or _id, and the attributes to
+            update
+        **kwargs
+            Keyword arguments passed to the collection update
+
+        Returns
+        -------
+        dict
+            Document metadata, without a revision if buffered
+        """
+        if self.writer is not None:
+            self.writer.update(self.collection, document)
+            metadata = self.get_document_metadata(document)
+        else:
+            metadata = self.collection.update(document, **kwargs)
+        key = get_document_key(document)
+        if key in self.documents:
+            cached = self.documents[key]
+            cached.update(deepcopy(document))
+            cached.update(metadata)
+            self.documents.move_to_end(key)
+        return metadata
+
+    def delete(self, document, **kwargs):
+        """Delete a document, and remove it from the index and cache.
+
+        Parameters
+        ----------
+        document : str | dict
+            Document key, or document containing a _key or _id
+        **kwargs
+            Keyword arguments passed to the collection delete
+
+        Returns
+        -------
+        bool | dict
+            Result of the collection delete
+        """
+        self.flush()
+        result = self.collection.delete(document, **kwargs)
+        key = get_document_key(document)
+        self.documents.pop(key, None)
+        if self.keys is not None:
+            self.keys.discard(key)
+        return result
+
+    def cache_document(self, document):
+        """Add a document to the index and cache, evicting the least
+        recently used document if the cache is full.
+
+        Parameters
+        ----------
+        document : dict
+            Document containing a _key
+
+        Returns
+        -------
+        None
+        """
+        key = document["_key"]
+        if self.keys is not None:
+            self.keys.add(key)
+            if len(self.keys) > self.max_keys:
+                print(f"Too many keys to index, using server: {self.collection.name}")
+                self.keys = None
+        self.documents[key] = document
+        self.documents.move_to_end(key)
+        if len(self.documents) > self.max_documents:
+            self.documents.popitem(last=False)
+
+    def get_document_metadata(self, document):
+        """Get the key, and identifier of a buffered document.
+
+        Parameters
+        ----------
+        document : dict
+            Document containing a _key or _id
+
+        Returns
+        -------
+        dict
+            Document metadata
+        """
+        key = get_document_key(document)
+        return {"_key": key, "_id": f"{self.collection.name}/{key}"}
+
+    def flush(self):
+        """Flush any documents buffered for the collection.
+
+        Returns
+        -------
+        None
+        """
+        if self.writer is not None:
+            self.writer.flush(self.collection)
+
+
+class DocumentSet:
+    """Compile the documents to insert into, and update in a vertex
+    or edge collection in memory, deduplicated by key, so that a
+    loader can define all its documents first, then write them with a
+    few bulk requests.
+
+    The set answers has, and get from its own documents first, then
+    from the collection, which is best a CollectionIndex, so that
+    checks against documents loaded earlier need no network round
+    trip. A document inserted twice keeps its first version, as when
+    inserting only documents which do not exist.
+
+    Parameters
+    ----------
+    collection : arango.collection.StandardCollection | CollectionIndex
+        Vertex or edge collection to which the documents are written
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+        self.inserted = {}
+        self.updated = {}
+
+    def __len__(self):
+        return len(self.inserted) + len(self.updated)
+
+    def has(self, document):
+        """Check if a document exists in the set, or the collection.
+
+        Parameters
+        ----------
+        document : str | dict
+            Document key, or document containing a _key or _id
+
+        Returns
+        -------
+        bool
+            True if the document exists
+        """
+        key = get_document_key(document)
+        return key in self.inserted or self.collection.has(key)
+
+    def get(self, document):
+        """Get a document from the set, or the collection, with any
+        updates in the set applied.
+
+        Parameters
+        ----------
+        document : str | dict
+            Document key, or document containing a _key or _id
+
+        Returns
+        -------
+        None | dict
+            Copy of the document, or None if it does not exist
+        """
+        key = get_document_key(document)
+        if key in self.inserted:
+            return deepcopy(self.inserted[key])
+        document = self.collection.get(key)
+        if document is not None and key in self.updated:
+            document.update(deepcopy(self.updated[key]))
+        return document
+
+    def insert(self, document):
+        """Add a document to insert, unless its key was added.
+
+        Parameters
+        ----------
+        document : dict
+            Document to insert
+
+        Returns
+        -------
+        dict
+            Document metadata, without a revision
+        """
+        metadata = self.get_document_metadata(document)
+        if metadata["_key"] not in self.inserted:
+            inserted = deepcopy(document)
+            inserted.update(metadata)
+            self.inserted[metadata["_key"]] = inserted
+        return metadata
+
+    def update(self, document):
+        """Add attributes to update, merging them into the document to
+        insert, if the key was added.
+
+        Parameters
+        ----------
+        document : dict
+            Document containing a _key or _id, and the attributes to
+            update
+
+        Returns
+        -------
+        dict
+            Document metadata, without a revision
+        """
+        metadata = self.get_document_metadata(document)
+        key = metadata["_key"]
+        if key in self.inserted:
+            self.inserted[key].update(deepcopy(document))
+        else:
+            self.updated.setdefault(key, {}).update(deepcopy(document))
+            self.updated[key].update(metadata)
+        return metadata
+
+    def get_document_metadata(self, document):
+        """Get the key, and identifier of a document in the set.
+
+        Parameters
+        ----------
+        document : dict
+            Document containing a _key or _id
+
+        Returns
+        -------
+        dict
+            Document key, and identifier
+        """
+        key = get_document_key(document)
+        return {"_key": key, "_id": f"{self.name}/{key}"}
+
+    def write(self, writer):
+        """Buffer all inserts, without the identifier which the server
+        assigns, then all updates with a batch writer.
+
+        Parameters
+        ----------
+        writer : BatchWriter
+            Batch writer to write the documents
+
+        Returns
+        -------
+        None
+        """
+        for document in self.inserted.values():
+            writer.insert(
+                self.collection, {k: v for k, v in document.items() if k != "_id"}
+            )
+        for document in self.updated.values():
+            writer.update(self.collection, document)
+        writer.flush(self.collection)
+
+
+class BatchWriter:
+    """Buffer inserts, upserts, merges, partial updates, and deletes
+    per collection, and write each buffer in as few requests as
+    possible.
+
+    A collection buffer is flushed when it holds max_documents
+    documents, or when max_seconds have passed since its first
+    buffered document, checked as each document is buffered, and all
+    buffers are flushed on close, or discarded if the context exits
+    with an error. Buffering a document once closed raises an error.
+    Flushing preserves the order of
+    operations: each run of the same operation is written with one
+    request, inserts and upserts using import_bulk, ignoring or
+    updating duplicates respectively, merges using an AQL UPSERT,
+    updates using update_many, and deletes using delete_many.
+    The number of documents, and seconds for each flush are recorded,
+    and optionally printed.
+
+    Parameters
+    ----------
+    max_documents : None | int
+        Maximum number of documents to buffer per collection, or None
+        for no limit
+    max_seconds : None | float
+        Maximum seconds to buffer documents per collection, or None
+        for no limit
+    verbose : bool
+        Flag to print the latency, and throughput of each flush
+    """
+
+    def __init__(
+        self,
+        max_documents=BATCH_MAX_DOCUMENTS,
+        max_seconds=BATCH_MAX_SECONDS,
+        verbose=True,
+    ):
+        self.max_documents = max_documents
+        self.max_seconds = max_seconds
+        self.verbose = verbose
+        self.buffers = {}
+        self.flushes = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Write buffered documents only if no error occurred, so that
+        # partial batches are not written, and the error propagates
+        if exc_type is None:
+            self.close()
+        else:
+            self.buffers.clear()
+            self.closed = True
+
+    def insert(self, collection, document):
+        """Buffer a document to insert, ignoring it if its key exists.
+
+        Parameters
+        ----------
+        collection : arango.collection.StandardCollection
+            Collection in which to insert the document
+        document : dict
+            Document to insert
+
+        Returns
+        -------
+        None
+        """
+        self.write(collection, "insert", document)
+
+    def upsert(self, collection, document):
+        """Buffer a document to insert, or merge into an existing
+        document with the same key.
+
+        Parameters
+        ----------
+        collection : arango.collection.StandardCollection
+            Collection in which to upsert the document
+        document : dict
+            Document to upsert
+
+        Returns
+        -------
+        None
+        """
+        self.write(collection, "upsert", document)
+
+    def merge(self, collection, document):
+        """Buffer a document to insert, or merge into an existing
+        document with the same key, taking the sorted union of the
+        values of each attribute in both documents.
+
+        Parameters
+        ----------
+        collection : arango.collection.StandardCollection
+            Collection in which to merge the document
+        document : dict
+            Document to merge
+
+        Returns
+        -------
+        None
+        """
+        self.write(collection, "merge", document)
+
+    def update(self, collection, document):
+        """Buffer a partial update of an existing document.
+
+        Parameters
+        ----------
+        collection : arango.collection.StandardCollection
+            Collection containing the document
+        document : dict
+            Document containing a _key or _id, and the attributes to
+            update, removing any attributes with value None
+
+        Returns
+        -------
+        None
+        """
+        self.write(collection, "update", document)
+
+    def delete(self, collection, document):
+        """Buffer a delete of an existing document.
+
+        Parameters
+        ----------
+        collection : arango.collection.StandardCollection
+            Collection containing the document
+        document : str | dict
+            Document key, or document containing a _key or _id
+
+        Returns
+        -------
+        None
+        """
+        self.write(collection, "delete", document)
+
+    def write(self, collection, operation, document):
+        """Buffer an operation on a document, flushing the collection
+        buffer if full, or old.
+
+        Parameters
+        ----------
+        collection : arango.collection.StandardCollection
+            Collection on which to operate
+        operation : str
+            Operation: 'insert', 'upsert', 'merge', 'update', or
+            'delete'
+        document : dict
+            Document on which to operate
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            If the writer is closed, since the document would never
+            be written
+        """
+        if self.closed:
+            raise ValueError(f"Batch writer is closed: {collection.name}")
+        if collection.name not in self.buffers:
+            self.buffers[collection.name] = {
+                "collection": collection,
+                "operations": [],
+                "start": perf_counter(),
+            }
+        buffer = self.buffers[collection.name]
+        buffer["operations"].append((operation, document))
+
+        if (
+            self.max_documents is not None
+            and len(buffer["operations"]) >= self.max_documents
+        ) or (
+            self.max_seconds is not None
+            and perf_counter() - buffer["start"] >= self.max_seconds
+        ):
+            self.flush(collection)
+
+    def flush(self, collection=None):
+        """Write the buffered documents of one, or all collections.
+
+        Parameters
+        ----------
+        collection : None | arango.collection.StandardCollection
+            Collection to flush, or None to flush all collections
+
+        Returns
+        -------
+        None
+        """
+        if collection is None:
+            names = list(self.buffers.keys())
+        else:
+            names = [collection.name]
+
+        for name in names:
+            buffer = self.buffers.pop(name, None)
+            if buffer is None:
+                continue
+
+            # Write each run of the same operation with one request
+            runs = []
+            for operation, document in buffer["operations"]:
+                if len(runs) == 0 or runs[-1][0] != operation:
+                    runs.append((operation, []))
+                runs[-1][1].append(document)
+            for operation, documents in runs:
+                self.write_documents(buffer["collection"], operation, documents)
+
+    def write_documents(self, collection, operation, documents):
+        """Write documents to a collection with one request, and record
+        the latency, and throughput.
+
+        Parameters
+        ----------
+        collection : arango.collection.StandardCollection
+            Collection on which to operate
+        operation : str
+            Operation: 'insert', 'upsert', 'merge', 'update', or
+            'delete'
+        documents : list(dict)
+            Documents on which to operate
+
+        Returns
+        -------
+        None
+        """
+        start = perf_counter()
+        if operation == "insert":
+            result = collection.import_bulk(documents, on_duplicate="ignore")
+            n_errors = result["errors"]
+        elif operation == "upsert":
+            result = collection.import_bulk(documents, on_duplicate="update")
+            n_errors = result["errors"]
+        elif operation == "merge":
+            # Merge documents with the same key before writing
+            merged = {}
+            for document in documents:
+                key = get_document_key(document)
+                if key in merged:
+                    merged[key] = merge_documents(merged[key], document)
+                else:
+                    merged[key] = document
+            get_database(collection.db_name).aql.execute(
+                MERGE_DOCUMENTS_QUERY,
+                bind_vars={
+                    "@collection": collection.name,
+                    "documents": list(merged.values()),
+                },
+            )
+            n_errors = 0
+        elif operation == "update":
+            results = collection.update_many(
+                documents, check_rev=False, keep_none=False
+            )
+            n_errors = len([r for r in results if isinstance(r, Exception)])
+        elif operation == "delete":
+            results = collection.delete_many(documents, check_rev=False)
+            n_errors = len([r for r in results if isinstance(r, Exception)])
+        else:
+            raise ValueError(f"Invalid batch operation: {operation}")
+        seconds = perf_counter() - start
+
+        self.flushes.append(
+            {
+                "collection": collection.name,
+                "operation": operation,
+                "documents": len(documents),
+                "errors": n_errors,
+                "seconds": seconds,
+            }
+        )
+        if self.verbose:
+            print(
+                f"Flushed {len(documents)} {operation} documents to"
+                f" {collection.name} in {seconds:.3f} s"
+                f" ({len(documents) / max(seconds, 1e-9):.0f} documents/s,"
+                f" {n_errors} errors)"
+            )
+
+    def close(self):
+        """Flush all collections, print a summary of all flushes, and
+        close the writer to further documents.
+
+        Returns
+        -------
+        None
+        """
+        self.flush()
+        self.closed = True
+        if self.verbose and len(self.flushes) > 0:
+            n_documents = sum([f["documents"] for f in self.flushes])
+            seconds = sum([f["seconds"] for f in self.flushes])
+            print(
+                f"Wrote {n_documents} documents in {len(self.flushes)} flushes"
+                f" and {seconds:.1f} s"
+                f" ({n_documents / max(seconds, 1e-9):.0f} documents/s)"
+            )
+
+
+def get_document_key(document):
+    """Get the key of a document given as a key, or a dictionary.
+
+    Parameters
+    ----------
+    document : str | dict
+        Document key, or document containing a _key or _id
+
+    Returns
+    -------
+    str
+        Document key
+    """
+    if isinstance(document, dict):
+        if "_key" in document:
+            return document["_key"]
+        return document["_id"].split("/", 1)[1]
+    return document.split("/", 1)[-1]
+
+
+def get_value_order(value):
+    """Get a sort key for a JSON value, ordering values of different
+    types as AQL does: null, bool, number, string, array, then object.
+
+    Parameters
+    ----------
+    value : None | bool | int | float | str | list | dict
+        JSON value
+
+    Returns
+    -------
+    tuple
+        Sort key
+    """
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    if isinstance(value, list):
+        return (4, json.dumps(value, sort_keys=True))
+    return (5, json.dumps(value, sort_keys=True))
+
+
+def merge_documents(old, new):
+    """Merge a document into an existing document with the same key,
+    taking the sorted union of the values of each attribute in both
+    documents, as an array if either value is an array, or more than
+    one distinct value results, as MERGE_DOCUMENTS_QUERY does, so that
+    the result does not depend on the order of merges.
+
+    Parameters
+    ----------
+    old : dict
+        Existing document
+    new : dict
+        Document to merge
+
+    Returns
+    -------
+    merged : dict
+        Merged document
+    """
+    merged = {**old, **new}
+    for attribute in new:
+        if attribute.startswith("_") or attribute not in old:
+            continue
+        values = []
+        for value in [old[attribute], new[attribute]]:
+            if isinstance(value, list):
+                values.extend(value)
+            elif value is not None:
+                values.append(value)
+        values = sorted(
+            {get_value_order(value): value for value in values}.values(),
+            key=get_value_order,
+        )
+        if (
+            isinstance(old[attribute], list)
+            or isinstance(new[attribute], list)
+            or len(values) > 1
+        ):
+            merged[attribute] = values
+        else:
+            merged[attribute] = values[0] if len(values) > 0 else None
+    return merged
+
+
+def execute_derivation(db, query, bind_vars, commit_count=BATCH_MAX_DOCUMENTS):
+    """Execute a data modification AQL query inside the server,
+    committing every commit_count writes, and print its statistics.
+
+    Bind parameters which the query does not use are dropped, so that
+    a derivation can be given the same standard parameters whether or
+    not it uses them.
+
+    Parameters
+    ----------
+    db : arango.database.StandardDatabase
+        Database
+    query : str
+        AQL query
+    bind_vars : dict
+        Bind parameters, with collection parameter names prefixed
+        with @
+    commit_count : int
+        Number of writes after which to commit
+
+    Returns
+    -------
+    statistics : dict
+        Query statistics, including the number of documents modified,
+        and ignored
+    """
+    bind_vars = {
+        name: value
+        for name, value in bind_vars.items()
+        if re.search(f"(?<![@\\w])@{name}\\b", query)
+    }
+    start = perf_counter()
+    cursor = db.aql.execute(
+        query,
+        bind_vars=bind_vars,
+        intermediate_commit_count=commit_count,
+    )
+    statistics = cursor.statistics()
+    print(
+        f"Derived {statistics.get('modified', 0)} documents,"
+        f" ignored {statistics.get('ignored', 0)},"
+        f" in {perf_counter() - start:.3f} s"
+    )
+    return statistics
+
+
+def derive_vertices(db, graph, derivation, commit_count=BATCH_MAX_DOCUMENTS):
+    """Derive vertices inside the server from a declarative
+    derivation, inserting them in one AQL query.
+
+    The derivation query contains the FOR, FILTER, LET, and COLLECT
+    operations which set a variable named document for each vertex.
+    Documents with existing keys are ignored, or merged into the
+    existing document, depending on the derivation overwrite mode.
+
+    Parameters
+    ----------
+    db : arango.database.StandardDatabase
+        Database
+    graph : arango.graph.Graph
+        Graph
+    derivation : dict
+        Dictionary containing the vertex collection name, the query,
+        and optionally its bind parameters, and overwrite mode,
+        'ignore', the default, or 'update'
+    commit_count : int
+        Number of writes after which to commit
+
+    Returns
+    -------
+    statistics : dict
+        Query statistics
+    """
+    create_or_get_vertex_collection(graph, derivation["collection"])
+    query = (
+        derivation["query"]
+        + """
+        INSERT document INTO @@collection OPTIONS { overwriteMode: @overwrite_mode }
+        """
+    )
+    bind_vars = {
+        "@collection": derivation["collection"],
+        "overwrite_mode": derivation.get("overwrite_mode", "ignore"),
+    }
+    bind_vars.update(derivation.get("bind_vars", {}))
+    print(f"Deriving vertices in collection: {derivation['collection']}")
+    return execute_derivation(db, query, bind_vars, commit_count=commit_count)
+
+
+def derive_edges(db, graph, derivation, commit_count=BATCH_MAX_DOCUMENTS):
+    """Derive edges inside the server from a declarative derivation,
+    inserting them in one AQL query, and ignoring existing edges.
+
+    The derivation query contains the FOR, FILTER, and LET operations
+    which set variables named from_key, and to_key for each edge. The
+    from, and to collections are bound to
+    @@from_collection, and @@to_collection, and their names to
+    @from_collection, and @to_collection.
+
+    Parameters
+    ----------
+    db : arango.database.StandardDatabase
+        Database
+    graph : arango.graph.Graph
+        Graph
+    derivation : dict
+        Dictionary containing the from, and to vertex collection
+        names, the query, and optionally its bind parameters, and an
+        AQL expression for additional edge attributes
+    commit_count : int
+        Number of writes after which to commit
+
+    Returns
+    -------
+    statistics : dict
+        Query statistics
+    """
+    _, edge_name = create_or_get_edge_collection(
+        graph, derivation["from"], derivation["to"]
+    )
+    attributes = derivation.get("attributes", "{}")
+    query = (
+        derivation["query"]
+        + f"""
+        INSERT MERGE({attributes}, {{
+            _key: CONCAT(from_key, "-", to_key),
+            _from: CONCAT(@from_collection, "/", from_key),
+            _to: CONCAT(@to_collection, "/", to_key)
+        }}) INTO @@edge_collection OPTIONS {{ overwriteMode: "ignore" }}
+        """
+    )
+    bind_vars = {
+        "@from_collection": derivation["from"],
+        "@to_collection": derivation["to"],
+        "from_collection": derivation["from"],
+        "to_collection": derivation["to"],
+        "@edge_collection": edge_name,
+    }
+    bind_vars.update(derivation.get("bind_vars", {}))
+    print(f"Deriving edges in collection: {edge_name}")
+    return execute_derivation(db, query, bind_vars, commit_count=commit_count)
+
+
+def open_checkpoint(checkpoint_filepath):
+    """Open, or create a checkpoint manifest which records each batch
+    of documents committed to a collection, with a digest of its
+    content, and the fingerprint of each document loaded.
+
+    Parameters
+    ----------
+    checkpoint_filepath : str | pathlib.Path
+        Path of the SQLite checkpoint manifest
+
+    Returns
+    -------
+    checkpoint : sqlite3.Connection
+        Checkpoint manifest connection
+    """
+    Path(checkpoint_filepath).parent.mkdir(parents=True, exist_ok=True)
+    checkpoint = sqlite3.connect(checkpoint_filepath)
+    checkpoint.execute(
+        """
+        CREATE TABLE IF NOT EXISTS batches (
+            collection TEXT NOT NULL,
+            batch_size INTEGER NOT NULL,
+            batch INTEGER NOT NULL,
+            documents INTEGER NOT NULL,
+            committed TEXT NOT NULL,
+            digest TEXT,
+            PRIMARY KEY (collection, batch_size, batch)
+        )
+        """
+    )
+
+    # Add the digest column to manifests written without it, leaving
+    # their batches unverified, so that they are written again
+    columns = [row[1] for row in checkpoint.execute("PRAGMA table_info(batches)")]
+    if "digest" not in columns:
+        checkpoint.execute("ALTER TABLE batches ADD COLUMN digest TEXT")
+    checkpoint.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            collection TEXT NOT NULL,
+            key TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            attributes TEXT NOT NULL,
+            PRIMARY KEY (collection, key)
+        )
+        """
+    )
+    checkpoint.commit()
+    return checkpoint
+
+
+def delete_checkpoint(checkpoint_filepath):
+    """Delete a checkpoint manifest, if it exists.
+
+    Parameters
+    ----------
+    checkpoint_filepath : str | pathlib.Path
+        Path of the SQLite checkpoint manifest
+
+    Returns
+    -------
+    None
+    """
+    if Path(checkpoint_filepath).exists():
+        print(f"Deleting checkpoint: {checkpoint_filepath}")
+        Path(checkpoint_filepath).unlink()
+
+
+def get_batch_digest(documents):
+    """Compute a digest of the content of a batch of documents.
+
+    Parameters
+    ----------
+    documents : list(dict)
+        Documents in the batch
+
+    Returns
+    -------
+    str
+        SHA-1 hex digest of the documents serialized with sorted keys
+    """
+    return sha1(json.dumps(documents, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def is_batch_committed(checkpoint, collection_name, batch_size, i_batch, documents):
+    """Check if a batch of documents was committed to a collection,
+    with the same content, so that a batch which changed, for example
+    because the source file changed, or blank node keys were
+    regenerated, is written again.
+
+    Parameters
+    ----------
+    checkpoint : sqlite3.Connection
+        Checkpoint manifest connection
+    collection_name : str
+        Name of the collection, or other unique name for the sequence
+        of batches
+    batch_size : None | int
+        Number of documents per batch, or None if all documents were
+        in one batch
+    i_batch : int
+        Index of the batch
+    documents : list(dict)
+        Documents in the batch
+
+    Returns
+    -------
+    bool
+        True if the batch was committed with the same content
+    """
+    cursor = checkpoint.execute(
+        "SELECT digest FROM batches"
+        " WHERE collection = ? AND batch_size = ? AND batch = ?",
+        (collection_name, batch_size or 0, i_batch),
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == get_batch_digest(documents)
+
+
+def commit_batch(checkpoint, collection_name, batch_size, i_batch, documents):
+    """Record that a batch of documents was committed to a collection,
+    with a digest of its content.
+
+    Parameters
+    ----------
+    checkpoint : sqlite3.Connection
+        Checkpoint manifest connection
+    collection_name : str
+        Name of the collection, or other unique name for the sequence
+        of batches
+    batch_size : None | int
+        Number of documents per batch, or None if all documents were
+        in one batch
+    i_batch : int
+        Index of the batch
+    documents : list(dict)
+        Documents in the batch
+
+    Returns
+    -------
+    None
+    """
+    checkpoint.execute(
+        "INSERT OR REPLACE INTO batches"
+        " (collection, batch_size, batch, documents, committed, digest)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            collection_name,
+            batch_size or 0,
+            i_batch,
+            len(documents),
+            datetime.now().isoformat(),
+            get_batch_digest(documents),
+        ),
+    )
+    checkpoint.commit()
+
+
+def read_fingerprints(checkpoint):
+    """Read the fingerprint, and attribute names of each document
+    loaded.
+
+    Parameters
+    ----------
+    checkpoint : sqlite3.Connection
+        Checkpoint manifest connection
+
+    Returns
+    -------
+    fingerprints : dict
+        A dictionary with collection name keys containing dictionary
+        values which map document key to a (fingerprint, list of
+        attribute names) tuple
+    """
+    fingerprints = {}
+    for collection_name, key, fingerprint, attributes in checkpoint.execute(
+        "SELECT collection, key, fingerprint, attributes FROM fingerprints"
+    ):
+        if collection_name not in fingerprints:
+            fingerprints[collection_name] = {}
+        fingerprints[collection_name][key] = (fingerprint, json.loads(attributes))
+    return fingerprints
+
+
+def write_fingerprints(checkpoint, fingerprints):
+    """Write the fingerprint, and attribute names of each document
+    loaded, replacing all those recorded, so that a collection whose
+    documents were all removed is not fingerprinted.
+
+    Parameters
+    ----------
+    checkpoint : sqlite3.Connection
+        Checkpoint manifest connection
+    fingerprints : dict
+        A dictionary with collection name keys containing dictionary
+        values which map document key to a (fingerprint, list of
+        attribute names) tuple
+
+    Returns
+    -------
+    None
+    """
+    checkpoint.execute("DELETE FROM fingerprints")
+    for collection_name, documents in fingerprints.items():
+        checkpoint.executemany(
+            "INSERT INTO fingerprints VALUES (?, ?, ?, ?)",
+            [
+                (collection_name, key, fingerprint, json.dumps(attributes))
+                for key, (fingerprint, attributes) in documents.items()
+            ],
+        )
+    checkpoint.commit()
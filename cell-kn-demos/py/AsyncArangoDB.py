@@ -0,0 +1,205 @@
+import asyncio
+from time import perf_counter
+
+from arango import ArangoClient
+from arango.http import DefaultHTTPClient
+
+import ArangoDB as adb
+
+MAX_CONCURRENCY = 8
+BATCH_SIZE = 10000
+
+
+class AsyncArangoDB:
+    """Provide the ArangoDB create, get, and delete helpers, and batch
+    insert as coroutines, so that loaders can keep many requests in
+    flight.
+
+    Each blocking python-arango call runs in a worker thread, at most
+    max_concurrency at once, as bounded by a semaphore, over a
+    connection pool of the same size.
+
+    Parameters
+    ----------
+    hosts : None | str
+        ArangoDB URL, or comma separated URLs, default as configured
+        in ArangoDB
+    username : None | str
+        ArangoDB username, default as configured in ArangoDB
+    password : None | str
+        ArangoDB password, default as configured in ArangoDB
+    max_concurrency : int
+        Maximum number of requests in flight
+    """
+
+    def __init__(
+        self,
+        hosts=None,
+        username=None,
+        password=None,
+        max_concurrency=MAX_CONCURRENCY,
+    ):
+        if hosts is None:
+            hosts = adb.ARANGO_CONFIG["hosts"]
+        if username is None:
+            username = adb.ARANGO_CONFIG["username"]
+        if password is None:
+            password = adb.ARANGO_CONFIG["password"]
+        self.username = username
+        self.password = password
+        self.client = ArangoClient(
+            hosts=hosts,
+            http_client=DefaultHTTPClient(pool_maxsize=max_concurrency),
+            request_timeout=adb.ARANGO_CONFIG["request_timeout"],
+        )
+        self.sys_db = self.client.db(
+            "_system", username=self.username, password=self.password
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, function, *args, **kwargs):
+        """Run a blocking function in a worker thread once the
+        semaphore allows.
+
+        Parameters
+        ----------
+        function : function
+            Function to run
+        *args
+            Positional arguments passed to the function
+        **kwargs
+            Keyword arguments passed to the function
+
+        Returns
+        -------
+        object
+            Value returned by the function
+        """
+        async with self.semaphore:
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+    async def create_or_get_database(self, database_name):
+        """Create or get an ArangoDB database.
+
+        Parameters
+        ----------
+        database_name : str
+            Name of the database to create or get
+
+        Returns
+        -------
+        db : arango.database.StandardDatabase
+            Database
+        """
+        # Create database, if needed
+        if not await self.run(self.sys_db.has_database, database_name):
+            print(f"Creating ArangoDB database: {database_name}")
+            await self.run(self.sys_db.create_database, database_name)
+
+        # Connect to database
+        print(f"Getting ArangoDB database: {database_name}")
+        db = self.client.db(
+            database_name, username=self.username, password=self.password
+        )
+
+        return db
+
+    async def delete_database(self, database_name):
+        """Delete an ArangoDB database.
+
+        Parameters
+        ----------
+        database_name : str
+            Name of the database to delete
+
+        Returns
+        -------
+        None
+        """
+        # Delete database, if needed
+        if await self.run(self.sys_db.has_database, database_name):
+            print(f"Deleting ArangoDB database: {database_name}")
+            await self.run(self.sys_db.delete_database, database_name)
+
+    async def create_or_get_graph(self, db, graph_name):
+        """See ArangoDB.create_or_get_graph."""
+        return await self.run(adb.create_or_get_graph, db, graph_name)
+
+    async def delete_graph(self, db, graph_name):
+        """See ArangoDB.delete_graph."""
+        return await self.run(adb.delete_graph, db, graph_name)
+
+    async def create_or_get_vertex_collection(self, graph, vertex_name):
+        """See ArangoDB.create_or_get_vertex_collection."""
+        return await self.run(adb.create_or_get_vertex_collection, graph, vertex_name)
+
+    async def delete_vertex_collection(self, graph, vertex_name):
+        """See ArangoDB.delete_vertex_collection."""
+        return await self.run(adb.delete_vertex_collection, graph, vertex_name)
+
+    async def create_or_get_edge_collection(
+        self, graph, from_vertex_name, to_vertex_name
+    ):
+        """See ArangoDB.create_or_get_edge_collection."""
+        return await self.run(
+            adb.create_or_get_edge_collection, graph, from_vertex_name, to_vertex_name
+        )
+
+    async def delete_edge_collection(self, graph, edge_name):
+        """See ArangoDB.delete_edge_collection."""
+        return await self.run(adb.delete_edge_collection, graph, edge_name)
+
+    async def insert_documents(
+        self, collection, documents, on_duplicate="ignore", batch_size=BATCH_SIZE
+    ):
+        """Insert documents into a collection in batches, with as many
+        batches in flight at once as the semaphore allows.
+
+        Parameters
+        ----------
+        collection : arango.collection.StandardCollection
+            Collection in which to insert the documents
+        documents : list(dict)
+            Documents to insert
+        on_duplicate : str
+            Action on duplicate keys: 'error', 'update', 'replace', or
+            'ignore'
+        batch_size : int
+            Number of documents to insert per request
+
+        Returns
+        -------
+        counts : dict
+            Dictionary containing the number of documents created,
+            updated, ignored, empty, and in error, summed over batches
+        """
+        start = perf_counter()
+        results = await asyncio.gather(
+            *[
+                self.run(
+                    collection.import_bulk,
+                    documents[i_doc : i_doc + batch_size],
+                    on_duplicate=on_duplicate,
+                )
+                for i_doc in range(0, len(documents), batch_size)
+            ]
+        )
+        counts = {}
+        for result in results:
+            for count in ["created", "updated", "ignored", "empty", "errors"]:
+                counts[count] = counts.get(count, 0) + result.get(count, 0)
+        seconds = perf_counter() - start
+        print(
+            f"Inserted {len(documents)} documents into {collection.name}"
+            f" in {len(results)} batches and {seconds:.3f} s"
+        )
+        return counts
+
+    def close(self):
+        """Close the connection pool.
+
+        Returns
+        -------
+        None
+        """
+        self.client.close()
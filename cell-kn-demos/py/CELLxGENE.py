@@ -12,6 +12,16 @@ import cellxgene_census
 import pandas as pd
 import requests
 
+from CensusCache import (
+    OBS_COLUMNS,
+    get_missing_partitions,
+    get_partition_columns,
+    query_obs,
+    read_obs_batches,
+    update_manifest,
+    write_batches,
+)
+
 DATA_DIR = "../data"
 
 CELLXGENE_DOMAIN_NAME = "cellxgene.cziscience.com"
@@ -24,13 +34,22 @@ HTTPS_SLEEP = 1
 
 
 def get_metadata_and_datasets(
-    organisms=["homo_sapiens", "mus_musculus"], tissues=["lung", "eye", "brain"]
+    organisms=["homo_sapiens", "mus_musculus"],
+    tissues=["lung", "eye", "brain"],
+    obs_columns=OBS_COLUMNS,
+    filters=None,
 ):
     """Use the CZ CELLxGENE Census to obtain all datasets, summary
     cell counts, gene metadata, and, by default, human and mouse
     lung, eye, and brain cell metadata, then write the resulting
     Pandas DataFrames to parquet files, or, if the files exist, read
-    them.
+    them. Only the given cell metadata columns are read, a chunk at a
+    time, and streamed into a parquet dataset partitioned by organism
+    and tissue, with string columns stored as categories. Only the
+    organism, and tissue partitions not yet written with the given
+    columns are read from the Census, together with any columns
+    written before, and only the requested partitions are read from
+    the dataset.
 
     Parameters
     ----------
@@ -38,6 +57,11 @@ def get_metadata_and_datasets(
         List of organisms, default is ["homo_sapiens", "mus_musculus"]
     tissues : list(str)
         List of tissues, default is ["lung", "eye", "brain"]
+    obs_columns : list(str)
+        List of cell metadata columns, default is OBS_COLUMNS, to
+        which the partition columns are added when written
+    filters : None | list(tuple) | list(list(tuple)) | ds.Expression
+        Filters applied when reading cell metadata, default none
 
     Returns
     -------
@@ -54,16 +78,18 @@ def get_metadata_and_datasets(
     datasets_parquet = f"{CELL_KN_DIR}/datasets.parquet"
     counts_parquet = f"{CELL_KN_DIR}/counts.parquet"
     var_parquet = f"{CELL_KN_DIR}/var.parquet"
-    obs_parquet = f"{CELL_KN_DIR}/obs.parquet"
-    if (
+    obs_dirpath = f"{CELL_KN_DIR}/obs"
+    write_metadata = (
         not os.path.exists(datasets_parquet)
         or not os.path.exists(counts_parquet)
         or not os.path.exists(var_parquet)
-        or not os.path.exists(obs_parquet)
-    ):
+    )
+    missing = get_missing_partitions(obs_dirpath, organisms, tissues, obs_columns)
+    if write_metadata or missing:
         print("Opening soma")
         census = cellxgene_census.open_soma(census_version="latest")
 
+    if write_metadata:
         print("Collecting all datasets")
         datasets = census["census_info"]["datasets"].read().concat().to_pandas()
 
@@ -72,37 +98,11 @@ def get_metadata_and_datasets(
             census["census_info"]["summary_cell_counts"].read().concat().to_pandas()
         )
 
-        var = pd.DataFrame()
+        var_dfs = []
         for organism in organisms:
             print(f"Collecting gene metadata for {organism}")
-            var = pd.concat(
-                [
-                    var,
-                    cellxgene_census.get_var(
-                        census,
-                        organism,
-                    ),
-                ]
-            )
-
-        obs = pd.DataFrame()
-        for organism in organisms:
-            print(f"Collecting cell metadata for {organism}: {tissues} tissue")
-            obs_for_org = cellxgene_census.get_obs(
-                census,
-                organism,
-                value_filter=f"tissue_general in {tissues} and is_primary_data == True",
-            )
-            obs_for_org["organism"] = organism
-            obs = pd.concat(
-                [
-                    obs,
-                    obs_for_org,
-                ]
-            )
-
-        print("Closing soma")
-        census.close()
+            var_dfs.append(cellxgene_census.get_var(census, organism))
+        var = pd.concat(var_dfs)
 
         print("Writing datasets parquet")
         datasets.to_parquet(datasets_parquet)
@@ -113,9 +113,6 @@ def get_metadata_and_datasets(
         print("Writing gene metadata parquet")
         var.to_parquet(var_parquet)
 
-        print("Writing cell metadata parquet")
-        obs.to_parquet(obs_parquet)
-
     else:
 
         print("Reading datasets parquet")
@@ -127,8 +124,32 @@ def get_metadata_and_datasets(
         print("Reading gene metadata parquet")
         var = pd.read_parquet(var_parquet)
 
-        print("Reading cell metadata parquet")
-        obs = pd.read_parquet(obs_parquet)
+    for organism, missing_tissues in missing.items():
+        print(f"Writing cell metadata for {organism}: {missing_tissues} tissue")
+        column_names = get_partition_columns(
+            obs_dirpath, organism, missing_tissues, obs_columns
+        )
+        n_rows = write_batches(
+            read_obs_batches(
+                census, organism, missing_tissues, column_names=column_names
+            ),
+            obs_dirpath,
+        )
+        update_manifest(obs_dirpath, organism, missing_tissues, column_names)
+        print(f"Wrote {n_rows} cells for {organism}")
+
+    if write_metadata or missing:
+        print("Closing soma")
+        census.close()
+
+    print("Reading cell metadata parquet dataset")
+    obs = query_obs(
+        obs_dirpath,
+        organisms=organisms,
+        tissues=tissues,
+        columns=list(obs_columns) + ["organism"],
+        filters=filters,
+    )
 
     return datasets, counts, var, obs
 
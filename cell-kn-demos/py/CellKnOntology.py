@@ -1,6 +1,7 @@
 import argparse
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from rdflib.term import Literal, URIRef
 
@@ -9,13 +10,18 @@ from CellOntology import (
     OBO_DIRPATH,
     VALID_VERTICES,
     load_triples_into_adb_graph,
-    parse_obo,
+    parse_ontology,
     parse_term,
 )
+from ExcelUtilities import read_workbook
+
+SCHEMA_COLUMNS = ["Subject Node", "Predicate Relation", "Object Node", "Connections"]
+RELATIONS_COLUMNS = [0, 1, 2]
 
 
 def read_cel_kn_schema(cell_kn_dirname, cell_kn_filename):
-    """Read slightly, manually modified Cell KN schema Excel file.
+    """Read slightly, manually modified Cell KN schema Excel file,
+    keeping only the used columns, and caching the result as Parquet.
 
     Parameters
     ----------
@@ -32,18 +38,18 @@ def read_cel_kn_schema(cell_kn_dirname, cell_kn_filename):
         The DataFrame containing the relations of the schema names to
         labels and CURIEs
     """
-    schema = pd.read_excel(Path(cell_kn_dirname) / cell_kn_filename, sheet_name=0).iloc[
-        :, 0:6
-    ]
-    relations = pd.read_excel(
-        Path(cell_kn_dirname) / cell_kn_filename, sheet_name=2
-    ).iloc[:, 0:3]
+    data = read_workbook(
+        Path(cell_kn_dirname) / cell_kn_filename,
+        {
+            0: dict(usecols=SCHEMA_COLUMNS),
+            2: dict(usecols=RELATIONS_COLUMNS),
+        },
+    )
+    schema = data[0]
+    relations = data[2]
 
     return (
-        schema.loc[
-            schema["Connections"] == "Class-Class",
-            ["Subject Node", "Predicate Relation", "Object Node", "Connections"],
-        ].copy(),
+        schema.loc[schema["Connections"] == "Class-Class", SCHEMA_COLUMNS].copy(),
         relations,
     )
 
@@ -59,91 +65,135 @@ def create_triples(schema, relations, ro=None):
     relations : pd.DataFrame
         The DataFrame containing the relations of the schema names to
         labels and CURIEs
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
 
     Returns
     -------
     triples : list(tuple)
         List of tuples which contain each triple
+    ids : set(str)
+        Set of ontology ids of each term
     """
-    triples = []
+    columns, ids = compile_schema(schema, relations, ro=ro)
+    triples = list(zip(columns["s"], columns["p"], columns["o"]))
+
+    return triples, ids
 
-    # Create mapping from name to label
-    n2l = {}
-    for _, row in relations.iterrows():
-        n2l[row.iloc[0].replace("_class", "")] = row.iloc[1]
 
-    # Create mapping from name to CURIE
-    n2c = {}
-    for _, row in relations.iterrows():
-        n2c[row.iloc[0].replace("_class", "")] = row.iloc[2]
+def compile_schema(schema, relations, ro=None):
+    """Compile the schema into columns of triples by resolving each
+    distinct name to a label, and a term once, in a lookup table, then
+    indexing the table with the codes of the names in each schema
+    column.
 
-    # Map name to term, and collect ids
-    ids = set()
+    For each schema row, in order, the triples are: the subject label,
+    if the subject resolves and has a label, then the object label, if
+    the predicate and object also resolve and the object has a label,
+    then the subject, predicate, and object.
 
-    def n2t(name):
-        if not name in n2c:
+    Parameters
+    ----------
+    schema : pd.DataFrame
+        The DataFrame containing the schema name triples
+    relations : pd.DataFrame
+        The DataFrame containing the relations of the schema names to
+        labels and CURIEs
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+
+    Returns
+    -------
+    columns : dict
+        A dictionary with keys "s", "p", and "o" containing object
+        arrays of the subject, predicate, and object of each triple
+    ids : set(str)
+        Set of ontology ids of each term
+    """
+    # Create the lookup table from name to label, and CURIE, keeping
+    # the last relation of each name
+    table = pd.DataFrame(
+        {
+            "label": relations.iloc[:, 1].to_numpy(),
+            "curie": relations.iloc[:, 2].to_numpy(),
+        },
+        index=relations.iloc[:, 0].str.replace("_class", "").to_numpy(),
+    )
+    table = table[~table.index.duplicated(keep="last")]
+
+    # Resolve each CURIE to a term, and id once, appending a missing
+    # entry indexed by code -1
+    curies = table["curie"].astype("string")
+    urls = ("http://purl.obolibrary.org/obo/" + curies.str.replace(":", "_")).mask(
+        curies.str.contains("rdfs:subClassOf", regex=False, na=False),
+        "http://www.w3.org/2000/01/rdf-schema#subClassOf",
+    )
+    urls = urls.mask(
+        curies.str.contains("rdf:type", regex=False, na=False),
+        "http://www.w3.org/1999/02/22-rdf-syntax-ns#type",
+    )
+    terms = [URIRef(url) if not pd.isna(url) else None for url in urls]
+    term_array = np.array(terms + [None], dtype=object)
+    id_array = np.array(
+        [parse_term(term, ro=ro)[0] if term is not None else None for term in terms]
+        + [None],
+        dtype=object,
+    )
+    label_array = np.array(
+        [Literal(label) for label in table["label"]] + [None], dtype=object
+    )
+    rdfs_label = URIRef("http://www.w3.org/2000/01/rdf-schema#label")
+
+    # Code each name in the subject, predicate, and object columns,
+    # using -1 for names without a label, or term
+    label_codes = [table.index.get_indexer(schema.iloc[:, i_col]) for i_col in range(3)]
+    has_term = np.array([term is not None for term in term_array])
+    term_codes = [np.where(has_term[codes], codes, -1) for codes in label_codes]
+    s_codes, p_codes, o_codes = term_codes
+    for name in pd.unique(schema.iloc[:, 0:3].to_numpy().ravel()):
+        if name not in table.index or not has_term[table.index.get_loc(name)]:
             print(f"Skipping name: {name}")
-            return
-
-        curie = n2c[name]
-        if "rdf:type" in curie:
-            term = URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#type")
-
-        elif "rdfs:subClassOf" in curie:
-            term = URIRef("http://www.w3.org/2000/01/rdf-schema#subClassOf")
-
-        else:
-            term = URIRef(f"http://purl.obolibrary.org/obo/{curie.replace(':', '_')}")
-
-        id, _, _, _, _ = parse_term(term, ro=ro)
-        ids.add(id)
-
-        return term
-
-    # Create triples by translating schema names to labels, and to
-    # CURIEs with a default URL.
-    for _, row in schema.iterrows():
-
-        # Create subject from row
-        s = n2t(row.iloc[0])
-        if s is None:
-            print(f"Skipping row due to subject: {s}")
-            continue
-
-        # Create triple to label subject
-        if row.iloc[0] in n2l:
-            triple = (
-                s,
-                URIRef("http://www.w3.org/2000/01/rdf-schema#label"),
-                Literal(n2l[row.iloc[0]]),
-            )
-            triples.append(triple)
-
-        # Create predicate from row
-        p = n2t(row.iloc[1])
-        if p is None:
-            print(f"Skipping row due to predicate: {p}")
-            continue
-
-        # Create object from row
-        o = n2t(row.iloc[2])
-        if o is None:
-            print(f"Skipping row due to object: {o}")
-            continue
-
-        # Create triple to label object
-        if row.iloc[2] in n2l:
-            triple = (
-                o,
-                URIRef("http://www.w3.org/2000/01/rdf-schema#label"),
-                Literal(n2l[row.iloc[2]]),
-            )
-            triples.append(triple)
-
-        triple = (s, p, o)
-        triples.append(triple)
 
-    return triples, ids
+    # Identify the triples to create for each row
+    has_s = s_codes >= 0
+    has_p = has_s & (p_codes >= 0)
+    has_spo = has_p & (o_codes >= 0)
+    has_s_label = has_s & (label_codes[0] >= 0)
+    has_o_label = has_spo & (label_codes[2] >= 0)
+    n_skipped = (~has_spo).sum()
+    if n_skipped > 0:
+        print(f"Skipping {n_skipped} rows due to subject, predicate, or object")
+
+    # Select the triples in each row in order: subject label, object
+    # label, then subject, predicate, and object
+    n_row = schema.shape[0]
+    predicate_label_array = np.empty(n_row, dtype=object)
+    predicate_label_array[:] = [rdfs_label] * n_row
+    mask = np.stack([has_s_label, has_o_label, has_spo], axis=1)
+    columns = {
+        "s": np.stack(
+            [term_array[s_codes], term_array[o_codes], term_array[s_codes]], axis=1
+        )[mask],
+        "p": np.stack(
+            [predicate_label_array, predicate_label_array, term_array[p_codes]],
+            axis=1,
+        )[mask],
+        "o": np.stack(
+            [
+                label_array[label_codes[0]],
+                label_array[label_codes[2]],
+                term_array[o_codes],
+            ],
+            axis=1,
+        )[mask],
+    }
+
+    # Collect the ids of each term resolved
+    ids = set(id_array[s_codes[has_s]])
+    ids.update(id_array[p_codes[has_p]])
+    ids.update(id_array[o_codes[has_spo]])
+
+    return columns, ids
 
 
 def main():
@@ -172,7 +222,7 @@ def main():
     schema, relations = read_cel_kn_schema(args.cell_kn_dirname, args.cell_kn_filename)
 
     print("Creating triples")
-    ro, _, _ = parse_obo(OBO_DIRPATH, ro_filename)
+    _, ro, _, _ = parse_ontology(OBO_DIRPATH, ro_filename)
     triples, ids = create_triples(schema, relations, ro=ro)
 
     print("Creating ArangoDB database and graph, and loading triples")
@@ -1,19 +1,33 @@
 import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from hashlib import sha1
+import json
 from pathlib import Path
+import pickle
 from pprint import pprint
+from queue import Full, Queue
 import re
+from threading import Event, Thread
+from types import SimpleNamespace
 from urllib.parse import urlparse
 
 import ArangoDB as adb
 from lxml import etree
-from rdflib import Graph
-from rdflib.term import BNode, Literal
+from rdflib.parser import create_input_source
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
+from rdflib.plugins.parsers.rdfxml import RDFXMLParser
+from rdflib.term import BNode, Literal, URIRef
 import requests
+from requests.adapters import HTTPAdapter
 
 BIOPORTAL_DIRPATH = Path("../data/bioportal")
 
 OBO_DIRPATH = Path("../data/obo")
+OBO_CACHE_DIRPATH = OBO_DIRPATH / "cache"
+OBO_CACHE_VERSION = 3
 OBO_PURLS = [
     # Original
     "http://purl.obolibrary.org/obo/cl.owl",
@@ -38,67 +52,220 @@ OWL_NS = "{http://www.w3.org/2002/07/owl#}"
 RDF_NS = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
 RDFS_NS = "{http://www.w3.org/2000/01/rdf-schema#}"
 
+RDFS_LABEL = URIRef("http://www.w3.org/2000/01/rdf-schema#label")
+RDF_TYPE = URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#type")
+
+# OWL types of the elements from which parse_obo collects labels
+OWL_ABOUT_TYPES = {
+    URIRef(f"http://www.w3.org/2002/07/owl#{about_element_type}")
+    for about_element_type in [
+        "AnnotationProperty",
+        "ObjectProperty",
+        "DatatypeProperty",
+        "Class",
+        "Description",
+    ]
+}
+
+OBO_PURL_PREFIX = "http://purl.obolibrary.org/obo/"
 URIREF_PATTERN = re.compile(r"/obo/([A-Za-z]*)_([A-Z0-9]*)")
+TERM_CACHE_SIZE = 2**20
 VALID_VERTICES = set(["UBERON", "CL", "GO", "NCBITaxon", "PR", "PATO", "CHEBI", "CLM"])
 
+BATCH_SIZE = 10000
 
-def update_ontologies():
-    """Download each specified ontology, parse version information
-    from new and current ontology, and replace current with new if new
-    is newer than current.
+UPDATE_MANIFEST_FILENAME = "manifest.json"
+UPDATE_WORKERS = 4
+UPDATE_TIMEOUT = 60
+UPDATE_CHUNK_SIZE = 1024 * 1024
+
+STREAM_CHUNK_SIZE = 10000
+STREAM_QUEUE_SIZE = 10
+STREAM_PUT_TIMEOUT = 0.1
+MAX_OPEN_BNODES = 10000
+
+
+def update_ontologies(
+    obo_purls=OBO_PURLS, obo_dirpath=OBO_DIRPATH, n_workers=UPDATE_WORKERS
+):
+    """Concurrently download each specified ontology, if changed,
+    parse version information from new and current ontology, and
+    replace current with new if new is newer than current. Requests
+    are conditional on the ETag and Last-Modified values stored in a
+    manifest, so an unchanged ontology costs one 304 response.
 
     Parameters
     ----------
-    None
+    obo_purls : list(str)
+        PURLs of ontologies to download
+    obo_dirpath : Path
+        Path of directory containing downloaded ontologies
+    n_workers : int
+        Number of concurrent downloads
 
     Returns
     -------
     None
     """
-    for obo_purl in OBO_PURLS:
+    manifest_filepath = obo_dirpath / UPDATE_MANIFEST_FILENAME
+    manifest = {}
+    if manifest_filepath.exists():
+        with open(manifest_filepath, "r") as fp:
+            manifest = json.load(fp)
+
+    # Share a pooled session across all downloads
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=n_workers, pool_maxsize=n_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    with session, ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = {
+            obo_purl: executor.submit(
+                update_ontology,
+                session,
+                obo_purl,
+                obo_dirpath,
+                manifest.get(obo_purl, {}),
+            )
+            for obo_purl in obo_purls
+        }
+        for obo_purl, future in futures.items():
+            try:
+                manifest[obo_purl] = future.result()
+            except Exception as exc:
+                print(f"Could not update {obo_purl}: {exc}")
+
+    with open(manifest_filepath, "w") as fp:
+        json.dump(manifest, fp, indent=4)
+
 
-        print(f"Getting {obo_purl}")
-        r = requests.get(obo_purl)
+def update_ontology(session, obo_purl, obo_dirpath, entry):
+    """Download an ontology, if changed, streaming it to disk, parse
+    version information from the header of new and current ontology,
+    and replace current with new if new is newer than current.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Session used for the download
+    obo_purl : str
+        PURL of ontology to download
+    obo_dirpath : Path
+        Path of directory containing downloaded ontologies
+    entry : dict
+        Manifest entry containing the ETag and Last-Modified values of
+        the current ontology, if any
+
+    Returns
+    -------
+    entry : dict
+        Manifest entry containing the ETag and Last-Modified values of
+        the current ontology
+    """
+    obo_stem = Path(urlparse(obo_purl).path).stem
+    obo_suffix = Path(urlparse(obo_purl).path).suffix
+    obo_filepath_new = obo_dirpath / (obo_stem + "-new" + obo_suffix)
+    obo_filepath_cur = obo_dirpath / (obo_stem + obo_suffix)
+
+    # Request the ontology only if changed
+    headers = {}
+    if obo_filepath_cur.exists():
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    print(f"Getting {obo_purl}")
+    with session.get(
+        obo_purl, headers=headers, stream=True, timeout=UPDATE_TIMEOUT
+    ) as r:
+        if r.status_code == 304:
+            print(f"Ontology {obo_purl} is not modified")
+            return entry
+        r.raise_for_status()
 
-        obo_stem = Path(urlparse(obo_purl).path).stem
-        obo_suffix = Path(urlparse(obo_purl).path).suffix
-        obo_filepath_new = OBO_DIRPATH / (obo_stem + "-new" + obo_suffix)
         print(f"Writing {obo_filepath_new}")
         with open(obo_filepath_new, "wb") as f:
-            f.write(r.content)
-
-        print(f"Parsing {obo_filepath_new}")
-        root = etree.parse(obo_filepath_new)
-        version_new = root.find(f"{OWL_NS}Ontology/{OWL_NS}versionInfo").text
-        print(f"Found new version {version_new}")
-
-        obo_filepath_cur = OBO_DIRPATH / (obo_stem + obo_suffix)
-        if obo_filepath_cur.exists():
-            print(f"Parsing {obo_filepath_cur}")
-            root = etree.parse(obo_filepath_cur)
-            version_cur = root.find(f"{OWL_NS}Ontology/{OWL_NS}versionInfo").text
-            print(f"Found current version {version_cur}")
-
-            if version_new > version_cur:
-                obo_filepath_old = OBO_DIRPATH / (
-                    obo_stem + "-" + version_cur + obo_suffix
-                )
+            for chunk in r.iter_content(chunk_size=UPDATE_CHUNK_SIZE):
+                f.write(chunk)
 
-                print(f"Renaming {obo_filepath_cur} to {obo_filepath_old}")
-                obo_filepath_cur.rename(obo_filepath_old)
+        entry = {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+        }
 
-                print(f"Renaming {obo_filepath_new} to {obo_filepath_cur}")
-                obo_filepath_new.rename(obo_filepath_cur)
+    version_new = read_ontology_version(obo_filepath_new)
+    print(f"Found new version {version_new}")
 
-            else:
-                print(f"New version is not newer than current version")
-                print(f"Removing {obo_filepath_new}")
-                obo_filepath_new.unlink()
+    if obo_filepath_cur.exists():
+        version_cur = read_ontology_version(obo_filepath_cur)
+        print(f"Found current version {version_cur}")
+
+        if version_new is None or version_cur is None or version_new > version_cur:
+            if version_cur is None:
+                # Name the archive by modification time, so that
+                # earlier archives are kept
+                mtime = datetime.fromtimestamp(obo_filepath_cur.stat().st_mtime)
+                version_cur = "previous-" + mtime.strftime("%Y%m%dT%H%M%S%f")
+            obo_filepath_old = obo_dirpath / (obo_stem + "-" + version_cur + obo_suffix)
+
+            print(f"Renaming {obo_filepath_cur} to {obo_filepath_old}")
+            obo_filepath_cur.rename(obo_filepath_old)
 
-        else:
             print(f"Renaming {obo_filepath_new} to {obo_filepath_cur}")
             obo_filepath_new.rename(obo_filepath_cur)
 
+        else:
+            print(f"New version is not newer than current version")
+            print(f"Removing {obo_filepath_new}")
+            obo_filepath_new.unlink()
+
+    else:
+        print(f"Renaming {obo_filepath_new} to {obo_filepath_cur}")
+        obo_filepath_new.rename(obo_filepath_cur)
+
+    return entry
+
+
+def read_ontology_version(obo_filepath):
+    """Read the version information from the ontology header, which
+    precedes all terms, so parsing stops once the header ends. Use the
+    release segment of the version IRI if no version information is
+    found.
+
+    Parameters
+    ----------
+    obo_filepath : Path
+        Path of downloaded ontology XML file
+
+    Returns
+    -------
+    version : None | str
+        Ontology version
+    """
+    print(f"Parsing {obo_filepath} header")
+    version = None
+    for _, element in etree.iterparse(str(obo_filepath), events=("end",)):
+
+        if element.tag == f"{OWL_NS}Ontology":
+            break
+
+        parent = element.getparent()
+        if parent is None or parent.tag != f"{OWL_NS}Ontology":
+            continue
+
+        if element.tag == f"{OWL_NS}versionInfo":
+            return element.text
+
+        if element.tag == f"{OWL_NS}versionIRI":
+            # For example, ".../obo/cl/releases/2024-01-01/cl.owl"
+            # gives "2024-01-01"
+            version_iri = element.get(f"{RDF_NS}resource")
+            version = Path(urlparse(version_iri).path).parent.name or None
+
+    return version
+
 
 def parse_obo(obo_dir, obo_fnm):
     """Parse ontology XML downloaded from the OBO Foundry to create a
@@ -166,6 +333,286 @@ def parse_obo(obo_dir, obo_fnm):
     return t2l, l2t, ids
 
 
+def parse_ontology(obo_dir, obo_fnm, use_cache=True):
+    """Parse ontology XML once to collect all triples, a mapping from
+    term to label, from label to term, and a set of ontology
+    identifiers, then cache the results. The cache is keyed by file
+    path, modification time, size, and cache version, so that parsing
+    is skipped until the ontology XML changes.
+
+    Parameters
+    ----------
+    obo_dir : str | Path
+        Name of directory containing downloaded ontology XML
+    obo_fnm : str
+        Name of downloaded ontology XML file
+    use_cache : bool
+        Flag to read, and write cached results
+
+    Returns
+    -------
+    triples : list(tuple)
+        List of tuples which contain each triple
+    t2l : dict
+        Dictionary mapping ontology term to label
+    l2t : dict
+        Dictionary mapping ontology label to term
+    ids : set
+        Set containing all ontology identifiers found
+    """
+    obo_filepath = Path(obo_dir) / obo_fnm
+    obo_stat = obo_filepath.stat()
+    cache_key = (
+        str(obo_filepath.resolve()),
+        obo_stat.st_mtime_ns,
+        obo_stat.st_size,
+        OBO_CACHE_VERSION,
+    )
+    cache_filepath = OBO_CACHE_DIRPATH / (
+        f"{obo_filepath.stem}-{sha1(cache_key[0].encode()).hexdigest()[:8]}.pickle"
+    )
+
+    # Read cached results, if the key matches, noting that the key is
+    # pickled separately so it can be checked before the results are
+    # read
+    if use_cache and cache_filepath.exists():
+        with open(cache_filepath, "rb") as fp:
+            if pickle.load(fp) == cache_key:
+                print(f"Reading {cache_filepath}")
+                return pickle.load(fp)
+
+    # Collect unique triples in document order, rather than the hash
+    # order of an rdflib graph, so that labels are chosen as in
+    # parse_obo
+    print(f"Parsing {obo_filepath}")
+    triples = list(dict.fromkeys(stream_triples(obo_dir, obo_fnm)))
+    t2l, l2t, ids = parse_triples(triples)
+    results = (triples, t2l, l2t, ids)
+
+    if use_cache:
+        print(f"Writing {cache_filepath}")
+        cache_filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_filepath, "wb") as fp:
+            pickle.dump(cache_key, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(results, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return results
+
+
+def stream_triples(
+    obo_dir, obo_fnm, chunk_size=STREAM_CHUNK_SIZE, queue_size=STREAM_QUEUE_SIZE
+):
+    """Yield each triple parsed from ontology XML, or N-Triples,
+    without populating an rdflib graph. The rdflib parser runs in a
+    separate thread, and passes chunks of triples through a bounded
+    queue, so memory use does not grow with the size of the ontology.
+    The parser stops when the generator is closed, or raises.
+
+    Parameters
+    ----------
+    obo_dir : str | Path
+        Name of directory containing downloaded ontology XML, or
+        N-Triples
+    obo_fnm : str
+        Name of downloaded ontology XML, or N-Triples ('.nt') file
+    chunk_size : int
+        Number of triples to pass through the queue at once
+    queue_size : int
+        Maximum number of chunks in the queue
+
+    Returns
+    -------
+    generator(tuple)
+        Generator of tuples which contain each triple
+    """
+    obo_filepath = Path(obo_dir) / obo_fnm
+    chunks = Queue(maxsize=queue_size)
+    chunk = []
+
+    # Set when the consumer stops, so that the parser stops too
+    stop = Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=STREAM_PUT_TIMEOUT)
+                return True
+            except Full:
+                continue
+        return False
+
+    def add(triple):
+        chunk.append(triple)
+        if len(chunk) == chunk_size:
+            if not put(chunk.copy()):
+                # Abort the parser, since the consumer has stopped
+                raise RuntimeError(f"Stopped streaming {obo_filepath}")
+            chunk.clear()
+
+    # Collect triples from the RDF/XML, or N-Triples, parser
+    sink = SimpleNamespace(
+        add=add,
+        bind=lambda *args, **kwargs: None,
+        triple=lambda s, p, o: add((s, p, o)),
+    )
+
+    def parse():
+        try:
+            if obo_filepath.suffix == ".nt":
+                with open(obo_filepath, "rb") as fp:
+                    W3CNTriplesParser(sink).parse(fp)
+
+            else:
+                source = create_input_source(location=str(obo_filepath))
+                try:
+                    RDFXMLParser().parse(source, sink)
+                finally:
+                    source.close()
+
+            put(chunk)
+
+        except Exception as exc:
+            put(exc)
+
+        # Signal the end of parsing, unless the consumer has stopped
+        put(None)
+
+    print(f"Streaming {obo_filepath}")
+    parser = Thread(target=parse, name=f"stream_triples-{obo_fnm}", daemon=True)
+    parser.start()
+    try:
+        while True:
+            triples = chunks.get()
+            if triples is None:
+                break
+            if isinstance(triples, Exception):
+                raise triples
+            yield from triples
+
+    finally:
+
+        # Stop the parser, even if the generator is closed early, or
+        # an exception is raised downstream
+        stop.set()
+        parser.join()
+
+
+def stream_fnode_and_bnode_triples(triples, ro=None, max_open_bnodes=MAX_OPEN_BNODES):
+    """Yield filled node triples as they arrive, and 'relation' and
+    'annotation' triples created from each set of triples sharing a
+    common BNode once the set is closed. Sets are held in a bounded
+    buffer of open BNodes, and closed when evicted as least recently
+    used, or when all triples have been consumed. Triples sharing a
+    BNode are contiguous in ontology XML, so sets are complete when
+    evicted, unless the buffer is too small.
+
+    Parameters
+    ----------
+    triples : generator(tuple) | list(tuple)
+        Generator, or list of tuples which contain each triple
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+    max_open_bnodes : int
+        Maximum number of BNode triple sets held open
+
+    Returns
+    -------
+    generator(tuple)
+        Generator of tuples which contain each filled node, or created
+        BNode triple
+    """
+    triple_sets = OrderedDict()
+
+    for s, p, o in triples:
+
+        s_is_bnode = isinstance(s, BNode)
+        o_is_bnode = isinstance(o, BNode)
+
+        if not s_is_bnode and not o_is_bnode:
+            yield (s, p, o)
+            continue
+
+        elif s_is_bnode and o_is_bnode:
+            continue
+
+        n = s if s_is_bnode else o
+        add_triple_to_bnode_triple_set(triple_sets, n, s, p, o, ro=ro)
+        triple_sets.move_to_end(n)
+
+        if len(triple_sets) > max_open_bnodes:
+
+            # Close the least recently used BNode triple set
+            n, triple_set = triple_sets.popitem(last=False)
+            bnode_triples, _ = create_bnode_triples_from_bnode_triple_sets(
+                {n: triple_set}, ro=ro
+            )
+            yield from bnode_triples
+
+    # Close all remaining BNode triple sets
+    bnode_triples, _ = create_bnode_triples_from_bnode_triple_sets(triple_sets, ro=ro)
+    yield from bnode_triples
+
+
+def parse_triples(triples):
+    """Use label triples to create a mapping from term to label, from
+    label to term, and a list of ontology identifiers, as parse_obo
+    does, but without parsing the ontology XML again. Only terms typed
+    as the OWL elements considered by parse_obo are labeled. If a term
+    has several labels, the first untagged label is used, or, if none,
+    the first language tagged label, so triples must be in document
+    order. The result equals that of parse_obo for terms described by
+    one element, unless a language tagged label precedes an untagged
+    one.
+
+    Parameters
+    ----------
+    triples : list(tuple)
+        List of tuples which contain each triple
+
+    Returns
+    -------
+    t2l : dict
+        Dictionary mapping ontology term to label
+    l2t : dict
+        Dictionary mapping ontology label to term
+    ids : set
+        Set containing all ontology identifiers found
+    """
+    # Collect the subjects of elements considered by parse_obo
+    subjects = set([s for s, p, o in triples if p == RDF_TYPE and o in OWL_ABOUT_TYPES])
+
+    t2l = {}
+    t2tagged = {}
+    ids = set()
+
+    for s, p, o in triples:
+
+        # Consider only label triples about a considered URIRef
+        if p != RDFS_LABEL or s not in subjects or isinstance(s, BNode):
+            continue
+
+        id, number, term, _, _ = parse_term(s)
+        if id is None:
+            continue
+
+        # Collect parsed ontology identifier, term, and first label,
+        # keeping language tagged labels only for terms without an
+        # untagged label
+        if getattr(o, "language", None) is None:
+            t2l.setdefault(term, str(o))
+        else:
+            t2tagged.setdefault(term, str(o))
+        ids.add(id)
+
+    for term, label in t2tagged.items():
+        t2l.setdefault(term, label)
+
+    # Invert the term to label dictionary
+    l2t = {v: k for k, v in t2l.items()}
+
+    return t2l, l2t, ids
+
+
 def parse_term(term, ro=None):
     """Parse an rdflib term first as an URIRef that identifies a
     class, including relationship classes, then a predicate, BNode, or
@@ -185,9 +632,47 @@ def parse_term(term, ro=None):
         literal value, and type ('class', 'predicate', or 'literal'),
         in which any element of the tuple may also be None
     """
+    oid, number, term, value, term_type, message = classify_term(term)
+
+    if message is not None:
+        print(message)
+
+    if ro is not None and term_type == "class" and term in ro:
+        # Lookup label for relationship ontology term
+        return oid, number, term, ro[term], term_type
+
+    return oid, number, term, value, term_type
+
+
+@lru_cache(maxsize=TERM_CACHE_SIZE)
+def classify_term(term):
+    """Classify an rdflib term independent of any relationship
+    ontology mapping, caching the result since ontology terms repeat
+    heavily. The common OBO PURL prefix is parsed without urlparse.
+
+    Parameters
+    ----------
+    term : rdflib.term.BNode|Literal|URIRef | str
+        An rdflib term: BNode, Literal, or URIRef, or equivalent string
+
+    Returns
+    -------
+    tuple
+        Contains ontology identifier, number, and term, fragment or
+        literal value, type ('class', 'predicate', or 'literal'), and
+        any message to print, in which any element of the tuple may
+        also be None
+    """
     # Parse then match as URL
-    path = urlparse(term).path
-    fragment = urlparse(term).fragment
+    if term.startswith(OBO_PURL_PREFIX) and not any(c in term for c in "#?;"):
+        path = term[len(OBO_PURL_PREFIX) - 5 :]
+        fragment = ""
+
+    else:
+        parsed = urlparse(term)
+        path = parsed.path
+        fragment = parsed.fragment
+
     match = URIREF_PATTERN.match(path)
     if match is not None:
 
@@ -195,28 +680,21 @@ def parse_term(term, ro=None):
         oid = match.group(1)
         if oid == "GOREL":
             # Identifier not found in the Ontology Lookup Service
-            print(f"Invalid Ontology ID: 'GOREL' for term: {term}")
-            return None, None, None, None, None
+            message = f"Invalid Ontology ID: 'GOREL' for term: {term}"
+            return None, None, None, None, None, message
 
         number = match.group(2)
         if len(oid) == 0 or len(number) == 0:
-            print(f"Did not match ontology id or number for term: {term}")
-            return None, None, None, None, None
+            message = f"Did not match ontology id or number for term: {term}"
+            return None, None, None, None, None, message
 
-        term = f"{oid}_{number}"
-
-        if ro is not None and term in ro:
-            # Lookup label for relationship ontology term
-            return oid, number, term, ro[term], "class"
-
-        else:
-            return oid, number, term, None, "class"
+        return oid, number, f"{oid}_{number}", None, "class", None
 
     elif fragment != "":
 
         # Parsed as URL with a fragment, so assume fragment is a
         # predicate
-        return None, None, None, fragment, "predicate"
+        return None, None, None, fragment, "predicate", None
 
     elif isinstance(term, BNode):
 
@@ -224,14 +702,13 @@ def parse_term(term, ro=None):
         # BNode
         oid = "BNode"
         number = Path(path).stem
-        term = f"{oid}_{number}"
-        return oid, number, term, None, "class"
+        return oid, number, f"{oid}_{number}", None, "class", None
 
     else:
 
         # Parsed as URL without a fragment, so assume stem is a
         # literal
-        return None, None, None, Path(path).stem, "literal"
+        return None, None, None, Path(path).stem, "literal", None
 
 
 def count_triple_types(rdf_graph):
@@ -240,8 +717,9 @@ def count_triple_types(rdf_graph):
 
     Parameters
     ----------
-    rdf_graph : rdflib.graph.Graph
-        Graph parsed by rdflib
+    rdf_graph : rdflib.graph.Graph | list(tuple)
+        Graph parsed by rdflib, or list of tuples which contain each
+        triple
 
     Returns
     -------
@@ -269,8 +747,9 @@ def collect_fnode_triples(rdf_graph):
 
     Parameters
     ----------
-    rdf_graph : rdflib.graph.Graph
-        Graph parsed by rdflib
+    rdf_graph : rdflib.graph.Graph | list(tuple)
+        Graph parsed by rdflib, or list of tuples which contain each
+        triple
 
     Returns
     -------
@@ -298,8 +777,9 @@ def collect_bnode_triple_sets(rdf_graph, triple_sets, use="subject", ro=None):
 
     Parameters
     ----------
-    rdf_graph : rdflib.graph.Graph
-        Graph parsed by rdflib
+    rdf_graph : rdflib.graph.Graph | list(tuple)
+        Graph parsed by rdflib, or list of tuples which contain each
+        triple
     triple_sets : dict
         Dictionary containing sets of triples each sharing a common
         BNode. Sets appear to contain triples relating to a relation
@@ -332,36 +812,126 @@ def collect_bnode_triple_sets(rdf_graph, triple_sets, use="subject", ro=None):
         if not isinstance(n, BNode):
             continue
 
-        # Specified node is a BNode, so add it to the dict, and append
-        # the triple to the appropriate set
-        if n not in triple_sets:
-            triple_sets[n] = {}
-            triple_sets[n]["relation"] = []
-            triple_sets[n]["annotation"] = []
-            triple_sets[n]["literal"] = []
-            triple_sets[n]["class"] = []
-            triple_sets[n]["other"] = []
+        add_triple_to_bnode_triple_set(triple_sets, n, s, p, o, ro=ro)
+
+
+def add_triple_to_bnode_triple_set(triple_sets, n, s, p, o, ro=None):
+    """Add a triple to the set of triples sharing the specified BNode,
+    using predicate fragments, then subject or object type, to
+    identify set type.
+
+    Parameters
+    ----------
+    triple_sets : dict
+        Dictionary containing sets of triples each sharing a common
+        BNode. Sets appear to contain triples relating to a relation
+        between classes, an annotation of a class, or a yet to be
+        understood purpose
+    n : rdflib.term.BNode
+        The BNode shared by the set of triples
+    s : rdflib.term.BNode|URIRef
+        Subject of triple
+    p : rdflib.term.URIRef
+        Predicate of triple
+    o : rdflib.term.BNode|Literal|URIRef
+        Object of triple
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+
+    Returns
+    -------
+    None
+    """
+    # Specified node is a BNode, so add it to the dict, and append
+    # the triple to the appropriate set
+    if n not in triple_sets:
+        triple_sets[n] = {}
+        triple_sets[n]["relation"] = []
+        triple_sets[n]["annotation"] = []
+        triple_sets[n]["literal"] = []
+        triple_sets[n]["class"] = []
+        triple_sets[n]["other"] = []
+
+    _, _, _, _, s_term_type = parse_term(s, ro=ro)
+    _, _, _, p_fragment, _ = parse_term(p, ro=ro)
+    _, _, _, _, o_term_type = parse_term(o, ro=ro)
+
+    # First use predicate fragments, then subject or object type,
+    # to identify set type
+    if p_fragment in ["someValuesFrom", "onProperty", "subClassOf"]:
+        triple_sets[n]["relation"].append((s, p, o))
+
+    elif p_fragment in ["annotatedSource", "annotatedProperty", "annotatedTarget"]:
+        triple_sets[n]["annotation"].append((s, p, o))
+
+    elif p_fragment in ["hasDbXref", "source"]:
+        triple_sets[n]["literal"].append((s, p, o))
+
+    elif s_term_type == "class" or o_term_type == "class":
+        triple_sets[n]["class"].append((s, p, o))
+
+    else:
+        triple_sets[n]["other"].append((s, p, o))
+
+
+def classify_triples(rdf_graph, ro=None, fp=None):
+    """Classify all triples in a single pass, counting triple types,
+    collecting filled node triples, and collecting sets of triples
+    each sharing a common BNode, using the subject, then object, as
+    done by count_triple_types, collect_fnode_triples, and
+    collect_bnode_triple_sets, optionally printing each triple.
+
+    Parameters
+    ----------
+    rdf_graph : rdflib.graph.Graph | list(tuple)
+        Graph parsed by rdflib, or list of tuples which contain each
+        triple
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+    fp : None | io.TextIOBase
+        File to which to print each triple
 
-        _, _, _, _, s_term_type = parse_term(s, ro=ro)
-        _, _, _, p_fragment, _ = parse_term(p, ro=ro)
-        _, _, _, _, o_term_type = parse_term(o, ro=ro)
+    Returns
+    -------
+    triple_types : dict
+        Dictionary of counts by triple type (a tuple of subject,
+        predicate, and object type)
+    fnode_triples : list(tuple)
+        List of tuples which contain each filled node triple
+    bnode_triple_sets : dict
+        Dictionary containing sets of triples each sharing a common
+        BNode
+    """
+    triple_types = {}
+    fnode_triples = []
+    bnode_triple_sets = {}
 
-        # First use predicate fragments, then subject or object type,
-        # to identify set type
-        if p_fragment in ["someValuesFrom", "onProperty", "subClassOf"]:
-            triple_sets[n]["relation"].append((s, p, o))
+    for s, p, o in rdf_graph:
 
-        elif p_fragment in ["annotatedSource", "annotatedProperty", "annotatedTarget"]:
-            triple_sets[n]["annotation"].append((s, p, o))
+        if fp is not None:
+            fp.write(str((s, p, o)) + "\n")
 
-        elif p_fragment in ["hasDbXref", "source"]:
-            triple_sets[n]["literal"].append((s, p, o))
+        triple_type = (type(s), type(p), type(o))
 
-        elif s_term_type == "class" or o_term_type == "class":
-            triple_sets[n]["class"].append((s, p, o))
+        if triple_type not in triple_types:
+            triple_types[triple_type] = 1
 
         else:
-            triple_sets[n]["other"].append((s, p, o))
+            triple_types[triple_type] += 1
+
+        s_is_bnode = isinstance(s, BNode)
+        o_is_bnode = isinstance(o, BNode)
+
+        if not s_is_bnode and not o_is_bnode:
+            fnode_triples.append((s, p, o))
+
+        elif s_is_bnode and not o_is_bnode:
+            add_triple_to_bnode_triple_set(bnode_triple_sets, s, s, p, o, ro=ro)
+
+        elif o_is_bnode and not s_is_bnode:
+            add_triple_to_bnode_triple_set(bnode_triple_sets, o, s, p, o, ro=ro)
+
+    return triple_types, fnode_triples, bnode_triple_sets
 
 
 def create_bnode_triples_from_bnode_triple_sets(triple_sets, ro=None):
@@ -537,46 +1107,142 @@ def get_fnode(s, o):
 
 
 def load_triples_into_adb_graph(
-    triples, adb_graph, vertex_collections, edge_collections, ro=None
+    triples,
+    adb_graph,
+    vertex_collections,
+    edge_collections,
+    ro=None,
+    bulk=False,
+    batch_size=BATCH_SIZE,
+    checkpoint=None,
+    incremental=False,
 ):
     """Uses each triple to add vertices, and edges to a graph,
-    additionally adding annotation to vertices.
+    additionally adding annotation to vertices. In bulk mode, all
+    vertex and edge documents are first created in memory, then
+    imported into each collection in batches. Otherwise, vertices and
+    edges are created one by one, but written in batches, and
+    annotation is aggregated by subject so that each annotated vertex
+    is updated once.
+
+    In bulk mode, the fingerprint of each document is recorded in the
+    checkpoint manifest, if any. In incremental mode, which implies
+    bulk mode, only the documents added, changed, or removed since the
+    fingerprints were recorded are written.
 
     Parameters
     ----------
-    triples : list(tuple)
-        List of tuples which contain each triple
+    triples : generator(tuple) | list(tuple)
+        Generator, or list of tuples which contain each triple
     adb_graph : arango.graph.Graph
         An ArangoDB graph instance
     vertex_collections : dict
         A dictionary with vertex name keys containing
-        arango.collection.VertexCollection instance values
+        arango.collection.VertexCollection instance values in bulk,
+        or incremental mode, otherwise adb.CollectionIndex instance
+        values
     edge_collections : dict
         A dictionary with edge name keys containing
-        arango.collection.EdgeCollection instance values
+        arango.collection.EdgeCollection instance values in bulk,
+        or incremental mode, otherwise adb.CollectionIndex instance
+        values
     ro : None | dict
         A dictionary mapping relationship ontology terms to labels
+    bulk : bool
+        Flag to create documents in memory, then import them in bulk
+    batch_size : int
+        Number of documents to import, or write per request
+    checkpoint : None | sqlite3.Connection
+        In bulk mode, checkpoint manifest connection in which to
+        record committed batches, and document fingerprints, and skip
+        batches already committed
+    incremental : bool
+        Flag to write only the differences from the documents
+        fingerprinted in the checkpoint manifest
 
     Returns
     -------
     None
     """
-    for s, p, o in triples:
+    if bulk or incremental:
+        vertices, edges = create_documents_from_triples(triples, ro=ro)
+        if incremental:
+            if checkpoint is not None:
+                fingerprints = adb.read_fingerprints(checkpoint)
+            else:
+                fingerprints = {}
+            if len(fingerprints) == 0:
+                print("No fingerprints recorded, so writing all documents")
+            diff, fingerprints = diff_documents(fingerprints, vertices, edges)
+            apply_document_diff(
+                diff,
+                vertices,
+                edges,
+                adb_graph,
+                vertex_collections,
+                edge_collections,
+                batch_size=batch_size,
+            )
 
-        create_or_get_vertices_from_triple(
-            adb_graph, vertex_collections, s, p, o, ro=ro
-        )
+        else:
+            import_documents_into_adb_graph(
+                vertices,
+                edges,
+                adb_graph,
+                vertex_collections,
+                edge_collections,
+                batch_size=batch_size,
+                checkpoint=checkpoint,
+            )
+            fingerprints = fingerprint_documents(vertices, edges)
+
+        if checkpoint is not None:
+            adb.write_fingerprints(checkpoint, fingerprints)
+        return
 
-        create_or_get_edge_from_triple(
-            adb_graph, vertex_collections, edge_collections, s, p, o, ro=ro
-        )
+    with adb.BatchWriter(max_documents=batch_size) as writer:
 
-    for s, p, o in triples:
+        # Create vertices, and edges, and aggregate annotation by
+        # subject in one pass, so that streamed triples are consumed
+        # once
+        annotations = {}
+        for s, p, o in triples:
 
-        update_vertex_from_triple(adb_graph, vertex_collections, s, p, o, ro=ro)
+            if isinstance(o, Literal):
+                update_vertex_document_from_triple(annotations, s, p, o, ro=ro)
+                continue
+
+            create_or_get_vertices_from_triple(
+                adb_graph, vertex_collections, s, p, o, ro=ro, writer=writer
+            )
+
+            create_or_get_edge_from_triple(
+                adb_graph,
+                vertex_collections,
+                edge_collections,
+                s,
+                p,
+                o,
+                ro=ro,
+                writer=writer,
+            )
+
+        # Write each annotated vertex once
+        for vertex_name, documents in annotations.items():
+            for vertex_key, annotation in documents.items():
+                update_vertex_from_annotation(
+                    adb_graph,
+                    vertex_collections,
+                    vertex_name,
+                    vertex_key,
+                    annotation,
+                    writer=writer,
+                )
 
 
-def create_or_get_vertices_from_triple(adb_graph, vertex_collections, s, p, o, ro=None):
+def create_or_get_vertices_from_triple(
+    adb_graph, vertex_collections, s, p, o, ro=None, writer=None
+):
     """Create, or get vertices defined by the subject and object of
     the triple, creating vertex collections as needed.
 
@@ -586,13 +1252,16 @@ def create_or_get_vertices_from_triple(adb_graph, vertex_collections, s, p, o, r
         An ArangoDB graph instance
     vertex_collections : dict
         A dictionary with vertex name keys containing
-        arango.collection.VertexCollection instance values
+        adb.CollectionIndex instance values, which index
+        arango.collection.VertexCollection instances
     s : rdflib.term.BNode|URIRef
         Subject of triple
     p : rdflib.term.URIRef
         Predicate of triple
     o : rdflib.term.BNode|Literal|URIRef
         Object of triple
+    writer : None | ArangoDB.BatchWriter
+        Batch writer to buffer inserts and updates
 
     Returns
     -------
@@ -617,7 +1286,12 @@ def create_or_get_vertices_from_triple(adb_graph, vertex_collections, s, p, o, r
         vertex_term = term
 
         vertex = create_or_get_vertex(
-            adb_graph, vertex_collections, vertex_name, vertex_key, vertex_term
+            adb_graph,
+            vertex_collections,
+            vertex_name,
+            vertex_key,
+            vertex_term,
+            writer=writer,
         )
 
         if vertex is None:
@@ -630,7 +1304,7 @@ def create_or_get_vertices_from_triple(adb_graph, vertex_collections, s, p, o, r
 
 
 def create_or_get_vertex(
-    adb_graph, vertex_collections, vertex_name, vertex_key, vertex_term
+    adb_graph, vertex_collections, vertex_name, vertex_key, vertex_term, writer=None
 ):
     """Create, or get the identified vertex, creating vertex
     collections as needed.
@@ -641,13 +1315,16 @@ def create_or_get_vertex(
         An ArangoDB graph instance
     vertex_collections : dict
         A dictionary with vertex name keys containing
-        arango.collection.VertexCollection instance values
+        adb.CollectionIndex instance values, which index
+        arango.collection.VertexCollection instances
     vertex_name : str
         The vertex collection name
     vertex_key : str
         The vertex key
     vertex_term : str
         The vertex ontology term
+    writer : None | ArangoDB.BatchWriter
+        Batch writer to buffer inserts and updates
 
     Returns
     -------
@@ -661,8 +1338,8 @@ def create_or_get_vertex(
     vertex = {}
 
     if vertex_name not in vertex_collections:
-        vertex_collections[vertex_name] = adb.create_or_get_vertex_collection(
-            adb_graph, vertex_name
+        vertex_collections[vertex_name] = adb.CollectionIndex(
+            adb.create_or_get_vertex_collection(adb_graph, vertex_name), writer=writer
         )
 
     if not vertex_collections[vertex_name].has(vertex_key):
@@ -679,7 +1356,7 @@ def create_or_get_vertex(
 
 
 def create_or_get_edge_from_triple(
-    adb_graph, vertex_collections, edge_collections, s, p, o, ro=None
+    adb_graph, vertex_collections, edge_collections, s, p, o, ro=None, writer=None
 ):
     """Create, or get edge defined by the subject, predicate, and
     object of the triple, creating edge collections as needed.
@@ -690,10 +1367,12 @@ def create_or_get_edge_from_triple(
         An ArangoDB graph instance
     vertex_collections : dict
         A dictionary with vertex name keys containing
-        arango.collection.VertexCollection instance values
+        adb.CollectionIndex instance values, which index
+        arango.collection.VertexCollection instances
     edge_collections : dict
         A dictionary with edge name keys containing
-        arango.collection.EdgeCollection instance values
+        adb.CollectionIndex instance values, which index
+        arango.collection.EdgeCollection instances
     s : rdflib.term.BNode|URIRef
         Subject of triple
     p : rdflib.term.URIRef
@@ -702,6 +1381,8 @@ def create_or_get_edge_from_triple(
         Object of triple
     ro : None | dict
         A dictionary mapping relationship ontology terms to labels
+    writer : None | ArangoDB.BatchWriter
+        Batch writer to buffer inserts and updates
 
     Returns
     -------
@@ -755,6 +1436,7 @@ def create_or_get_edge_from_triple(
         to_vertex_key,
         to_vertex_term,
         predicate,
+        writer=writer,
     )
 
     return edge
@@ -771,6 +1453,7 @@ def create_or_get_edge(
     to_vertex_key,
     to_vertex_term,
     predicate,
+    writer=None,
 ):  #
     """Create, or get the identified edge, creating edge collections
     as needed.
@@ -781,10 +1464,12 @@ def create_or_get_edge(
         An ArangoDB graph instance
     vertex_collections : dict
         A dictionary with vertex name keys containing
-        arango.collection.VertexCollection instance values
+        adb.CollectionIndex instance values, which index
+        arango.collection.VertexCollection instances
     edge_collections : dict
         A dictionary with edge name keys containing
-        arango.collection.EdgeCollection instance values
+        adb.CollectionIndex instance values, which index
+        arango.collection.EdgeCollection instances
     from_vertex_name : str
         The from vertex collection name
     from_vertex_key : str
@@ -799,6 +1484,8 @@ def create_or_get_edge(
         The to vertex ontology term
     predicate : str
         The predicate with which to label the edge
+    writer : None | ArangoDB.BatchWriter
+        Batch writer to buffer inserts and updates
 
     Returns
     -------
@@ -811,6 +1498,7 @@ def create_or_get_edge(
         from_vertex_name,
         from_vertex_key,
         from_vertex_term,
+        writer=writer,
     )
 
     if from_vertex is None:
@@ -818,7 +1506,12 @@ def create_or_get_edge(
         return
 
     to_vertex = create_or_get_vertex(
-        adb_graph, vertex_collections, to_vertex_name, to_vertex_key, to_vertex_term
+        adb_graph,
+        vertex_collections,
+        to_vertex_name,
+        to_vertex_key,
+        to_vertex_term,
+        writer=writer,
     )
 
     if to_vertex is None:
@@ -831,9 +1524,12 @@ def create_or_get_edge(
     edge_key = f"{from_vertex_key}-{to_vertex_key}"
 
     if edge_name not in edge_collections:
-        edge_collections[edge_name] = adb.create_or_get_edge_collection(
-            adb_graph, from_vertex_name, to_vertex_name
-        )[0]
+        edge_collections[edge_name] = adb.CollectionIndex(
+            adb.create_or_get_edge_collection(
+                adb_graph, from_vertex_name, to_vertex_name
+            )[0],
+            writer=writer,
+        )
 
     if not edge_collections[edge_name].has(edge_key):
         edge = {
@@ -850,10 +1546,11 @@ def create_or_get_edge(
     return edge
 
 
-def update_vertex_from_triple(adb_graph, vertex_collections, s, p, o, ro=None):
-    """Update vertex with annotation defined by the subject,
-    predicate, and object of a triple, creating edge collections as
-    needed.
+def update_vertex_from_annotation(
+    adb_graph, vertex_collections, vertex_name, vertex_key, annotation, writer=None
+):
+    """Update the identified vertex with aggregated annotation,
+    creating the vertex, and vertex collection as needed.
 
     Parameters
     ----------
@@ -861,55 +1558,66 @@ def update_vertex_from_triple(adb_graph, vertex_collections, s, p, o, ro=None):
         An ArangoDB graph instance
     vertex_collections : dict
         A dictionary with vertex name keys containing
-        arango.collection.VertexCollection instance values
-    s : rdflib.term.BNode|URIRef
-        Subject of triple
-    p : rdflib.term.URIRef
-        Predicate of triple
-    o : rdflib.term.BNode|Literal|URIRef
-        Object of triple
-    ro : None | dict
-        A dictionary mapping relationship ontology terms to labels
+        adb.CollectionIndex instance values, which index
+        arango.collection.VertexCollection instances
+    vertex_name : str
+        The vertex collection name
+    vertex_key : str
+        The vertex key
+    annotation : dict
+        A vertex document containing the key, term, and annotation
+    writer : None | ArangoDB.BatchWriter
+        Batch writer to buffer inserts and updates
 
     Returns
     -------
     vertex : dict
         The updated ArangoDB vertex document
     """
-
-    if not isinstance(o, Literal):
-        # print(f"Skipping non-literal object in triple: {(s, p, o)}")
-        return
-
-    s_oid, s_number, s_term, s_fragment, s_term_type = parse_term(s, ro=ro)
-
-    if s_term_type != "class":
-        print(f"Skipping invalid subject type in triple: {(s, p, o)}")
-        return
-
-    vertex_name = s_oid
-    vertex_key = s_number
-    vertex_term = s_term
-
     vertex = create_or_get_vertex(
-        adb_graph, vertex_collections, vertex_name, vertex_key, vertex_term
+        adb_graph,
+        vertex_collections,
+        vertex_name,
+        vertex_key,
+        annotation["term"],
+        writer=writer,
     )
 
     if vertex is None:
         # Message printed in previous function call
         return
 
-    p_oid, p_number, p_term, p_fragment, p_term_type = parse_term(p, ro=ro)
+    for predicate, values in annotation.items():
+        if predicate in ["_key", "term"]:
+            continue
+        if not isinstance(values, list):
+            values = [values]
+        for value in values:
+            add_annotation_value_to_vertex(vertex, predicate, value)
 
-    if not (
-        p_term_type == "predicate"
-        or (p_term_type == "class" and p_fragment is not None)
-    ):
-        print(f"Skipping invalid predicate type in triple: {(s, p, o)}")
-        return
+    vertex_collections[vertex_name].update(vertex)
 
-    predicate = p_fragment
+    return vertex
+
+
+def add_annotation_to_vertex(vertex, predicate, o):
+    """Add annotation defined by the predicate and literal object of a
+    triple to a vertex document, collecting multiple values of the
+    same predicate in a list.
+
+    Parameters
+    ----------
+    vertex : dict
+        The vertex document
+    predicate : str
+        The predicate used as the key in the vertex document
+    o : rdflib.term.Literal
+        Object of triple
 
+    Returns
+    -------
+    None
+    """
     if isinstance(o.value, datetime):
         # Convert datetime objects created by rdflib to strings
         value = str(o.value)
@@ -917,6 +1625,26 @@ def update_vertex_from_triple(adb_graph, vertex_collections, s, p, o, ro=None):
     else:
         value = o.value
 
+    add_annotation_value_to_vertex(vertex, predicate, value)
+
+
+def add_annotation_value_to_vertex(vertex, predicate, value):
+    """Add an annotation value to a vertex document, collecting
+    multiple values of the same predicate in a list.
+
+    Parameters
+    ----------
+    vertex : dict
+        The vertex document
+    predicate : str
+        The predicate used as the key in the vertex document
+    value : bool | float | int | str
+        The annotation value
+
+    Returns
+    -------
+    None
+    """
     # Use the predicate as the key, and the object as the value in the
     # vertex document
     if not predicate in vertex:
@@ -928,9 +1656,669 @@ def update_vertex_from_triple(adb_graph, vertex_collections, s, p, o, ro=None):
         if value not in vertex[predicate]:
             vertex[predicate].append(value)
 
-    vertex_collections[vertex_name].update(vertex)
 
-    return vertex
+def create_documents_from_triples(triples, ro=None):
+    """Create vertex and edge documents from each triple in memory,
+    following the same rules as load_triples_into_adb_graph,
+    additionally merging annotation into vertex documents.
+
+    Parameters
+    ----------
+    triples : list(tuple)
+        List of tuples which contain each triple
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+
+    Returns
+    -------
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    edges : dict
+        A dictionary with (from vertex name, to vertex name) keys
+        containing dictionary values which map edge key to edge
+        document
+    """
+    vertices = {}
+    edges = {}
+
+    for s, p, o in triples:
+
+        if not isinstance(o, Literal):
+            create_vertex_documents_from_triple(vertices, s, p, o, ro=ro)
+            create_edge_document_from_triple(vertices, edges, s, p, o, ro=ro)
+
+        else:
+            update_vertex_document_from_triple(vertices, s, p, o, ro=ro)
+
+    return vertices, edges
+
+
+def create_or_get_vertex_document(vertices, vertex_name, vertex_key, vertex_term):
+    """Create, or get the identified vertex document in memory.
+
+    Parameters
+    ----------
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    vertex_name : str
+        The vertex collection name
+    vertex_key : str
+        The vertex key
+    vertex_term : str
+        The vertex ontology term
+
+    Returns
+    -------
+    vertex : dict
+        The vertex document
+    """
+    if vertex_name not in VALID_VERTICES:
+        print(f"Skipping invalid vertex name: {vertex_name}")
+        return
+
+    if vertex_name not in vertices:
+        vertices[vertex_name] = {}
+
+    if vertex_key not in vertices[vertex_name]:
+        vertices[vertex_name][vertex_key] = {
+            "_key": vertex_key,
+            "term": vertex_term,
+        }
+
+    return vertices[vertex_name][vertex_key]
+
+
+def create_vertex_documents_from_triple(vertices, s, p, o, ro=None):
+    """Create, or get vertex documents defined by the subject and
+    object of the triple in memory.
+
+    Parameters
+    ----------
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    s : rdflib.term.BNode|URIRef
+        Subject of triple
+    p : rdflib.term.URIRef
+        Predicate of triple
+    o : rdflib.term.BNode|URIRef
+        Object of triple
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+
+    Returns
+    -------
+    None
+    """
+    for term in [s, o]:
+
+        oid, number, term, _fragment, term_type = parse_term(term, ro=ro)
+
+        if term_type != "class":
+            continue
+
+        vertex = create_or_get_vertex_document(vertices, oid, number, term)
+
+        if vertex is None:
+            # Message printed in previous function call
+            return
+
+
+def create_edge_document_from_triple(vertices, edges, s, p, o, ro=None):
+    """Create, or get the edge document defined by the subject,
+    predicate, and object of the triple in memory.
+
+    Parameters
+    ----------
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    edges : dict
+        A dictionary with (from vertex name, to vertex name) keys
+        containing dictionary values which map edge key to edge
+        document
+    s : rdflib.term.BNode|URIRef
+        Subject of triple
+    p : rdflib.term.URIRef
+        Predicate of triple
+    o : rdflib.term.BNode|URIRef
+        Object of triple
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+
+    Returns
+    -------
+    None
+    """
+    s_oid, s_number, s_term, _s_fragment, s_term_type = parse_term(s, ro=ro)
+
+    if s_term_type != "class":
+        print(f"Skipping invalid subject type in triple: {(s, p, o)}")
+        return
+
+    _p_oid, _p_number, _p_term, p_fragment, p_term_type = parse_term(p, ro=ro)
+
+    if not (
+        p_term_type == "predicate"
+        or (p_term_type == "class" and p_fragment is not None)
+    ):
+        print(f"Skipping invalid predicate type in triple: {(s, p, o)}")
+        return
+
+    o_oid, o_number, o_term, _o_fragment, o_term_type = parse_term(o, ro=ro)
+
+    if o_term_type != "class" and o_term_type != "literal":
+        print(f"Skipping invalid object type in triple: {(s, p, o)}")
+        return
+
+    if create_or_get_vertex_document(vertices, s_oid, s_number, s_term) is None:
+        # Message printed in previous function call
+        return
+
+    if create_or_get_vertex_document(vertices, o_oid, o_number, o_term) is None:
+        # Message printed in previous function call
+        return
+
+    edge_names = (s_oid, o_oid)
+    edge_key = f"{s_number}-{o_number}"
+
+    if edge_names not in edges:
+        edges[edge_names] = {}
+
+    if edge_key not in edges[edge_names]:
+        edges[edge_names][edge_key] = {
+            "_key": edge_key,
+            "_from": f"{s_oid}/{s_number}",
+            "_to": f"{o_oid}/{o_number}",
+            "label": p_fragment,
+        }
+
+
+def update_vertex_document_from_triple(vertices, s, p, o, ro=None):
+    """Update vertex document in memory with annotation defined by the
+    subject, predicate, and literal object of a triple.
+
+    Parameters
+    ----------
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    s : rdflib.term.BNode|URIRef
+        Subject of triple
+    p : rdflib.term.URIRef
+        Predicate of triple
+    o : rdflib.term.Literal
+        Object of triple
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+
+    Returns
+    -------
+    None
+    """
+    s_oid, s_number, s_term, _s_fragment, s_term_type = parse_term(s, ro=ro)
+
+    if s_term_type != "class":
+        print(f"Skipping invalid subject type in triple: {(s, p, o)}")
+        return
+
+    vertex = create_or_get_vertex_document(vertices, s_oid, s_number, s_term)
+
+    if vertex is None:
+        # Message printed in previous function call
+        return
+
+    _p_oid, _p_number, _p_term, p_fragment, p_term_type = parse_term(p, ro=ro)
+
+    if not (
+        p_term_type == "predicate"
+        or (p_term_type == "class" and p_fragment is not None)
+    ):
+        print(f"Skipping invalid predicate type in triple: {(s, p, o)}")
+        return
+
+    add_annotation_to_vertex(vertex, p_fragment, o)
+
+
+def import_documents_into_adb_graph(
+    vertices,
+    edges,
+    adb_graph,
+    vertex_collections,
+    edge_collections,
+    batch_size=BATCH_SIZE,
+    checkpoint=None,
+):
+    """Import vertex and edge documents into a graph in batches,
+    creating vertex and edge collections as needed. Existing vertices
+    are updated, and existing edges are kept.
+
+    Parameters
+    ----------
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    edges : dict
+        A dictionary with (from vertex name, to vertex name) keys
+        containing dictionary values which map edge key to edge
+        document
+    adb_graph : arango.graph.Graph
+        An ArangoDB graph instance
+    vertex_collections : dict
+        A dictionary with vertex name keys containing
+        arango.collection.VertexCollection instance values
+    edge_collections : dict
+        A dictionary with edge name keys containing
+        arango.collection.EdgeCollection instance values
+    batch_size : None | int
+        Number of documents to import per request, or None to import
+        all documents with one request
+    checkpoint : None | sqlite3.Connection
+        Checkpoint manifest connection in which to record committed
+        batches, and skip batches already committed
+
+    Returns
+    -------
+    None
+    """
+    for vertex_name, documents in vertices.items():
+        import_vertex_documents(
+            list(documents.values()),
+            adb_graph,
+            vertex_collections,
+            vertex_name,
+            batch_size=batch_size,
+            checkpoint=checkpoint,
+        )
+
+    for (from_vertex_name, to_vertex_name), documents in edges.items():
+        import_edge_documents(
+            list(documents.values()),
+            adb_graph,
+            edge_collections,
+            from_vertex_name,
+            to_vertex_name,
+            batch_size=batch_size,
+            checkpoint=checkpoint,
+        )
+
+
+def fingerprint_document(document):
+    """Compute a fingerprint of a document which does not depend on
+    the order of attributes, or of values in a list.
+
+    Parameters
+    ----------
+    document : dict
+        Vertex or edge document
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-1 digest of the document
+    """
+    canonical = {
+        attribute: sorted(value, key=str) if isinstance(value, list) else value
+        for attribute, value in document.items()
+    }
+    return sha1(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def fingerprint_documents(vertices, edges):
+    """Compute the fingerprint, and attribute names of each vertex and
+    edge document.
+
+    Parameters
+    ----------
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    edges : dict
+        A dictionary with (from vertex name, to vertex name) keys
+        containing dictionary values which map edge key to edge
+        document
+
+    Returns
+    -------
+    fingerprints : dict
+        A dictionary with collection name keys containing dictionary
+        values which map document key to a (fingerprint, list of
+        attribute names) tuple
+    """
+    collections = dict(vertices)
+    for (from_vertex_name, to_vertex_name), documents in edges.items():
+        collections[f"{from_vertex_name}-{to_vertex_name}"] = documents
+
+    fingerprints = {}
+    for collection_name, documents in collections.items():
+        fingerprints[collection_name] = {
+            key: (fingerprint_document(document), sorted(document.keys()))
+            for key, document in documents.items()
+        }
+    return fingerprints
+
+
+def diff_documents(fingerprints, vertices, edges):
+    """Compare vertex and edge documents with the fingerprints of
+    those previously loaded, to find the documents added, changed, or
+    removed.
+
+    Changed documents are partial updates which contain all current
+    attributes, and a None value for each attribute removed, so that
+    attributes added by other loaders are kept.
+
+    Parameters
+    ----------
+    fingerprints : dict
+        A dictionary with collection name keys containing dictionary
+        values which map document key to a (fingerprint, list of
+        attribute names) tuple, for the documents previously loaded
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    edges : dict
+        A dictionary with (from vertex name, to vertex name) keys
+        containing dictionary values which map edge key to edge
+        document
+
+    Returns
+    -------
+    diff : dict
+        A dictionary with collection name keys containing dictionary
+        values with "added", and "changed" keys containing lists of
+        documents, and a "removed" key containing a list of document
+        keys
+    new_fingerprints : dict
+        The fingerprints of the vertex and edge documents
+    """
+    collections = dict(vertices)
+    for (from_vertex_name, to_vertex_name), documents in edges.items():
+        collections[f"{from_vertex_name}-{to_vertex_name}"] = documents
+    new_fingerprints = fingerprint_documents(vertices, edges)
+
+    diff = {}
+    for collection_name in sorted(set(new_fingerprints) | set(fingerprints)):
+        old = fingerprints.get(collection_name, {})
+        new = new_fingerprints.get(collection_name, {})
+        documents = collections.get(collection_name, {})
+
+        added = [documents[key] for key in new if key not in old]
+        changed = []
+        for key in new:
+            if key in old and old[key][0] != new[key][0]:
+                document = dict(documents[key])
+                for attribute in old[key][1]:
+                    if attribute not in document:
+                        document[attribute] = None
+                changed.append(document)
+        removed = [key for key in old if key not in new]
+
+        if len(added) > 0 or len(changed) > 0 or len(removed) > 0:
+            diff[collection_name] = {
+                "added": added,
+                "changed": changed,
+                "removed": removed,
+            }
+
+    return diff, new_fingerprints
+
+
+def apply_document_diff(
+    diff,
+    vertices,
+    edges,
+    adb_graph,
+    vertex_collections,
+    edge_collections,
+    batch_size=BATCH_SIZE,
+):
+    """Write documents added, changed, or removed to a graph in
+    batches, creating vertex and edge collections as needed.
+
+    Parameters
+    ----------
+    diff : dict
+        A dictionary with collection name keys containing dictionary
+        values with "added", and "changed" keys containing lists of
+        documents, and a "removed" key containing a list of document
+        keys
+    vertices : dict
+        A dictionary with vertex name keys containing dictionary
+        values which map vertex key to vertex document
+    edges : dict
+        A dictionary with (from vertex name, to vertex name) keys
+        containing dictionary values which map edge key to edge
+        document
+    adb_graph : arango.graph.Graph
+        An ArangoDB graph instance
+    vertex_collections : dict
+        A dictionary with vertex name keys containing
+        arango.collection.VertexCollection instance values
+    edge_collections : dict
+        A dictionary with edge name keys containing
+        arango.collection.EdgeCollection instance values
+    batch_size : None | int
+        Number of documents to write per request, or None to write all
+        documents of a collection with one request
+
+    Returns
+    -------
+    None
+    """
+    edge_names = {f"{f}-{t}": (f, t) for f, t in edges.keys()}
+
+    with adb.BatchWriter(max_documents=batch_size, max_seconds=None) as writer:
+        for collection_name, changes in diff.items():
+
+            # Get, or create the vertex, or edge collection
+            if collection_name in vertex_collections:
+                collection = vertex_collections[collection_name]
+            elif collection_name in edge_collections:
+                collection = edge_collections[collection_name]
+            elif collection_name in vertices or adb_graph.has_vertex_collection(
+                collection_name
+            ):
+                collection = adb.create_or_get_vertex_collection(
+                    adb_graph, collection_name
+                )
+                vertex_collections[collection_name] = collection
+            elif collection_name in edge_names:
+                collection = adb.create_or_get_edge_collection(
+                    adb_graph, *edge_names[collection_name]
+                )[0]
+                edge_collections[collection_name] = collection
+            else:
+                collection = adb_graph.edge_collection(collection_name)
+                edge_collections[collection_name] = collection
+
+            print(
+                f"Applying {len(changes['added'])} added,"
+                f" {len(changes['changed'])} changed, and"
+                f" {len(changes['removed'])} removed documents to: {collection_name}"
+            )
+            for document in changes["added"]:
+                writer.upsert(collection, document)
+            for document in changes["changed"]:
+                writer.update(collection, document)
+            for key in changes["removed"]:
+                writer.delete(collection, key)
+
+
+def import_vertex_documents(
+    documents,
+    adb_graph,
+    vertex_collections,
+    vertex_name,
+    batch_size=BATCH_SIZE,
+    checkpoint=None,
+    operation="upsert",
+):
+    """Import vertex documents into a vertex collection in batches,
+    creating the vertex collection as needed, and updating, or merging
+    into existing vertices.
+
+    Parameters
+    ----------
+    documents : list(dict)
+        List of vertex documents
+    adb_graph : arango.graph.Graph
+        An ArangoDB graph instance
+    vertex_collections : dict
+        A dictionary with vertex name keys containing
+        arango.collection.VertexCollection instance values
+    vertex_name : str
+        The vertex collection name
+    batch_size : None | int
+        Number of documents to import per request, or None to import
+        all documents with one request
+    checkpoint : None | sqlite3.Connection
+        Checkpoint manifest connection in which to record committed
+        batches, and skip batches already committed
+    operation : str
+        Batch writer operation: 'upsert' to update existing vertices,
+        or 'merge' to also take the union of their annotation lists
+
+    Returns
+    -------
+    None
+    """
+    if vertex_name not in vertex_collections:
+        vertex_collections[vertex_name] = adb.create_or_get_vertex_collection(
+            adb_graph, vertex_name
+        )
+
+    print(f"Importing {len(documents)} documents into: {vertex_name}")
+    import_document_batches(
+        documents,
+        vertex_collections[vertex_name],
+        operation,
+        batch_size=batch_size,
+        checkpoint=checkpoint,
+    )
+
+
+def import_edge_documents(
+    documents,
+    adb_graph,
+    edge_collections,
+    from_vertex_name,
+    to_vertex_name,
+    batch_size=BATCH_SIZE,
+    checkpoint=None,
+):
+    """Import edge documents into an edge collection in batches,
+    creating the edge collection as needed, and keeping existing
+    edges.
+
+    Parameters
+    ----------
+    documents : list(dict)
+        List of edge documents
+    adb_graph : arango.graph.Graph
+        An ArangoDB graph instance
+    edge_collections : dict
+        A dictionary with edge name keys containing
+        arango.collection.EdgeCollection instance values
+    from_vertex_name : str
+        The from vertex collection name
+    to_vertex_name : str
+        The to vertex collection name
+    batch_size : None | int
+        Number of documents to import per request, or None to import
+        all documents with one request
+    checkpoint : None | sqlite3.Connection
+        Checkpoint manifest connection in which to record committed
+        batches, and skip batches already committed
+
+    Returns
+    -------
+    None
+    """
+    edge_name = f"{from_vertex_name}-{to_vertex_name}"
+    if edge_name not in edge_collections:
+        edge_collections[edge_name] = adb.create_or_get_edge_collection(
+            adb_graph, from_vertex_name, to_vertex_name
+        )[0]
+
+    print(f"Importing {len(documents)} documents into: {edge_name}")
+    import_document_batches(
+        documents,
+        edge_collections[edge_name],
+        "insert",
+        batch_size=batch_size,
+        checkpoint=checkpoint,
+    )
+
+
+def import_document_batches(
+    documents,
+    collection,
+    operation,
+    batch_size=BATCH_SIZE,
+    checkpoint=None,
+    checkpoint_name=None,
+):
+    """Import documents into a collection in batches. Given a
+    checkpoint manifest, documents are sorted by key so that batches
+    are the same on each run, batches already committed are skipped,
+    and each batch is recorded once written. Since documents have
+    idempotent keys, and are imported ignoring or updating duplicates,
+    a batch interrupted before being recorded can be imported again.
+    BNode keys are not idempotent when streaming, since the parser
+    assigns each BNode a random id, so main does not checkpoint loads
+    that stream BNodes.
+
+    Parameters
+    ----------
+    documents : list(dict)
+        List of vertex or edge documents
+    collection : arango.collection.StandardCollection
+        Vertex or edge collection
+    operation : str
+        Batch writer operation: 'insert', 'upsert', or 'merge'
+    batch_size : None | int
+        Number of documents to import per request, or None to import
+        all documents with one request
+    checkpoint : None | sqlite3.Connection
+        Checkpoint manifest connection in which to record committed
+        batches, and skip batches already committed
+    checkpoint_name : None | str
+        Name of the batches in the checkpoint manifest, default is the
+        collection name
+
+    Returns
+    -------
+    None
+    """
+    if checkpoint is not None:
+        documents = sorted(documents, key=lambda document: document["_key"])
+    if checkpoint_name is None:
+        checkpoint_name = collection.name
+    step = batch_size or max(len(documents), 1)
+
+    n_skipped = 0
+    with adb.BatchWriter(max_documents=None, max_seconds=None) as writer:
+        for i_batch, i_doc in enumerate(range(0, len(documents), step)):
+            batch = documents[i_doc : i_doc + step]
+            if checkpoint is not None and adb.is_batch_committed(
+                checkpoint, checkpoint_name, batch_size, i_batch, batch
+            ):
+                n_skipped += 1
+                continue
+
+            for document in batch:
+                writer.write(collection, operation, document)
+            writer.flush()
+
+            if checkpoint is not None:
+                adb.commit_batch(
+                    checkpoint, checkpoint_name, batch_size, i_batch, batch
+                )
+
+    if n_skipped > 0:
+        print(f"Skipped {n_skipped} committed batches for: {checkpoint_name}")
 
 
 def main():
@@ -949,6 +2337,38 @@ def main():
     parser.add_argument(
         "--include-bnodes", action="store_true", help="include BNodes when loading"
     )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="create all documents in memory, then import them in batches",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="number of documents to import per request in bulk mode",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream triples without populating an rdflib graph, implies --bulk",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "resume a checkpointed load instead of deleting the database,"
+            " implies --bulk"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "write only the differences from the previous checkpointed load,"
+            " implies --bulk"
+        ),
+    )
     group = parser.add_argument_group("Cell Ontology (CL)", "Version of the CL to load")
     exclusive_group = group.add_mutually_exclusive_group(required=True)
     exclusive_group.add_argument(
@@ -960,6 +2380,14 @@ def main():
 
     args = parser.parse_args()
 
+    # The parser assigns each BNode a random id on every run, so the
+    # keys of streamed BNodes differ between checkpointed loads
+    if args.stream and args.include_bnodes and (args.resume or args.incremental):
+        parser.error(
+            "--resume and --incremental cannot be used with --stream and"
+            " --include-bnodes"
+        )
+
     if args.update:
         update_ontologies()
 
@@ -981,71 +2409,98 @@ def main():
 
     if args.label:
         db_name += f"-{args.label}"
-        
+
     ro_filename = "ro.owl"
     log_filename = f"{graph_name}.log"
 
-    print(f"Parsing {cl_dirpath / cl_filename} to populate rdflib graph")
-    rdf_graph = Graph()
-    rdf_graph.parse(cl_dirpath / cl_filename)
+    _, ro, _, _ = parse_ontology(OBO_DIRPATH, ro_filename)
 
-    print(f"Parsing {cl_dirpath / cl_filename} to identify ids")
-    _, _, ids = parse_obo(cl_dirpath, cl_filename)
-    print(ids)
+    if args.stream:
+        triples = stream_triples(cl_dirpath, cl_filename)
+        if not args.include_bnodes:
+            triples = stream_fnode_and_bnode_triples(triples, ro=ro)
 
-    print("Counting triple types in rdflib graph")
-    triple_types = count_triple_types(rdf_graph)
-    pprint(triple_types)
+    else:
+        print(f"Parsing {cl_dirpath / cl_filename} to collect triples and identify ids")
+        triples, _, _, ids = parse_ontology(cl_dirpath, cl_filename)
+        print(ids)
+
+        print("Classifying, and printing all triples in rdflib graph")
+        triples_filename = log_filename.replace(".log", "_triples.txt")
+        with open(triples_filename, "w") as fp:
+            triple_types, fnode_triples, bnode_triple_sets = classify_triples(
+                triples, ro=ro, fp=fp
+            )
+        pprint(triple_types)
+
+        print("Printing all filled node triples in rdflib graph")
+        fnode_triples_filename = log_filename.replace(".log", "_fnode_triples.txt")
+        with open(fnode_triples_filename, "w") as fp:
+            for fnode_triple in fnode_triples:
+                fp.write(str(fnode_triple) + "\n")
+
+        print("Printing all blank node triple sets in rdflib graph")
+        bnode_triple_sets_filename = log_filename.replace(
+            ".log", "_bnode_triple_sets.txt"
+        )
+        with open(bnode_triple_sets_filename, "w") as fp:
+            pprint(bnode_triple_sets, fp)
 
-    print("Printing all triples in rdflib graph")
-    triples = []
-    triples_filename = log_filename.replace(".log", "_triples.txt")
-    with open(triples_filename, "w") as fp:
-        for triple in rdf_graph:
-            triples.append(triple)
-            fp.write(str(triple) + "\n")
-
-    print("Collecting and printing all filled node triples in rdflib graph")
-    fnode_triples = collect_fnode_triples(rdf_graph)
-    fnode_triples_filename = log_filename.replace(".log", "_fnode_triples.txt")
-    with open(fnode_triples_filename, "w") as fp:
-        for fnode_triple in fnode_triples:
-            fp.write(str(fnode_triple) + "\n")
-
-    print("Collecting and printing all blank node triple sets in rdflib graph")
-    bnode_triple_sets = {}
-    ro, _, _ = parse_obo(OBO_DIRPATH, ro_filename)
-    collect_bnode_triple_sets(rdf_graph, bnode_triple_sets, use="subject", ro=ro)
-    collect_bnode_triple_sets(rdf_graph, bnode_triple_sets, use="object", ro=ro)
-    bnode_triple_sets_filename = log_filename.replace(".log", "_bnode_triple_sets.txt")
-    with open(bnode_triple_sets_filename, "w") as fp:
-        pprint(bnode_triple_sets, fp)
-
-    print("Creating and printing all blank node triples in rdflib graph")
-    bnode_triples, ignored_triples = create_bnode_triples_from_bnode_triple_sets(
-        bnode_triple_sets, ro=ro
-    )
-    bnode_triples_filename = log_filename.replace(".log", "_bnode_triples.txt")
-    with open(bnode_triples_filename, "w") as fp:
-        for bnode_triple in bnode_triples:
-            fp.write(str(bnode_triple) + "\n")
-
-    print("Creating ArangoDB database and graph, and loading triples")
-    adb.delete_database(db_name)
-    db = adb.create_or_get_database(db_name)
-    adb.delete_graph(db, graph_name)
+        print("Creating and printing all blank node triples in rdflib graph")
+        bnode_triples, ignored_triples = create_bnode_triples_from_bnode_triple_sets(
+            bnode_triple_sets, ro=ro
+        )
+        bnode_triples_filename = log_filename.replace(".log", "_bnode_triples.txt")
+        with open(bnode_triples_filename, "w") as fp:
+            for bnode_triple in bnode_triples:
+                fp.write(str(bnode_triple) + "\n")
+
+    bulk = args.bulk or args.stream or args.resume or args.incremental
+    checkpoint_filepath = Path(adb.CHECKPOINT_DIR) / f"{db_name}.sqlite"
+    if args.resume:
+        print("Getting ArangoDB database and graph, and resuming loading triples")
+        db = adb.create_or_get_database(db_name)
+
+    elif args.incremental:
+        print("Getting ArangoDB database and graph, and applying triple differences")
+        db = adb.create_or_get_database(db_name)
+
+    else:
+        print("Creating ArangoDB database and graph, and loading triples")
+        adb.delete_database(db_name)
+        adb.delete_checkpoint(checkpoint_filepath)
+        db = adb.create_or_get_database(db_name)
+        adb.delete_graph(db, graph_name)
     adb_graph = adb.create_or_get_graph(db, graph_name)
     if args.include_bnodes:
         VALID_VERTICES.update(set(["BNode", "RO"]))
         triples_to_populate = triples
+    elif args.stream:
+        triples_to_populate = triples
     else:
         triples_to_populate = fnode_triples.copy()
         triples_to_populate.extend(bnode_triples)
     vertex_collections = {}
     edge_collections = {}
-    load_triples_into_adb_graph(
-        triples_to_populate, adb_graph, vertex_collections, edge_collections, ro=ro
-    )
+    checkpoint = adb.open_checkpoint(checkpoint_filepath) if bulk else None
+    try:
+        load_triples_into_adb_graph(
+            triples_to_populate,
+            adb_graph,
+            vertex_collections,
+            edge_collections,
+            ro=ro,
+            bulk=bulk,
+            batch_size=args.batch_size,
+            checkpoint=checkpoint,
+            incremental=args.incremental,
+        )
+
+    finally:
+
+        # Close the checkpoint manifest, even on error
+        if checkpoint is not None:
+            checkpoint.close()
 
 
 if __name__ == "__main__":
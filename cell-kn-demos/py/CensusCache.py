@@ -0,0 +1,335 @@
+import itertools
+import json
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Cell metadata columns read from the Census, including each column
+# used to partition the cache
+OBS_COLUMNS = [
+    "soma_joinid",
+    "dataset_id",
+    "assay",
+    "assay_ontology_term_id",
+    "cell_type",
+    "cell_type_ontology_term_id",
+    "disease",
+    "disease_ontology_term_id",
+    "tissue",
+    "tissue_ontology_term_id",
+    "tissue_general",
+    "tissue_general_ontology_term_id",
+]
+PARTITION_COLUMNS = ["organism", "tissue_general"]
+CATEGORY_TYPE = pa.dictionary(pa.int32(), pa.string())
+ROW_GROUP_SIZE = 1_000_000
+
+# Manifest of the organism, and tissue partitions written, and their
+# columns, ignored by pyarrow when reading the dataset
+MANIFEST_FILENAME = "_partitions.json"
+
+
+def encode_categories(table):
+    """Dictionary encode each string column of a table, so that it is
+    stored once per row group, and read as a categorical column.
+
+    Parameters
+    ----------
+    table : pa.Table
+        Table to encode
+
+    Returns
+    -------
+    pa.Table
+        Table with string columns dictionary encoded
+    """
+    for i_field, field in enumerate(table.schema):
+        field_type = field.type
+        if pa.types.is_dictionary(field_type):
+            field_type = field_type.value_type
+        if pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+            table = table.set_column(
+                i_field, field.name, table.column(i_field).cast(CATEGORY_TYPE)
+            )
+    return table
+
+
+def add_partition_columns(column_names):
+    """Add each column used to partition the cache, which is read from
+    the Census, that is, all but the organism, to the given columns.
+
+    Parameters
+    ----------
+    column_names : list(str)
+        Names of the columns
+
+    Returns
+    -------
+    list(str)
+        Names of the given columns, followed by any partition column
+        missing
+    """
+    return list(
+        dict.fromkeys(
+            list(column_names) + [c for c in PARTITION_COLUMNS if c != "organism"]
+        )
+    )
+
+
+def read_obs_batches(census, organism, tissues, column_names=OBS_COLUMNS):
+    """Read cell metadata for primary data in the given tissues of an
+    organism from the Census, one chunk at a time, projecting only the
+    given columns, and any partition column, and appending an organism
+    column.
+
+    Parameters
+    ----------
+    census : cellxgene_census.CensusObject
+        Opened Census
+    organism : str
+        Organism, for example "homo_sapiens"
+    tissues : list(str)
+        List of general tissues, for example ["lung"]
+    column_names : list(str)
+        Names of the columns to read
+
+    Returns
+    -------
+    generator(pa.RecordBatch)
+        Dictionary encoded batches of cell metadata
+    """
+    obs = census["census_data"][organism].obs
+    for table in obs.read(
+        value_filter=f"tissue_general in {tissues} and is_primary_data == True",
+        column_names=add_partition_columns(column_names),
+    ):
+        table = table.append_column(
+            "organism", pa.array([organism] * len(table), type=pa.string())
+        )
+        yield from encode_categories(table).to_batches()
+
+
+def write_batches(batches, dataset_dirpath, partitioning=PARTITION_COLUMNS):
+    """Stream batches into a Parquet dataset partitioned by the given
+    columns, replacing any partition written, so that at most a few
+    batches are held in memory. Row groups are written with column
+    statistics, so that filtered reads skip row groups.
+
+    Parameters
+    ----------
+    batches : iterable(pa.RecordBatch)
+        Batches sharing one schema
+    dataset_dirpath : str | Path
+        Path of the dataset directory
+    partitioning : list(str)
+        Names of the columns used to partition the dataset
+
+    Returns
+    -------
+    n_rows : int
+        Number of rows written
+    """
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        return 0
+    n_rows = 0
+
+    def count(batches):
+        nonlocal n_rows
+        for batch in batches:
+            n_rows += batch.num_rows
+            yield batch
+
+    ds.write_dataset(
+        count(itertools.chain([first], batches)),
+        Path(dataset_dirpath),
+        schema=first.schema,
+        format="parquet",
+        partitioning=partitioning,
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+        file_options=ds.ParquetFileFormat().make_write_options(
+            compression="zstd", write_statistics=True
+        ),
+        min_rows_per_group=ROW_GROUP_SIZE,
+        max_rows_per_group=ROW_GROUP_SIZE,
+    )
+    return n_rows
+
+
+def read_manifest(dataset_dirpath):
+    """Read the manifest of partitions written to a dataset.
+
+    Parameters
+    ----------
+    dataset_dirpath : str | Path
+        Path of the dataset directory
+
+    Returns
+    -------
+    manifest : dict
+        Dictionary mapping "organism/tissue" partition key to the list
+        of columns written, empty if the manifest does not exist
+    """
+    manifest_filepath = Path(dataset_dirpath) / MANIFEST_FILENAME
+    if not manifest_filepath.exists():
+        return {}
+    with open(manifest_filepath, "r") as fp:
+        return json.load(fp)
+
+
+def get_missing_partitions(dataset_dirpath, organisms, tissues, column_names):
+    """Find the tissues of each organism which have not been written
+    to a dataset with at least the given columns.
+
+    Parameters
+    ----------
+    dataset_dirpath : str | Path
+        Path of the dataset directory
+    organisms : list(str)
+        List of organisms
+    tissues : list(str)
+        List of general tissues
+    column_names : list(str)
+        Names of the columns required
+
+    Returns
+    -------
+    missing : dict
+        Dictionary mapping organism to list of missing tissues, with
+        only organisms missing a tissue
+    """
+    manifest = read_manifest(dataset_dirpath)
+    missing = {}
+    for organism in organisms:
+        for tissue in tissues:
+            key = f"{organism}/{tissue}"
+            if key not in manifest or not set(column_names) <= set(manifest[key]):
+                missing.setdefault(organism, []).append(tissue)
+    return missing
+
+
+def get_partition_columns(dataset_dirpath, organism, tissues, column_names):
+    """Get the union of the given columns, any partition column, and
+    the columns written for the tissues of an organism, so that
+    rewriting the partitions never drops a column.
+
+    Parameters
+    ----------
+    dataset_dirpath : str | Path
+        Path of the dataset directory
+    organism : str
+        Organism
+    tissues : list(str)
+        List of general tissues
+    column_names : list(str)
+        Names of the columns required
+
+    Returns
+    -------
+    list(str)
+        Names of the given columns, followed by any partition column,
+        and any other column written
+    """
+    manifest = read_manifest(dataset_dirpath)
+    columns = dict.fromkeys(add_partition_columns(column_names))
+    for tissue in tissues:
+        columns.update(dict.fromkeys(manifest.get(f"{organism}/{tissue}", [])))
+    return list(columns)
+
+
+def update_manifest(dataset_dirpath, organism, tissues, column_names):
+    """Record the tissues of an organism as written to a dataset with
+    the given columns.
+
+    Parameters
+    ----------
+    dataset_dirpath : str | Path
+        Path of the dataset directory
+    organism : str
+        Organism
+    tissues : list(str)
+        List of general tissues written
+    column_names : list(str)
+        Names of the columns written
+
+    Returns
+    -------
+    None
+    """
+    manifest = read_manifest(dataset_dirpath)
+    for tissue in tissues:
+        manifest[f"{organism}/{tissue}"] = list(column_names)
+    Path(dataset_dirpath).mkdir(parents=True, exist_ok=True)
+    with open(Path(dataset_dirpath) / MANIFEST_FILENAME, "w") as fp:
+        json.dump(manifest, fp, indent=4)
+
+
+def query_obs(
+    dataset_dirpath, organisms=None, tissues=None, columns=None, filters=None
+):
+    """Read cell metadata from a dataset, reading only the partitions
+    of the given organisms, and tissues, and only the given columns,
+    and skipping row groups using the filters, and column statistics.
+    Columns missing from a partition are read as null. If no cells have
+    been written, for example since no requested tissue has primary
+    cells, the DataFrame is empty.
+
+    Parameters
+    ----------
+    dataset_dirpath : str | Path
+        Path of the dataset directory
+    organisms : None | list(str)
+        List of organisms, default all
+    tissues : None | list(str)
+        List of general tissues, default all
+    columns : None | list(str)
+        Names of the columns to read, default all
+    filters : None | list(tuple) | list(list(tuple)) | ds.Expression
+        Filters, in the form accepted by pd.read_parquet, default none
+
+    Returns
+    -------
+    obs : pd.DataFrame
+        DataFrame containing cell metadata, with string columns as
+        categories
+    """
+    # Return an empty DataFrame if no partitions have been written
+    if not Path(dataset_dirpath).exists():
+        return pd.DataFrame(columns=columns)
+    partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+    dataset = ds.dataset(
+        Path(dataset_dirpath), format="parquet", partitioning=partitioning
+    )
+    fragments = list(dataset.get_fragments())
+    if len(fragments) == 0 or not set(PARTITION_COLUMNS) <= set(dataset.schema.names):
+        return pd.DataFrame(columns=columns)
+
+    # Unify the schemas of all files, since partitions may have been
+    # written with different columns
+    schema = pa.unify_schemas(
+        [dataset.schema] + [fragment.physical_schema for fragment in fragments]
+    )
+    dataset = ds.dataset(
+        Path(dataset_dirpath),
+        schema=schema,
+        format="parquet",
+        partitioning=partitioning,
+    )
+    expressions = []
+    if organisms is not None:
+        expressions.append(ds.field("organism").isin(organisms))
+    if tissues is not None:
+        expressions.append(ds.field("tissue_general").isin(tissues))
+    if filters is not None:
+        if not isinstance(filters, ds.Expression):
+            filters = pq.filters_to_expression(filters)
+        expressions.append(filters)
+    expression = None
+    for other in expressions:
+        expression = other if expression is None else expression & other
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
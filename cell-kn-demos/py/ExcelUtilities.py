@@ -0,0 +1,133 @@
+from hashlib import sha1
+import json
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+DIGEST_LENGTH = 12
+
+
+def get_cache_filepath(excel_filepath, sheet, kwargs, content_digest):
+    """Get the path of the Parquet file caching one sheet of an Excel
+    workbook, read with the given arguments. The file sits next to the
+    workbook, and its name contains a digest of the workbook content,
+    followed by a digest of the arguments.
+
+    Parameters
+    ----------
+    excel_filepath : Path
+        Path of the Excel workbook
+    sheet : int | str
+        Index or name of the sheet
+    kwargs : dict
+        Keyword arguments passed to pd.read_excel for the sheet
+    content_digest : str
+        SHA-1 digest of the workbook content
+
+    Returns
+    -------
+    Path
+        Path of the Parquet file
+    """
+    spec = json.dumps(kwargs, sort_keys=True, default=str)
+    kwargs_digest = sha1(spec.encode()).hexdigest()[:DIGEST_LENGTH]
+    return excel_filepath.with_name(
+        f"{excel_filepath.stem}-{sheet}-{content_digest[:DIGEST_LENGTH]}"
+        f"-{kwargs_digest}.parquet"
+    )
+
+
+def remove_stale_cache_files(excel_filepath, sheet, content_digest):
+    """Remove the Parquet files caching one sheet of an Excel workbook
+    with previous content, keeping those read with other arguments.
+
+    Parameters
+    ----------
+    excel_filepath : Path
+        Path of the Excel workbook
+    sheet : int | str
+        Index or name of the sheet
+    content_digest : str
+        SHA-1 digest of the workbook content
+
+    Returns
+    -------
+    None
+    """
+    prefix = f"{excel_filepath.stem}-{sheet}"
+    for cache_filepath in excel_filepath.parent.glob(f"{prefix}-*-*.parquet"):
+
+        # Skip files of other sheets whose name starts with the prefix
+        cache_prefix, cache_digest, _ = cache_filepath.stem.rsplit("-", 2)
+        if cache_prefix != prefix:
+            continue
+
+        if cache_digest != content_digest[:DIGEST_LENGTH]:
+            print(f"Removing {cache_filepath}")
+            cache_filepath.unlink()
+
+
+def read_workbook(excel_filepath, sheets, use_cache=True):
+    """Read the needed sheets of an Excel workbook in a single pass,
+    keeping only the needed columns, and cache each resulting
+    DataFrame as Parquet next to the workbook. The cache is keyed by
+    the workbook content, and the read arguments, so later runs load
+    the Parquet files without parsing the workbook, until either
+    changes.
+
+    Parameters
+    ----------
+    excel_filepath : str | Path
+        Path of the Excel workbook
+    sheets : dict
+        Dictionary mapping the index or name of each sheet to the
+        keyword arguments passed to pd.read_excel for that sheet, for
+        example, header, and usecols
+    use_cache : bool
+        Flag to read, and write cached results
+
+    Returns
+    -------
+    data : dict
+        Dictionary mapping the index or name of each sheet to a
+        DataFrame containing its data
+    """
+    excel_filepath = Path(excel_filepath)
+    content_digest = sha1(excel_filepath.read_bytes()).hexdigest()
+    cache_filepaths = {
+        sheet: get_cache_filepath(excel_filepath, sheet, kwargs, content_digest)
+        for sheet, kwargs in sheets.items()
+    }
+
+    # Read cached results, if all sheets are cached
+    if use_cache and all(fp.exists() for fp in cache_filepaths.values()):
+        data = {}
+        for sheet, cache_filepath in cache_filepaths.items():
+            print(f"Reading {cache_filepath}")
+            data[sheet] = pd.read_parquet(cache_filepath)
+        return data
+
+    # Parse the workbook once for all sheets
+    print(f"Reading {excel_filepath}")
+    data = {}
+    with pd.ExcelFile(excel_filepath) as excel_file:
+        for sheet, kwargs in sheets.items():
+            data[sheet] = excel_file.parse(sheet_name=sheet, **kwargs)
+
+    if use_cache:
+        for sheet, cache_filepath in cache_filepaths.items():
+
+            # Remove results cached for previous content
+            remove_stale_cache_files(excel_filepath, sheet, content_digest)
+
+            # Columns of mixed type cannot be written, in which case
+            # the workbook is read again on the next run
+            print(f"Writing {cache_filepath}")
+            try:
+                data[sheet].to_parquet(cache_filepath)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as exc:
+                print(f"Could not write {cache_filepath}: {exc}")
+                cache_filepath.unlink(missing_ok=True)
+
+    return data
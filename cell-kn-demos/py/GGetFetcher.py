@@ -0,0 +1,346 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import json
+from pathlib import Path
+import sqlite3
+from threading import Lock
+from time import perf_counter, sleep
+
+import requests
+
+GGET_CACHE_FILEPATH = Path("../data/gget/opentargets.sqlite")
+MAX_WORKERS = 8
+RATE = 10.0
+BURST = 10
+MAX_RETRIES = 3
+BACKOFF = 1.0
+RETRY_EXCEPTIONS = (requests.exceptions.RequestException,)
+PROGRESS_INTERVAL = 100
+RESOURCES = [
+    "diseases",
+    "drugs",
+    "interactions",
+    "pharmacogenetics",
+    "tractability",
+    "expression",
+    "depmap",
+]
+
+
+class TokenBucket:
+    """Limit the rate of calls across threads, allowing short bursts.
+
+    Parameters
+    ----------
+    rate : float
+        Number of tokens added per second
+    capacity : int
+        Maximum number of tokens held, so maximum burst size
+    """
+
+    def __init__(self, rate=RATE, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = perf_counter()
+        self.lock = Lock()
+
+    def acquire(self):
+        """Take a token, waiting until one is available.
+
+        Returns
+        -------
+        None
+        """
+        while True:
+            with self.lock:
+                now = perf_counter()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+
+
+def open_cache(cache_filepath):
+    """Open, or create a cache of gget results for each gene id and
+    resource.
+
+    Parameters
+    ----------
+    cache_filepath : str | pathlib.Path
+        Path of the SQLite cache
+
+    Returns
+    -------
+    cache : sqlite3.Connection
+        Cache connection
+    """
+    Path(cache_filepath).parent.mkdir(parents=True, exist_ok=True)
+    cache = sqlite3.connect(cache_filepath)
+    cache.execute(
+        """
+        CREATE TABLE IF NOT EXISTS resources (
+            gene_id TEXT NOT NULL,
+            resource TEXT NOT NULL,
+            data TEXT NOT NULL,
+            fetched TEXT NOT NULL,
+            PRIMARY KEY (gene_id, resource)
+        )
+        """
+    )
+    cache.commit()
+    return cache
+
+
+class GGetFetcher:
+    """Fetch Open Targets resources for many gene ids using gget,
+    concurrently, at a limited rate, retrying failed calls with
+    exponential backoff, and caching each result on disk, so that
+    reruns, and overlapping gene id lists never fetch a result twice.
+    Use as a context manager to close the cache on exit.
+
+    Parameters
+    ----------
+    cache_filepath : str | pathlib.Path
+        Path of the SQLite cache, shared by default so that loaders
+        never fetch a result another has fetched
+    function : None | function
+        Function called with a gene id, and resource, default
+        gget.opentargets
+    max_workers : int
+        Maximum number of calls in flight
+    rate : float
+        Maximum number of calls per second
+    burst : int
+        Maximum number of calls made at once after idling
+    max_retries : int
+        Maximum number of times a failed call is retried
+    backoff : float
+        Seconds waited before the first retry, doubled for each
+        following retry
+    retry_exceptions : tuple(type)
+        Exception types of transient failures, which are retried,
+        default requests and HTTP errors
+    verbose : bool
+        Flag to print progress
+    """
+
+    def __init__(
+        self,
+        cache_filepath=GGET_CACHE_FILEPATH,
+        function=None,
+        max_workers=MAX_WORKERS,
+        rate=RATE,
+        burst=BURST,
+        max_retries=MAX_RETRIES,
+        backoff=BACKOFF,
+        retry_exceptions=RETRY_EXCEPTIONS,
+        verbose=True,
+    ):
+        if function is None:
+            import gget
+
+            def function(gene_id, resource):
+                return gget.opentargets(gene_id, resource=resource, json=True)
+
+        self.function = function
+        self.cache = open_cache(cache_filepath)
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retry_exceptions = retry_exceptions
+        self.verbose = verbose
+        self.lock = Lock()
+        self.metrics = {
+            "requested": 0,
+            "cached": 0,
+            "fetched": 0,
+            "retried": 0,
+            "failed": 0,
+            "seconds": 0.0,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self, gene_id, resource, default=None):
+        """Read a cached result.
+
+        Parameters
+        ----------
+        gene_id : str
+            Gene id
+        resource : str
+            Open Targets resource
+        default : object
+            Value returned if the result is not cached
+
+        Returns
+        -------
+        object
+            Cached result, or the default if not cached
+        """
+        row = self.cache.execute(
+            "SELECT data FROM resources WHERE gene_id = ? AND resource = ?",
+            (gene_id, resource),
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+    def write(self, gene_id, resource, data):
+        """Write a result to the cache.
+
+        Parameters
+        ----------
+        gene_id : str
+            Gene id
+        resource : str
+            Open Targets resource
+        data : object
+            Result
+
+        Returns
+        -------
+        None
+        """
+        self.cache.execute(
+            "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?)",
+            (gene_id, resource, json.dumps(data), datetime.now().isoformat()),
+        )
+        self.cache.commit()
+
+    def call(self, gene_id, resource):
+        """Call the function at the limited rate, retrying transient
+        failures with exponential backoff.
+
+        Parameters
+        ----------
+        gene_id : str
+            Gene id
+        resource : str
+            Open Targets resource
+
+        Returns
+        -------
+        object
+            Result
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return self.function(gene_id, resource)
+            except self.retry_exceptions:
+                if attempt == self.max_retries:
+                    raise
+                with self.lock:
+                    self.metrics["retried"] += 1
+                sleep(self.backoff * 2**attempt)
+
+    def update(self, gene_ids, resources=RESOURCES):
+        """Fetch and cache each resource for each gene id which is not
+        cached, without reading cached results.
+
+        Parameters
+        ----------
+        gene_ids : list(str)
+            Gene ids
+        resources : list(str)
+            Open Targets resources
+
+        Returns
+        -------
+        failed : list(tuple)
+            Gene id and resource of each call which failed
+        """
+        start = perf_counter()
+
+        # Collect the results to fetch, reading only cached keys
+        cached = set(self.cache.execute("SELECT gene_id, resource FROM resources"))
+        requested = [
+            (gene_id, resource)
+            for gene_id in dict.fromkeys(gene_ids)
+            for resource in resources
+        ]
+        pending = [key for key in requested if key not in cached]
+        self.metrics["requested"] += len(requested)
+        self.metrics["cached"] += len(requested) - len(pending)
+        if self.verbose:
+            print(
+                f"Found {len(requested) - len(pending)} cached results,"
+                f" fetching {len(pending)}"
+            )
+
+        # Fetch the others concurrently, caching each result from this
+        # thread as it arrives
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.call, gene_id, resource): (gene_id, resource)
+                for gene_id, resource in pending
+            }
+            for i_future, future in enumerate(as_completed(futures), 1):
+                gene_id, resource = futures[future]
+                try:
+                    self.write(gene_id, resource, future.result())
+                    self.metrics["fetched"] += 1
+                except Exception as exc:
+                    print(
+                        f"Could not gget resource: {resource} for id: {gene_id}:"
+                        f" {exc}"
+                    )
+                    failed.append((gene_id, resource))
+                    self.metrics["failed"] += 1
+                if self.verbose and (
+                    i_future % PROGRESS_INTERVAL == 0 or i_future == len(futures)
+                ):
+                    seconds = perf_counter() - start
+                    print(
+                        f"Fetched {i_future} of {len(futures)} results"
+                        f" in {seconds:.3f} s ({i_future / seconds:.1f} /s)"
+                    )
+
+        self.metrics["seconds"] += perf_counter() - start
+        return failed
+
+    def fetch(self, gene_ids, resources=RESOURCES):
+        """Fetch each resource for each gene id, reading cached results,
+        and fetching and caching the others.
+
+        Parameters
+        ----------
+        gene_ids : list(str)
+            Gene ids
+        resources : list(str)
+            Open Targets resources
+
+        Returns
+        -------
+        results : dict
+            Dictionary mapping gene id to a dictionary mapping resource
+            to result, which is empty if the call failed
+        """
+        self.update(gene_ids, resources)
+        return {
+            gene_id: {
+                resource: self.read(gene_id, resource, default={})
+                for resource in resources
+            }
+            for gene_id in gene_ids
+        }
+
+    def close(self):
+        """Close the cache.
+
+        Returns
+        -------
+        None
+        """
+        self.cache.close()
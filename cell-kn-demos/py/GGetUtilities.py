@@ -2,14 +2,13 @@ import ast
 import json
 from pathlib import Path
 
-import gget
 import pandas as pd
-import scanpy as sc
+
+from GGetFetcher import GGetFetcher
+from GeneIndex import get_gene_index
 
 # Retrieve gene symbols
-annot = sc.queries.biomart_annotations(
-    "hsapiens", ["ensembl_gene_id", "external_gene_name"], use_cache=True
-).set_index("external_gene_name")
+gene_index = get_gene_index()
 
 # Load the manually curated data
 mdata_dirname = Path("../data/cell-kn")
@@ -26,12 +25,8 @@ marker_names = []
 # Create a dictionary of marker ids, using marker names as keys
 marker_ids = {}
 for marker_name in marker_names:
-    if marker_name in annot.index:
-        mid = annot.loc[marker_name, "ensembl_gene_id"]
-        if isinstance(mid, pd.core.series.Series):
-            marker_ids[marker_name] = mid.to_list()
-        else:
-            marker_ids[marker_name] = [mid]
+    if marker_name in gene_index:
+        marker_ids[marker_name] = list(gene_index[marker_name])
     else:
         print(f"Could not find marker name: {marker_name}")
 
@@ -46,28 +41,17 @@ resources = [
 ]
 gdata = {}
 gdata["resources"] = resources
-# nMNm = 0
+
+# Fetch resources for all marker ids at once, concurrently
+with GGetFetcher() as fetcher:
+    results = fetcher.fetch(
+        sorted(set(mid for mids in marker_ids.values() for mid in mids)), resources
+    )
 for mname, mids in marker_ids.items():
-    # nMNm += 1
     gdata[mname] = {}
     gdata[mname]["ids"] = mids
-
-    # Get resources for each marker id
     for mid in mids:
-        gdata[mname][mid] = {}
-        for resource in resources:
-            try:
-                gdata[mname][mid][resource] = gget.opentargets(
-                    mid, resource=resource, json=True, verbose=True
-                )
-            except Exception as exc:
-                gdata[mname][mid][resource] = {}
-                print(
-                    f"Could not gget resource: {resource} for marker id: {mid} for marker name: {mname}"
-                )
-
-    # if nMNm == 8:
-    #     break
+        gdata[mname][mid] = results[mid]
 
 # Write the resources for all marker names to a JSON file
 gdata_filename = mdata_filename.replace(".xlsm", ".json")
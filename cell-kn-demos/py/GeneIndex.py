@@ -0,0 +1,208 @@
+from datetime import datetime
+import json
+from pathlib import Path
+from types import MappingProxyType
+
+GENE_INDEX_FILEPATH = Path("../data/biomart/hsapiens-gene-index.json")
+GENE_INDEX_VERSION = 1
+BIOMART_ATTRIBUTES = ["ensembl_gene_id", "external_gene_name", "external_synonym"]
+
+
+def build_map(pairs):
+    """Build an immutable map from each name to the tuple of ids
+    paired with it, in order of first appearance.
+
+    Parameters
+    ----------
+    pairs : iterable(tuple)
+        Name and id pairs
+
+    Returns
+    -------
+    MappingProxyType
+        Map from name to tuple of ids
+    """
+    n2ids = {}
+    for name, id in pairs:
+        n2ids.setdefault(name, {})[id] = None
+    return MappingProxyType({name: tuple(ids) for name, ids in n2ids.items()})
+
+
+class GeneIndex:
+    """Map gene symbols to Ensembl gene ids using dictionaries built
+    once from the BioMart table. Lookups match the symbol exactly,
+    then a synonym exactly, then the symbol, and synonym, ignoring
+    case.
+
+    Parameters
+    ----------
+    symbols : dict
+        Dictionary mapping gene symbol to list of Ensembl gene ids
+    synonyms : None | dict
+        Dictionary mapping gene synonym to list of Ensembl gene ids
+    created : None | str
+        Time the index was built, in ISO format, default now
+    """
+
+    def __init__(self, symbols, synonyms=None, created=None):
+        self.symbols = build_map(
+            (symbol, id) for symbol, ids in symbols.items() for id in ids
+        )
+        self.synonyms = build_map(
+            (synonym, id) for synonym, ids in (synonyms or {}).items() for id in ids
+        )
+        self.folded_symbols = build_map(
+            (symbol.casefold(), id)
+            for symbol, ids in self.symbols.items()
+            for id in ids
+        )
+        self.folded_synonyms = build_map(
+            (synonym.casefold(), id)
+            for synonym, ids in self.synonyms.items()
+            for id in ids
+        )
+        self.created = created or datetime.now().isoformat()
+
+    @classmethod
+    def from_biomart(cls, annot):
+        """Build an index from a BioMart table.
+
+        Parameters
+        ----------
+        annot : pd.DataFrame
+            DataFrame containing ensembl_gene_id, external_gene_name,
+            and optionally external_synonym columns
+
+        Returns
+        -------
+        GeneIndex
+            Gene index
+        """
+        annot = annot.dropna(subset=["ensembl_gene_id", "external_gene_name"])
+        symbols = build_map(zip(annot["external_gene_name"], annot["ensembl_gene_id"]))
+        synonyms = {}
+        if "external_synonym" in annot.columns:
+            annot = annot.dropna(subset=["external_synonym"])
+            synonyms = build_map(
+                zip(annot["external_synonym"], annot["ensembl_gene_id"])
+            )
+        return cls(symbols, synonyms)
+
+    @classmethod
+    def load(cls, index_filepath):
+        """Load an index, if it exists and has the current version.
+
+        Parameters
+        ----------
+        index_filepath : str | Path
+            Path of the JSON index file
+
+        Returns
+        -------
+        None | GeneIndex
+            Gene index, or None if the file is missing or stale
+        """
+        index_filepath = Path(index_filepath)
+        if not index_filepath.exists():
+            return None
+        with open(index_filepath, "r") as fp:
+            data = json.load(fp)
+        if data.get("version") != GENE_INDEX_VERSION:
+            return None
+        return cls(data["symbols"], data["synonyms"], created=data["created"])
+
+    def save(self, index_filepath):
+        """Save the index with a version stamp.
+
+        Parameters
+        ----------
+        index_filepath : str | Path
+            Path of the JSON index file
+
+        Returns
+        -------
+        None
+        """
+        index_filepath = Path(index_filepath)
+        index_filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(index_filepath, "w") as fp:
+            json.dump(
+                {
+                    "version": GENE_INDEX_VERSION,
+                    "created": self.created,
+                    "symbols": dict(self.symbols),
+                    "synonyms": dict(self.synonyms),
+                },
+                fp,
+            )
+
+    def lookup(self, name):
+        """Map a gene symbol, or synonym to Ensembl gene ids.
+
+        Parameters
+        ----------
+        name : str
+            Gene symbol, or synonym
+
+        Returns
+        -------
+        tuple(str)
+            Ensembl gene ids, empty if not found
+        """
+        for n2ids, key in (
+            (self.symbols, name),
+            (self.synonyms, name),
+            (self.folded_symbols, name.casefold()),
+            (self.folded_synonyms, name.casefold()),
+        ):
+            if key in n2ids:
+                return n2ids[key]
+        return ()
+
+    def __contains__(self, name):
+        return len(self.lookup(name)) > 0
+
+    def __getitem__(self, name):
+        ids = self.lookup(name)
+        if len(ids) == 0:
+            raise KeyError(name)
+        return ids
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+def get_gene_index(index_filepath=GENE_INDEX_FILEPATH, use_cache=True):
+    """Load the gene index, or query BioMart to build, and save it.
+
+    Parameters
+    ----------
+    index_filepath : str | Path
+        Path of the JSON index file
+    use_cache : bool
+        Flag to read, and write the index file
+
+    Returns
+    -------
+    gene_index : GeneIndex
+        Gene index
+    """
+    if use_cache:
+        gene_index = GeneIndex.load(index_filepath)
+        if gene_index is not None:
+            print(f"Reading {index_filepath} created {gene_index.created}")
+            return gene_index
+
+    import scanpy as sc
+
+    print("Querying BioMart to map gene names to ids")
+    annot = sc.queries.biomart_annotations(
+        "hsapiens", BIOMART_ATTRIBUTES, use_cache=True
+    )
+    gene_index = GeneIndex.from_biomart(annot)
+
+    if use_cache:
+        print(f"Writing {index_filepath}")
+        gene_index.save(index_filepath)
+
+    return gene_index
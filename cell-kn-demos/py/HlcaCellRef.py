@@ -1,19 +1,33 @@
 import argparse
 import ast
-import json
 from pathlib import Path
 import random
 import string
+from time import perf_counter
 
-import gget
 import ArangoDB as adb
 import pandas as pd
-import scanpy as sc
 
 from CellOntology import parse_term
+from ExcelUtilities import read_workbook
+from GGetFetcher import GGET_CACHE_FILEPATH, GGetFetcher
+from GeneIndex import get_gene_index
 
 
 ALPHABET = string.ascii_lowercase + string.digits
+MDATA_COLUMNS = [
+    "CL_cell_type",
+    "CL_PURL",
+    "Proposed addition to CL definition or annotation property",
+    "HLCA_cellset",
+    "HLCA_NSForestMarkers",
+    "HLCA_Fbeta",
+    "predicate_HLCA",
+    "CellRef_cellset",
+    "CellRef_NSForestMarkers",
+    "CellRef_Fbeta",
+    "predicate_CellRef",
+]
 
 
 def get_uuid():
@@ -33,7 +47,8 @@ def get_uuid():
 # TODO: Use HGNC web service and compare
 # See: https://www.genenames.org/help/rest/#!/#tocAnchor-1-1-2
 def get_gene_name_to_ids_map():
-    """Query BioMart to map gene names to ids.
+    """Load, or query BioMart to build, and save an index mapping gene
+    names to ids.
 
     Parameters
     ----------
@@ -41,12 +56,10 @@ def get_gene_name_to_ids_map():
 
     Returns
     -------
-    nm2ids : pd.DataFrame
-        DataFrame indexed by gene name containing gene id
+    nm2ids : GeneIndex
+        Index mapping gene name to gene ids
     """
-    nm2ids = sc.queries.biomart_annotations(
-        "hsapiens", ["ensembl_gene_id", "external_gene_name"], use_cache=True
-    ).set_index("external_gene_name")
+    nm2ids = get_gene_index()
 
     return nm2ids
 
@@ -58,27 +71,23 @@ def map_gene_name_to_ids(name, nm2ids):
     ----------
     name : str
         Gene name
-    nm2ids : pd.DataFrame
-        DataFrame indexed by name containing id
+    nm2ids : GeneIndex
+        Index mapping gene name to gene ids
 
     Returns
     -------
     list
         Gene ids
     """
-    if name in nm2ids.index:
-        id = nm2ids.loc[name, "ensembl_gene_id"]
-        if isinstance(id, pd.core.series.Series):
-            return id.to_list()
-        else:
-            return [id]
-    else:
+    ids = nm2ids.lookup(name)
+    if len(ids) == 0:
         print(f"Could not find ids for name: {name}")
-        return []
+    return list(ids)
 
 
 def load_mdata(mdata_dirname, mdata_filename):
-    """Load manually curated data.
+    """Load manually curated data, keeping only the used columns, and
+    caching the result as Parquet.
 
     Parameters
     ----------
@@ -92,7 +101,10 @@ def load_mdata(mdata_dirname, mdata_filename):
     mdata : pd.DataFrame
         DataFrame containing manually curated data
     """
-    mdata = pd.read_excel(mdata_dirname / mdata_filename, header=1, skiprows=0)
+    mdata = read_workbook(
+        Path(mdata_dirname) / mdata_filename,
+        {0: dict(header=1, usecols=MDATA_COLUMNS)},
+    )[0]
     mdata["uuid"] = [get_uuid() for idx in mdata.index]
     return mdata
 
@@ -161,64 +173,32 @@ def init_gdata(mdata, nm2ids):
     return gdata
 
 
-def load_gdata(mdata, gdata_dirname, gdata_filename, nm2ids):
-    """Call gget for each gene id, collecting all specified resources.
+def load_gdata(mdata, nm2ids, fetcher):
+    """Call gget for each gene id not yet cached, collecting all
+    specified resources. Resources are read from the cache only when
+    needed, so adding markers fetches only the new gene ids.
 
     Parameters
     ----------
     mdata : pd.DataFrame
         DataFrame containing manually curated data
-    gdata_dirname : Path
-        Name of directory containing gget data
-    gdata_filename : str
-        Name of JSON file containing gget data
+    nm2ids : GeneIndex
+        Index mapping gene name to gene ids
+    fetcher : GGetFetcher
+        Fetcher caching all specified resources for each gene id
 
     Returns
     -------
     gdata : dict
         Dictionary containing HLCA cell types, marker names, marker
-        ids for each marker name, all specified resources for each
-        marker id, and all unique marker ids
+        ids for each marker name, and all unique marker ids, for which
+        all specified resources can be read from the fetcher
     """
-    # Create and dump, or load gget data
-    if not (gdata_dirname / gdata_filename).exists():
-        # Create gget data
-        gdata = init_gdata(mdata, nm2ids)
-        resources = [
-            "diseases",
-            "drugs",
-            "interactions",
-            "pharmacogenetics",
-            "tractability",
-            "expression",
-            "depmap",
-        ]
-
-        # Collect gene ids
-        gdata["gene_ids"] = {}
-        for id in gdata["marker_ids"]:
-            gdata["gene_ids"][id] = {}
-
-            # Collect resources
-            gdata["gene_ids"][id]["resources"] = {}
-            for resource in resources:
-                try:
-                    gdata["gene_ids"][id]["resources"][resource] = gget.opentargets(
-                        id, resource=resource, json=True, verbose=True
-                    )
-                except Exception as exc:
-                    print(f"Could not gget resource: {resource} for id: {id}")
-                    gdata["gene_ids"][id]["resources"][resource] = {}
-
-        # Dump gget data
-        with open(gdata_dirname / gdata_filename, "w") as fp:
-            json.dump(gdata, fp, indent=4)
+    gdata = init_gdata(mdata, nm2ids)
 
-    else:
-
-        # Load gget data
-        with open(gdata_dirname / gdata_filename, "r") as fp:
-            gdata = json.load(fp)
+    # Fetch and cache resources for each gene id, concurrently
+    fetcher.update(gdata["marker_ids"])
+    print(f"gget metrics: {fetcher.metrics}")
 
     return gdata
 
@@ -243,22 +223,24 @@ def get_graph(db_name, graph_name):
     return adb_graph
 
 
-def init_collections(adb_graph):
+def init_collections(adb_graph, writer=None):
     """Define and create vertex and edge collections.
 
     Parameters
     ----------
     adb_graph : arango.graph.Graph
         ArangoDB database graph
+    writer : None | ArangoDB.BatchWriter
+        Batch writer to buffer inserts and updates
 
     Returns
     -------
     vertex_collections : dict
         A dictionary with vertex name keys containing
-        arango.collection.VertexCollection instance values
+        ArangoDB.CollectionIndex instance values
     edge_collections : dict
         A dictionary with edge name keys containing
-        arango.collection.EdgeCollection instance values
+        ArangoDB.CollectionIndex instance values
     """
     # Define and create vertex collections
     vertex_collections = {}
@@ -278,7 +260,7 @@ def init_collections(adb_graph):
     ]
     for vertex_name in vertex_names:
         collection = adb.create_or_get_vertex_collection(adb_graph, vertex_name)
-        vertex_collections[vertex_name] = collection
+        vertex_collections[vertex_name] = adb.CollectionIndex(collection, writer=writer)
 
     # Define and create edge collections
     edge_collections = {}
@@ -305,7 +287,7 @@ def init_collections(adb_graph):
         collection, edge_name = adb.create_or_get_edge_collection(
             adb_graph, from_vertex, to_vertex
         )
-        edge_collections[edge_name] = collection
+        edge_collections[edge_name] = adb.CollectionIndex(collection, writer=writer)
 
     return vertex_collections, edge_collections
 
@@ -762,17 +744,15 @@ def insert_vertices_and_edges_from_mdata_row(
 
 
 def insert_vertices_and_edges_from_gdata_for_gene_name_and_id(
-    gdata, gene_name, gene_id, vertex_collections, edge_collections
+    fetcher, gene_name, gene_id, vertex_collections, edge_collections
 ):
     """Insert vertices and edges for each gene name and id from the
     gget data.
 
     Parameters
     ----------
-    gdata : dict
-        Dictionary containing cell types, marker names, and marker ids
-        for each marker name all for each source publication, and all
-        unique marker ids
+    fetcher : GGetFetcher
+        Fetcher from which to read cached resources for each gene id
     gene_name : str
         Gene name
     gene_id : str
@@ -797,11 +777,8 @@ def insert_vertices_and_edges_from_gdata_for_gene_name_and_id(
         gene_cls_vertex = vertex_collections["gene_cls"].get(gene_name)
 
     # Get diseases and drugs
-    diseases = []
-    drugs = []
-    if gene_id in gdata["gene_ids"]:
-        diseases = gdata["gene_ids"][gene_id]["resources"]["diseases"]
-        drugs = gdata["gene_ids"][gene_id]["resources"]["drugs"]
+    diseases = fetcher.read(gene_id, "diseases", default={})
+    drugs = fetcher.read(gene_id, "drugs", default={})
 
     for disease in diseases:
         # TODO: Use keyword argument with suitable default, and set in command line arguments
@@ -862,6 +839,126 @@ def insert_vertices_and_edges_from_gdata_for_gene_name_and_id(
     insert_triples(triples, edge_collections)
 
 
+def compile_documents(
+    mdata, gdata, fetcher, vertex_collections, edge_collections, nm2ids
+):
+    """Compile the vertices and edges defined by all rows of the
+    manually curated data, and by the gget data, into document sets
+    deduplicated by key, without writing them.
+
+    Parameters
+    ----------
+    mdata : pd.DataFrame
+        DataFrame containing manually curated data
+    gdata : dict
+        Dictionary containing cell types, marker names, and marker ids
+        for each marker name all for each source publication, and all
+        unique marker ids
+    fetcher : GGetFetcher
+        Fetcher from which to read cached resources for each gene id
+    vertex_collections : dict
+        A dictionary with vertex name keys containing
+        ArangoDB.CollectionIndex instance values
+    edge_collections : dict
+        A dictionary with edge name keys containing
+        ArangoDB.CollectionIndex instance values
+    nm2ids : GeneIndex
+        Index mapping gene name to gene ids
+
+    Returns
+    -------
+    vertex_sets : dict
+        A dictionary with vertex name keys containing
+        ArangoDB.DocumentSet instance values
+    edge_sets : dict
+        A dictionary with edge name keys containing
+        ArangoDB.DocumentSet instance values
+    """
+    start = perf_counter()
+    vertex_sets = {
+        name: adb.DocumentSet(collection)
+        for name, collection in vertex_collections.items()
+    }
+    edge_sets = {
+        name: adb.DocumentSet(collection)
+        for name, collection in edge_collections.items()
+    }
+
+    # Compile vertices and edges from each row
+    g2t = {}
+    for _, row in mdata.iterrows():
+        insert_vertices_and_edges_from_mdata_row(
+            row, vertex_sets, edge_sets, nm2ids, g2t
+        )
+
+    # Compile vertices and edges for each gene name and id
+    for source, s in gdata["source"].items():
+        for cell_type, t in s["cell_types"].items():
+            for gene_name, n in t["marker_names"].items():
+                for gene_id in n["marker_ids"]:
+                    insert_vertices_and_edges_from_gdata_for_gene_name_and_id(
+                        fetcher,
+                        gene_name,
+                        gene_id,
+                        vertex_sets,
+                        edge_sets,
+                    )
+
+    n_vertices = sum([len(vertex_set) for vertex_set in vertex_sets.values()])
+    n_edges = sum([len(edge_set) for edge_set in edge_sets.values()])
+    print(
+        f"Compiled {n_vertices} vertices and {n_edges} edges from"
+        f" {mdata.shape[0]} rows in {perf_counter() - start:.3f} s"
+    )
+
+    return vertex_sets, edge_sets
+
+
+def write_documents(document_sets, batch_size=adb.BATCH_MAX_DOCUMENTS):
+    """Write each document set with bulk requests, and report the
+    number of documents, requests, and seconds for each collection.
+
+    Parameters
+    ----------
+    document_sets : dict
+        A dictionary with collection name keys containing
+        ArangoDB.DocumentSet instance values
+    batch_size : int
+        Maximum number of documents to write per request
+
+    Returns
+    -------
+    counts : dict
+        A dictionary with collection name keys containing dictionary
+        values with the number of documents, errors, and requests, and
+        seconds
+    """
+    with adb.BatchWriter(
+        max_documents=batch_size, max_seconds=None, verbose=False
+    ) as writer:
+        for document_set in document_sets.values():
+            document_set.write(writer)
+
+    counts = {}
+    for flush in writer.flushes:
+        count = counts.setdefault(
+            flush["collection"],
+            {"documents": 0, "errors": 0, "requests": 0, "seconds": 0.0},
+        )
+        count["documents"] += flush["documents"]
+        count["errors"] += flush["errors"]
+        count["requests"] += 1
+        count["seconds"] += flush["seconds"]
+    for name, count in counts.items():
+        print(
+            f"Wrote {count['documents']} documents to {name} in"
+            f" {count['requests']} requests and {count['seconds']:.3f} s"
+            f" ({count['errors']} errors)"
+        )
+
+    return counts
+
+
 def main():
 
     parser = argparse.ArgumentParser(description="Load Manually Curated Data")
@@ -898,9 +995,6 @@ def main():
 
     args = parser.parse_args()
 
-    gdata_dirname = args.mdata_dirname
-    gdata_filename = args.mdata_filename.replace(".xlsm", ".json")
-
     if args.slim:
         db_name = "BioPortal-Slim"
         graph_name = "CL-Slim"
@@ -921,34 +1015,24 @@ def main():
 
     print("Code implements HLCA-CellRef-Triples-ver-0.6.0")
 
-    print(f"Loading {gdata_dirname / gdata_filename}")
+    print(f"Loading gget data from {GGET_CACHE_FILEPATH}")
     nm2ids = get_gene_name_to_ids_map()
-    gdata = load_gdata(mdata, gdata_dirname, gdata_filename, nm2ids)
+    with GGetFetcher() as fetcher:
+        gdata = load_gdata(mdata, nm2ids, fetcher)
 
-    print(f"Getting graph {graph_name} from {db_name}")
-    adb_graph = get_graph(db_name, graph_name)
+        print(f"Getting graph {graph_name} from {db_name}")
+        adb_graph = get_graph(db_name, graph_name)
 
-    print("Defining and creating vertex and edge collections")
-    vertex_collections, edge_collections = init_collections(adb_graph)
+        print("Defining and creating vertex and edge collections")
+        vertex_collections, edge_collections = init_collections(adb_graph)
 
-    g2t = {}
-    n_row = mdata.shape[0]
-    for i_row, row in mdata.iterrows():
-        print(f"Inserting mdata vertices and edges from row {i_row} (of {n_row})")
-        insert_vertices_and_edges_from_mdata_row(
-            row, vertex_collections, edge_collections, nm2ids, g2t
+        print("Compiling vertices and edges")
+        vertex_sets, edge_sets = compile_documents(
+            mdata, gdata, fetcher, vertex_collections, edge_collections, nm2ids
         )
 
-    for source, s in gdata["source"].items():
-        for cell_type, t in s["cell_types"].items():
-            for gene_name, n in t["marker_names"].items():
-                for gene_id in n["marker_ids"]:
-                    print(
-                        f"Inserting gdata vertices and edges for source {source} gene name {gene_name} and id {gene_id}"
-                    )
-                    insert_vertices_and_edges_from_gdata_for_gene_name_and_id(
-                        gdata, gene_name, gene_id, vertex_collections, edge_collections
-                    )
+    print("Writing vertices and edges")
+    write_documents(vertex_sets | edge_sets)
 
 
 if __name__ == "__main__":
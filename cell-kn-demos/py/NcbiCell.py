@@ -0,0 +1,375 @@
+import argparse
+import ast
+import math
+from pathlib import Path
+from time import perf_counter
+
+import ArangoDB as adb
+import pandas as pd
+
+NCBI_CELL_DB = "ncbi-cell-2024-06-27"
+NCBI_CELL_GRAPH = "ncbi-cell"
+
+CELLXGENE_COLLECTION = "cellxgene"
+NSFOREST_COLLECTION = "nsforest"
+ONTOGPT_COLLECTION = "ontogpt"
+CELL_COLLECTION = "cell"
+GENE_COLLECTION = "gene"
+
+NSFOREST_RESULTS_PATTERN = "*/*_results.csv"
+NSFOREST_LIST_COLUMNS = ["NSForest_markers", "binary_genes"]
+NSFOREST_INDEX_FIELDS = ["dataset_id", "clusterName"]
+
+# Each NSForest document holds one row of the results for one dataset
+NSFOREST_CELL_VERTICES = {
+    "collection": CELL_COLLECTION,
+    "query": """
+        FOR nsforest IN @@nsforest
+            COLLECT key = SUBSTITUTE(nsforest.clusterName, [" ", ","], ["-", ":"])
+            INTO rows = {
+                clusterName: nsforest.clusterName,
+                dataset_id: nsforest.dataset_id
+            }
+            LET document = {
+                _key: key,
+                clusterName: FIRST(rows[*].clusterName),
+                dataset_ids: rows[*].dataset_id
+            }
+    """,
+    "bind_vars": {"@nsforest": NSFOREST_COLLECTION},
+    "overwrite_mode": "update",
+}
+NSFOREST_GENE_VERTICES = {
+    "collection": GENE_COLLECTION,
+    "query": """
+        FOR nsforest IN @@nsforest
+            FOR marker IN nsforest.NSForest_markers
+                COLLECT key = marker
+                INTO rows = {
+                    clusterName: nsforest.clusterName,
+                    dataset_id: nsforest.dataset_id
+                }
+                LET document = {
+                    _key: key,
+                    clusterNames: rows[*].clusterName,
+                    dataset_ids: rows[*].dataset_id
+                }
+    """,
+    "bind_vars": {"@nsforest": NSFOREST_COLLECTION},
+    "overwrite_mode": "update",
+}
+ONTOGPT_CELL_IDS = {
+    "collection": ONTOGPT_COLLECTION,
+    "query": """
+        FOR ontogpt IN @@collection
+            LET match = REGEX_MATCHES(
+                JSON_STRINGIFY(UNSET(ontogpt, "cell_id")), @cell_id_pattern
+            )
+            LET document = {
+                _key: ontogpt._key,
+                cell_id: match == null ? null : match[1]
+            }
+    """,
+    "bind_vars": {"cell_id_pattern": '"(CL:[0-9]*)"'},
+    "overwrite_mode": "update",
+}
+ONTOGPT_CELL_VERTICES = {
+    "collection": CELL_COLLECTION,
+    "query": """
+        FOR ontogpt IN @@ontogpt
+            FILTER ontogpt.cell_id != null
+            LET document = {
+                _key: ontogpt.cell_id,
+                id: ontogpt.id,
+                citation_pmid: ontogpt.citation_pmid
+            }
+    """,
+    "bind_vars": {"@ontogpt": ONTOGPT_COLLECTION},
+}
+ONTOGPT_CELL_EDGES = {
+    "from": ONTOGPT_COLLECTION,
+    "to": CELL_COLLECTION,
+    "query": """
+        FOR ontogpt IN @@from_collection
+            FILTER ontogpt.cell_id != null
+            FILTER DOCUMENT(@to_collection, ontogpt.cell_id) != null
+            LET from_key = ontogpt._key
+            LET to_key = ontogpt.cell_id
+    """,
+}
+CELL_GENE_EDGES = {
+    "from": CELL_COLLECTION,
+    "to": GENE_COLLECTION,
+    "query": """
+        FOR nsforest IN @@nsforest
+            LET from_key = SUBSTITUTE(nsforest.clusterName, [" ", ","], ["-", ":"])
+            FOR to_key IN nsforest.NSForest_markers
+    """,
+    "bind_vars": {"@nsforest": NSFOREST_COLLECTION},
+}
+
+
+def stream_attributes(db, collection_name, attributes, batch_size):
+    """Stream only the given attributes of each document in a
+    collection with one AQL query.
+
+    Parameters
+    ----------
+    db : arango.database.StandardDatabase
+        Database
+    collection_name : str
+        Name of the collection
+    attributes : list(str)
+        Names of the attributes to return
+    batch_size : int
+        Number of documents to return per cursor request
+
+    Returns
+    -------
+    arango.cursor.Cursor
+        Cursor over a list of attribute values for each document
+    """
+    values = ", ".join([f"doc.@a{i}" for i in range(len(attributes))])
+    return db.aql.execute(
+        f"FOR doc IN @@collection RETURN [{values}]",
+        bind_vars={
+            "@collection": collection_name,
+            **{f"a{i}": attribute for i, attribute in enumerate(attributes)},
+        },
+        batch_size=batch_size,
+        stream=True,
+    )
+
+
+def join_cellxgene_cell_edges(cellxgene_rows, cell_rows):
+    """Join CELLxGENE, and cell vertices which share a dataset id,
+    indexing cell keys by dataset id once, so that each CELLxGENE
+    vertex is matched with one dictionary lookup.
+
+    Parameters
+    ----------
+    cellxgene_rows : iterable(list)
+        Key, and dataset id of each CELLxGENE vertex
+    cell_rows : iterable(list)
+        Key, and dataset ids of each cell vertex
+
+    Returns
+    -------
+    edges : list(dict)
+        Edge documents from CELLxGENE to cell vertices
+    """
+    # Index cell keys by dataset id
+    d2c = {}
+    for cell_key, dataset_ids in cell_rows:
+        for dataset_id in dict.fromkeys(dataset_ids or []):
+            d2c.setdefault(dataset_id, []).append(cell_key)
+
+    # Probe the index with each CELLxGENE vertex
+    edges = []
+    for cellxgene_key, dataset_id in cellxgene_rows:
+        cell_keys = d2c.get(dataset_id, [])
+        if len(cell_keys) == 0:
+            print(
+                f"No edges to {CELL_COLLECTION} from {CELLXGENE_COLLECTION}"
+                f" document with key: {cellxgene_key}"
+            )
+        for cell_key in cell_keys:
+            edges.append(
+                {
+                    "_key": f"{cellxgene_key}-{cell_key}",
+                    "_from": f"{CELLXGENE_COLLECTION}/{cellxgene_key}",
+                    "_to": f"{CELL_COLLECTION}/{cell_key}",
+                }
+            )
+
+    return edges
+
+
+def insert_cellxgene_cell_edges(db, adb_graph, batch_size=adb.BATCH_MAX_DOCUMENTS):
+    """Insert an edge from any CELLxGENE vertex to a cell vertex if
+    they share their dataset id. Each collection is streamed once, and
+    the edges are inserted in bulk, ignoring existing edges.
+
+    Parameters
+    ----------
+    db : arango.database.StandardDatabase
+        NCBI-Cell database
+    adb_graph : arango.graph.Graph
+        NCBI-Cell database graph
+    batch_size : int
+        Number of documents to read, or write per request
+
+    Returns
+    -------
+    n_edges : int
+        Number of edges found
+    """
+    start = perf_counter()
+    edges = join_cellxgene_cell_edges(
+        stream_attributes(db, CELLXGENE_COLLECTION, ["_key", "dataset_id"], batch_size),
+        stream_attributes(db, CELL_COLLECTION, ["_key", "dataset_ids"], batch_size),
+    )
+    print(f"Found {len(edges)} edges in {perf_counter() - start:.3f} s")
+
+    collection, _ = adb.create_or_get_edge_collection(
+        adb_graph, CELLXGENE_COLLECTION, CELL_COLLECTION
+    )
+    with adb.BatchWriter(max_documents=batch_size, max_seconds=None) as writer:
+        for edge in edges:
+            writer.insert(collection, edge)
+
+    return len(edges)
+
+
+def read_nsforest_documents(results_filepath, dataset_id):
+    """Read NSForest results into one document per cluster, with
+    numeric fields typed, and marker lists parsed into arrays.
+
+    Parameters
+    ----------
+    results_filepath : str | Path
+        Path of the NSForest results CSV file
+    dataset_id : str
+        Identifier of the dataset for which NSForest was run
+
+    Returns
+    -------
+    documents : list(dict)
+        NSForest result documents
+    """
+    results = pd.read_csv(results_filepath)
+    for column in NSFOREST_LIST_COLUMNS:
+        if column in results.columns:
+            results[column] = [
+                ast.literal_eval(value) if isinstance(value, str) else []
+                for value in results[column]
+            ]
+    documents = []
+    for row in results.to_dict("records"):
+        document = {
+            name: (None if isinstance(value, float) and math.isnan(value) else value)
+            for name, value in row.items()
+        }
+        cell_key = document["clusterName"].replace(" ", "-").replace(",", ":")
+        document["_key"] = f"{dataset_id}:{cell_key}"
+        document["dataset_id"] = dataset_id
+        documents.append(document)
+    return documents
+
+
+def insert_nsforest_documents(
+    adb_graph, nsforest_dirpath=adb.NSFOREST_DIR, batch_size=adb.BATCH_MAX_DOCUMENTS
+):
+    """Insert one NSForest vertex for each cluster in the results for
+    each dataset, replacing existing vertices, and index the vertices
+    by dataset id, and cluster name.
+
+    Parameters
+    ----------
+    adb_graph : arango.graph.Graph
+        NCBI-Cell database graph
+    nsforest_dirpath : str | Path
+        Path of the directory containing a results directory for each
+        dataset
+    batch_size : int
+        Number of documents to write per request
+
+    Returns
+    -------
+    n_documents : int
+        Number of documents inserted
+    """
+    collection = adb.create_or_get_vertex_collection(adb_graph, NSFOREST_COLLECTION)
+    collection.add_persistent_index(fields=NSFOREST_INDEX_FIELDS)
+    n_documents = 0
+    with adb.BatchWriter(max_documents=batch_size, max_seconds=None) as writer:
+        for results_filepath in sorted(
+            Path(nsforest_dirpath).glob(NSFOREST_RESULTS_PATTERN)
+        ):
+            dataset_id = results_filepath.parent.name
+            for document in read_nsforest_documents(results_filepath, dataset_id):
+                writer.upsert(collection, document)
+                n_documents += 1
+    return n_documents
+
+
+def query_nsforest_documents(db, dataset_id, cluster_name=None):
+    """Return the NSForest results for a dataset, and optionally one
+    cluster, filtering with the persistent index on the server.
+
+    Parameters
+    ----------
+    db : arango.database.StandardDatabase
+        NCBI-Cell database
+    dataset_id : str
+        Identifier of the dataset for which NSForest was run
+    cluster_name : None | str
+        Name of the cluster, default all clusters
+
+    Returns
+    -------
+    arango.cursor.Cursor
+        Cursor over matching NSForest result documents
+    """
+    bind_vars = {"@nsforest": NSFOREST_COLLECTION, "dataset_id": dataset_id}
+    cluster_filter = ""
+    if cluster_name is not None:
+        bind_vars["cluster_name"] = cluster_name
+        cluster_filter = "FILTER nsforest.clusterName == @cluster_name"
+    return db.aql.execute(
+        f"""
+        FOR nsforest IN @@nsforest
+            FILTER nsforest.dataset_id == @dataset_id
+            {cluster_filter}
+            RETURN nsforest
+        """,
+        bind_vars=bind_vars,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Derive NCBI-Cell vertices, and edges between them"
+    )
+    parser.add_argument(
+        "--db-name",
+        default=NCBI_CELL_DB,
+        help="name of the NCBI-Cell database",
+    )
+    parser.add_argument(
+        "--graph-name",
+        default=NCBI_CELL_GRAPH,
+        help="name of the NCBI-Cell graph",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=adb.BATCH_MAX_DOCUMENTS,
+        help="number of documents to read, or write per request",
+    )
+
+    args = parser.parse_args()
+
+    db = adb.create_or_get_database(args.db_name)
+    adb_graph = adb.create_or_get_graph(db, args.graph_name)
+
+    print(f"Inserting {NSFOREST_COLLECTION} documents")
+    insert_nsforest_documents(adb_graph, batch_size=args.batch_size)
+
+    for derivation in [
+        NSFOREST_CELL_VERTICES,
+        NSFOREST_GENE_VERTICES,
+        ONTOGPT_CELL_IDS,
+        ONTOGPT_CELL_VERTICES,
+    ]:
+        adb.derive_vertices(db, adb_graph, derivation, commit_count=args.batch_size)
+
+    print(f"Inserting edges from {CELLXGENE_COLLECTION} to {CELL_COLLECTION}")
+    insert_cellxgene_cell_edges(db, adb_graph, batch_size=args.batch_size)
+
+    for derivation in [ONTOGPT_CELL_EDGES, CELL_GENE_EDGES]:
+        adb.derive_edges(db, adb_graph, derivation, commit_count=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
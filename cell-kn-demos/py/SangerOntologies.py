@@ -1,62 +1,413 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
 from pathlib import Path
 from pprint import pprint
+from queue import Empty
+from time import perf_counter
 from urllib.parse import urlparse
 
-from rdflib import Graph
-
+import ArangoDB as adb
 from CellOntology import (
+    BATCH_SIZE,
     OBO_DIRPATH,
     OBO_PURLS,
+    VALID_VERTICES,
     count_triple_types,
-    collect_fnode_triples,
-    collect_bnode_triple_sets,
-    create_bnode_triples_from_bnode_triple_sets,
+    create_documents_from_triples,
+    import_edge_documents,
+    import_vertex_documents,
+    parse_ontology,
+    stream_fnode_and_bnode_triples,
+    stream_triples,
 )
 
-for obo_purl in OBO_PURLS:
-    obo_filename = Path(urlparse(obo_purl).path).name
-    print(f"\nParsing {OBO_DIRPATH / obo_filename} to populate rdflib graph")
-    rdf_graph = Graph()
-    rdf_graph.parse(OBO_DIRPATH / obo_filename)
-
-    # TODO: Review namespaces before using
-    # print(f"Parsing {OBO_DIRPATH / obo_filename} to identify ids")
-    # _, _, ids = parse_obo(OBO_DIRPATH, obo_filename)
-    # print(ids)
-
-    print("Counting triple types in rdflib graph")
-    triple_types = count_triple_types(rdf_graph)
-    pprint(triple_types)
-
-    # print("Printing all triples in rdflib graph")
-    # triples = []
-    # triples_filename = obo_filename.replace(".owl", "_triples.txt")
-    # with open(triples_filename, "w") as fp:
-    #     for triple in rdf_graph:
-    #         fp.write(str(triple) + "\n")
-
-    # print("Collecting and printing all filled node triples in rdflib graph")
-    # fnode_triples = collect_fnode_triples(rdf_graph)
-    # fnode_triples_filename = obo_filename.replace(".owl", "_fnode_triples.txt")
-    # with open(fnode_triples_filename, "w") as fp:
-    #     for fnode_triple in fnode_triples:
-    #         fp.write(str(fnode_triple) + "\n")
-
-    # print("Collecting and printing all blank node triple sets in rdflib graph")
-    # bnode_triple_sets = {}
-    # ro_filename = "ro.owl"
-    # ro, _, _ = parse_obo(OBO_DIRPATH, ro_filename)
-    # collect_bnode_triple_sets(rdf_graph, bnode_triple_sets, use="subject", ro=ro)
-    # collect_bnode_triple_sets(rdf_graph, bnode_triple_sets, use="object", ro=ro)
-    # bnode_triple_sets_filename = obo_filename.replace(".owl", "_bnode_triple_sets.txt")
-    # with open(bnode_triple_sets_filename, "w") as fp:
-    #     pprint(bnode_triple_sets, fp)
-
-    # print("Creating and printing all blank node triples in rdflib graph")
-    # bnode_triples, ignored_triples = create_bnode_triples_from_bnode_triple_sets(
-    #     bnode_triple_sets, ro=ro
-    # )
-    # bnode_triples_filename = obo_filename.replace(".owl", "_bnode_triples.txt")
-    # with open(bnode_triples_filename, "w") as fp:
-    #     for bnode_triple in bnode_triples:
-    #         fp.write(str(bnode_triple) + "\n")
+QUEUE_SIZE = 100
+QUEUE_TIMEOUT = 10
+DRAIN_TIMEOUT = 0.1
+
+
+def count_ontology_triple_types(obo_filenames):
+    """Stream each ontology to count, and print triple types.
+
+    Parameters
+    ----------
+    obo_filenames : list(str)
+        Names of downloaded ontology XML files
+
+    Returns
+    -------
+    None
+    """
+    for obo_filename in obo_filenames:
+        print(f"\nStreaming {OBO_DIRPATH / obo_filename} to count triple types")
+        triples = stream_triples(OBO_DIRPATH, obo_filename)
+        triple_types = count_triple_types(triples)
+        pprint(triple_types)
+
+
+def transform_ontology(
+    obo_filename, documents, ro=None, vertex_names=None, batch_size=BATCH_SIZE
+):
+    """Stream an ontology, create all vertex and edge documents, and
+    put batches of documents on a queue for a single writer. Runs in a
+    worker process.
+
+    Parameters
+    ----------
+    obo_filename : str
+        Name of downloaded ontology XML file
+    documents : multiprocessing.managers.BaseProxy
+        Queue shared with the writer which receives (ontology
+        filename, vertex name, or (from vertex name, to vertex name),
+        batch index, list of documents) tuples, and an (ontology
+        filename, None, None, None) tuple when the worker is done
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+    vertex_names : None | list(str)
+        Vertex names to add to the valid vertices
+    batch_size : int
+        Number of documents to put on the queue at once
+
+    Returns
+    -------
+    timing : dict
+        Dictionary containing the ontology filename, the number of
+        vertex and edge documents, and the seconds spent parsing and
+        transforming the ontology
+    """
+    try:
+        start = perf_counter()
+        if vertex_names is not None:
+            VALID_VERTICES.update(vertex_names)
+
+        triples = stream_fnode_and_bnode_triples(
+            stream_triples(OBO_DIRPATH, obo_filename), ro=ro
+        )
+        vertices, edges = create_documents_from_triples(triples, ro=ro)
+
+        timing = {
+            "ontology": obo_filename,
+            "vertices": sum([len(v) for v in vertices.values()]),
+            "edges": sum([len(e) for e in edges.values()]),
+            "transform": perf_counter() - start,
+        }
+
+        # Put batches of vertex, then edge documents on the queue,
+        # sorted by key so that batches are the same on each run
+        for name, collection in list(vertices.items()) + list(edges.items()):
+            batch = [collection[key] for key in sorted(collection.keys())]
+            for i_batch, i_doc in enumerate(range(0, len(batch), batch_size)):
+                documents.put(
+                    (obo_filename, name, i_batch, batch[i_doc : i_doc + batch_size])
+                )
+
+    finally:
+
+        # Always signal the writer that this worker is done
+        documents.put((obo_filename, None, None, None))
+
+    return timing
+
+
+def write_documents(
+    documents, futures, adb_graph, batch_size=BATCH_SIZE, checkpoint=None
+):
+    """Import batches of vertex and edge documents from a queue until
+    every worker is done, skipping batches already committed, and
+    recording each batch written, given a checkpoint manifest. Runs in
+    the single writer process.
+
+    Batches are written as they arrive, so the batches of an ontology
+    whose worker fails remain written. Vertices are merged, and edges
+    inserted, ignoring duplicates, so writing a batch again changes
+    nothing, and loading again with the checkpoint manifest writes the
+    remaining batches.
+
+    Parameters
+    ----------
+    documents : multiprocessing.managers.BaseProxy
+        Queue shared with the workers
+    futures : list(concurrent.futures.Future)
+        Futures of the workers putting documents on the queue
+    adb_graph : arango.graph.Graph
+        An ArangoDB graph instance
+    batch_size : int
+        Number of documents per batch
+    checkpoint : None | sqlite3.Connection
+        Checkpoint manifest connection
+
+    Returns
+    -------
+    write_seconds : dict
+        Dictionary with ontology filename keys containing the seconds
+        spent writing its documents
+    """
+    vertex_collections = {}
+    edge_collections = {}
+    write_seconds = {}
+
+    n_done = 0
+    while n_done < len(futures):
+        try:
+            obo_filename, name, i_batch, batch = documents.get(timeout=QUEUE_TIMEOUT)
+        except Empty:
+            # Stop waiting if a worker died without signaling
+            if all([future.done() for future in futures]):
+                break
+            continue
+        if name is None:
+            n_done += 1
+            continue
+
+        # Name batches by ontology, since ontologies share collections
+        if isinstance(name, tuple):
+            checkpoint_name = f"{obo_filename}:{name[0]}-{name[1]}"
+        else:
+            checkpoint_name = f"{obo_filename}:{name}"
+        if checkpoint is not None and adb.is_batch_committed(
+            checkpoint, checkpoint_name, batch_size, i_batch, batch
+        ):
+            continue
+
+        start = perf_counter()
+        if isinstance(name, tuple):
+            import_edge_documents(
+                batch, adb_graph, edge_collections, name[0], name[1], batch_size=None
+            )
+
+        else:
+            # Ontologies share vertices, so merge annotation lists
+            # rather than replacing them
+            import_vertex_documents(
+                batch,
+                adb_graph,
+                vertex_collections,
+                name,
+                batch_size=None,
+                operation="merge",
+            )
+
+        if checkpoint is not None:
+            adb.commit_batch(checkpoint, checkpoint_name, batch_size, i_batch, batch)
+
+        if obo_filename not in write_seconds:
+            write_seconds[obo_filename] = 0
+        write_seconds[obo_filename] += perf_counter() - start
+
+    return write_seconds
+
+
+def drain_documents(documents, futures):
+    """Cancel pending workers, and discard documents from the queue
+    until every running worker is done, so that no worker remains
+    blocked putting documents on the full queue.
+
+    Parameters
+    ----------
+    documents : multiprocessing.managers.BaseProxy
+        Queue shared with the workers
+    futures : list(concurrent.futures.Future)
+        Futures of the workers putting documents on the queue
+
+    Returns
+    -------
+    None
+    """
+    for future in futures:
+        future.cancel()
+    while not all([future.done() for future in futures]):
+        try:
+            documents.get(timeout=DRAIN_TIMEOUT)
+        except Empty:
+            continue
+
+
+def load_ontologies(
+    obo_filenames,
+    adb_graph,
+    ro=None,
+    vertex_names=None,
+    n_workers=None,
+    batch_size=BATCH_SIZE,
+    checkpoint=None,
+):
+    """Parse and transform each ontology in a process pool, one worker
+    per file, while writing the resulting documents from this process,
+    then print a per ontology timing report.
+
+    If a worker fails, the documents of its ontology written before
+    the failure remain, and the ontology is reported, so that the load
+    can be completed by running again with the same checkpoint
+    manifest, for example with --resume. If the writer fails, pending
+    workers are cancelled, and running workers drained, before the
+    error is raised.
+
+    Parameters
+    ----------
+    obo_filenames : list(str)
+        Names of downloaded ontology XML files
+    adb_graph : arango.graph.Graph
+        An ArangoDB graph instance
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+    vertex_names : None | list(str)
+        Vertex names to add to the valid vertices
+    n_workers : None | int
+        Number of worker processes, default is one per file
+    batch_size : int
+        Number of documents to import per request
+    checkpoint : None | sqlite3.Connection
+        Checkpoint manifest connection in which to record committed
+        batches, and skip batches already committed
+
+    Returns
+    -------
+    timings : list(dict)
+        List of dictionaries containing the ontology filename, the
+        number of vertex and edge documents, and the seconds spent
+        transforming, and writing each ontology loaded
+    """
+    start = perf_counter()
+    with Manager() as manager:
+        documents = manager.Queue(maxsize=QUEUE_SIZE)
+
+        with ProcessPoolExecutor(
+            max_workers=n_workers or len(obo_filenames)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    transform_ontology,
+                    obo_filename,
+                    documents,
+                    ro=ro,
+                    vertex_names=vertex_names,
+                    batch_size=batch_size,
+                )
+                for obo_filename in obo_filenames
+            ]
+            try:
+                write_seconds = write_documents(
+                    documents,
+                    futures,
+                    adb_graph,
+                    batch_size=batch_size,
+                    checkpoint=checkpoint,
+                )
+
+            except BaseException:
+
+                # Unblock the workers before the executor waits for
+                # them to shut down
+                drain_documents(documents, futures)
+                raise
+
+    timings = []
+    for obo_filename, future in zip(obo_filenames, futures):
+        if future.exception() is not None:
+            print(
+                f"Could not load {obo_filename}: {future.exception()}, so its"
+                " documents are partially written: run again with --resume"
+                " to complete the load"
+            )
+            continue
+        timing = future.result()
+        timing["write"] = write_seconds.get(obo_filename, 0)
+        timings.append(timing)
+
+    print("Ontology load timing (seconds)")
+    for timing in timings:
+        print(
+            f"{timing['ontology']}: {timing['vertices']} vertices,"
+            f" {timing['edges']} edges, transform {timing['transform']:.1f},"
+            f" write {timing['write']:.1f}"
+        )
+    print(f"Total: {perf_counter() - start:.1f}")
+
+    return timings
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Load Sanger ontologies")
+    parser.add_argument(
+        "--count-only",
+        action="store_true",
+        help="only count triple types in each ontology",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes, default is one per ontology",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="number of documents to import per request",
+    )
+    parser.add_argument(
+        "--vertex-names",
+        nargs="*",
+        default=[],
+        help="vertex names to add to the valid vertices",
+    )
+    parser.add_argument(
+        "--label",
+        default="",
+        help="label to add to database_name",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume a checkpointed load instead of deleting the database",
+    )
+
+    args = parser.parse_args()
+
+    obo_filenames = [Path(urlparse(obo_purl).path).name for obo_purl in OBO_PURLS]
+
+    if args.count_only:
+        count_ontology_triple_types(obo_filenames)
+        return
+
+    db_name = "Sanger-Ontologies"
+    graph_name = "Sanger"
+
+    if args.label:
+        db_name += f"-{args.label}"
+
+    ro_filename = "ro.owl"
+    _, ro, _, _ = parse_ontology(OBO_DIRPATH, ro_filename)
+
+    checkpoint_filepath = Path(adb.CHECKPOINT_DIR) / f"{db_name}.sqlite"
+    if args.resume:
+        print("Getting ArangoDB database and graph, and resuming loading ontologies")
+
+    else:
+        print("Creating ArangoDB database and graph, and loading ontologies")
+        adb.delete_database(db_name)
+        adb.delete_checkpoint(checkpoint_filepath)
+    db = adb.create_or_get_database(db_name)
+    adb_graph = adb.create_or_get_graph(db, graph_name)
+    checkpoint = adb.open_checkpoint(checkpoint_filepath)
+    try:
+        load_ontologies(
+            obo_filenames,
+            adb_graph,
+            ro=ro,
+            vertex_names=args.vertex_names,
+            n_workers=args.workers,
+            batch_size=args.batch_size,
+            checkpoint=checkpoint,
+        )
+
+    finally:
+
+        # Close the checkpoint manifest, even on error
+        checkpoint.close()
+
+
+if __name__ == "__main__":
+    main()
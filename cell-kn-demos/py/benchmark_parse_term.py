@@ -0,0 +1,169 @@
+import argparse
+from contextlib import redirect_stdout
+import io
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import urlparse
+
+from rdflib.term import BNode, Literal, URIRef
+
+from CellOntology import (
+    OBO_DIRPATH,
+    URIREF_PATTERN,
+    classify_term,
+    parse_ontology,
+    parse_term,
+)
+
+
+def parse_term_without_cache(term, ro=None):
+    """Parse an rdflib term as CellOntology.parse_term did before
+    classification was cached, and the OBO PURL prefix parsed without
+    urlparse, for reference.
+
+    Parameters
+    ----------
+    term : rdflib.term.BNode|Literal|URIRef | str
+        An rdflib term: BNode, Literal, or URIRef, or equivalent string
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+
+    Returns
+    -------
+    tuple
+        Contains ontology identifier, number, and term, label or
+        literal value, and type ('class', 'predicate', or 'literal'),
+        in which any element of the tuple may also be None
+    """
+    path = urlparse(term).path
+    fragment = urlparse(term).fragment
+    match = URIREF_PATTERN.match(path)
+    if match is not None:
+        oid = match.group(1)
+        if oid == "GOREL":
+            print(f"Invalid Ontology ID: 'GOREL' for term: {term}")
+            return None, None, None, None, None
+        number = match.group(2)
+        if len(oid) == 0 or len(number) == 0:
+            print(f"Did not match ontology id or number for term: {term}")
+            return None, None, None, None, None
+        term = f"{oid}_{number}"
+        if ro is not None and term in ro:
+            return oid, number, term, ro[term], "class"
+        else:
+            return oid, number, term, None, "class"
+    elif fragment != "":
+        return None, None, None, fragment, "predicate"
+    elif isinstance(term, BNode):
+        oid = "BNode"
+        number = Path(path).stem
+        term = f"{oid}_{number}"
+        return oid, number, term, None, "class"
+    else:
+        return None, None, None, Path(path).stem, "literal"
+
+
+def create_synthetic_triples(n_triples, n_terms=10000):
+    """Create triples in which terms repeat, as they do in ontologies.
+
+    Parameters
+    ----------
+    n_triples : int
+        Number of triples to create
+    n_terms : int
+        Number of distinct class terms to use
+
+    Returns
+    -------
+    triples : list(tuple)
+        List of tuples which contain each triple
+    """
+    obo = "http://purl.obolibrary.org/obo/"
+    predicates = [
+        URIRef("http://www.w3.org/2000/01/rdf-schema#subClassOf"),
+        URIRef("http://www.w3.org/2000/01/rdf-schema#label"),
+        URIRef("http://www.geneontology.org/formats/oboInOwl#hasExactSynonym"),
+        URIRef(f"{obo}RO_0002202"),
+    ]
+    triples = []
+    for i in range(n_triples):
+        s = URIRef(f"{obo}CL_{i % n_terms:07d}")
+        p = predicates[i % len(predicates)]
+        if i % 3 == 0:
+            o = Literal(f"synonym {i % n_terms}")
+        elif i % 3 == 1:
+            o = URIRef(f"{obo}UBERON_{(7 * i) % n_terms:07d}")
+        else:
+            o = BNode(f"n{i % n_terms}")
+        triples.append((s, p, o))
+    return triples
+
+
+def time_per_triple(parse, triples, ro=None):
+    """Time parsing the subject, predicate, and object of each triple,
+    as done by collect_bnode_triple_sets.
+
+    Parameters
+    ----------
+    parse : function
+        Function with the parse_term signature
+    triples : list(tuple)
+        List of tuples which contain each triple
+    ro : None | dict
+        A dictionary mapping relationship ontology terms to labels
+
+    Returns
+    -------
+    float
+        Seconds per triple
+    """
+    start = perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for s, p, o in triples:
+            parse(s, ro=ro)
+            parse(p, ro=ro)
+            parse(o, ro=ro)
+    return (perf_counter() - start) / len(triples)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark per triple cost of parsing terms"
+    )
+    parser.add_argument(
+        "--obo-filename",
+        help="name of ontology file in the OBO directory to use, instead of synthetic triples",
+    )
+    parser.add_argument(
+        "--n-triples",
+        type=int,
+        default=1000000,
+        help="number of synthetic triples to use",
+    )
+
+    args = parser.parse_args()
+
+    if args.obo_filename:
+        triples, _, _, _ = parse_ontology(OBO_DIRPATH, args.obo_filename)
+        _, ro, _, _ = parse_ontology(OBO_DIRPATH, "ro.owl")
+
+    else:
+        triples = create_synthetic_triples(args.n_triples)
+        ro = {"RO_0002202": "develops from"}
+
+    print(f"Timing {len(triples)} triples")
+    before = time_per_triple(parse_term_without_cache, triples, ro=ro)
+    print(f"Before: {before * 1e6:.3f} us per triple")
+
+    classify_term.cache_clear()
+    cold = time_per_triple(parse_term, triples, ro=ro)
+    print(f"After, cold cache: {cold * 1e6:.3f} us per triple")
+
+    warm = time_per_triple(parse_term, triples, ro=ro)
+    print(f"After, warm cache: {warm * 1e6:.3f} us per triple")
+    print(classify_term.cache_info())
+
+
+if __name__ == "__main__":
+    main()
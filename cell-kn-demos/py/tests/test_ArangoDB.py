@@ -3,6 +3,7 @@ from pathlib import Path
 import shutil
 import subprocess
 import unittest
+from unittest.mock import patch
 
 from arango import ArangoClient
 
@@ -116,6 +117,69 @@ class TestArangoDB(unittest.TestCase):
         adb.delete_edge_collection(graph, edge_name)
         self.assertFalse(graph.has_edge_definition(edge_name))
 
+    def test_collection_index(self):
+
+        db = adb.create_or_get_database(self.database_name)
+        graph = adb.create_or_get_graph(db, self.graph_name)
+        collection = adb.create_or_get_vertex_collection(graph, self.from_vertex_name)
+        collection.insert({"_key": "prefetched", "label": "prefetched"})
+
+        index = adb.CollectionIndex(collection, max_documents=1)
+        self.assertTrue(index.has("prefetched"))
+        self.assertFalse(index.has("inserted"))
+
+        index.insert({"_key": "inserted", "label": "inserted"})
+        self.assertTrue(index.has("inserted"))
+        self.assertTrue(collection.has("inserted"))
+
+        vertex = index.get("prefetched")
+        vertex["label"] = "updated"
+        index.update(vertex)
+        self.assertEqual(index.get("prefetched")["label"], "updated")
+        self.assertEqual(collection.get("prefetched")["label"], "updated")
+
+    def test_batch_writer(self):
+
+        db = adb.create_or_get_database(self.database_name)
+        graph = adb.create_or_get_graph(db, self.graph_name)
+        collection = adb.create_or_get_vertex_collection(graph, self.from_vertex_name)
+
+        with adb.BatchWriter(max_documents=2) as writer:
+            writer.insert(collection, {"_key": "a", "label": "a"})
+            self.assertFalse(collection.has("a"))
+            writer.upsert(collection, {"_key": "b", "label": "b"})
+            self.assertTrue(collection.has("b"))
+            writer.update(collection, {"_key": "a", "label": "updated"})
+        self.assertEqual(collection.get("a")["label"], "updated")
+        self.assertEqual(
+            [f["documents"] for f in writer.flushes],
+            [1, 1, 1],
+        )
+
+    def test_batch_writer_merge(self):
+
+        db = adb.create_or_get_database(self.database_name)
+        graph = adb.create_or_get_graph(db, self.graph_name)
+        collection = adb.create_or_get_vertex_collection(graph, self.from_vertex_name)
+
+        first = {"_key": "a", "label": "a", "synonym": ["b"], "comment": "c"}
+        second = {"_key": "a", "label": "z", "synonym": "a", "xref": ["x"]}
+        merged = []
+        for documents in [[first, second], [second, first]]:
+            collection.truncate()
+            for document in documents:
+                with adb.BatchWriter() as writer:
+                    writer.merge(collection, document)
+            merged.append(
+                {
+                    k: v
+                    for k, v in collection.get("a").items()
+                    if k not in ["_id", "_rev"]
+                }
+            )
+        self.assertEqual(merged[0], merged[1])
+        self.assertEqual(merged[0], adb.merge_documents(first, second))
+
     def tearDown(self):
 
         # Stop the ArangoDB instance using the test data directory
@@ -123,3 +187,231 @@ class TestArangoDB(unittest.TestCase):
 
         # Remove ArangoDB test data directory
         shutil.rmtree(self.arangodb_dir)
+
+
+class TestConnection(unittest.TestCase):
+
+    def test_connection_is_lazy(self):
+
+        adb.configure_connection(hosts="http://127.0.0.1:8530", pool_size=2)
+        self.assertEqual(adb.ARANGO_CONNECTION, {})
+
+        client = adb.get_client()
+        self.assertEqual(client.hosts, ["http://127.0.0.1:8530"])
+        self.assertIs(adb.ARANGO_CLIENT, client)
+        self.assertEqual(adb.SYS_DB.name, "_system")
+
+    def tearDown(self):
+
+        # Restore the default connection settings
+        adb.configure_connection(hosts=adb.ARANGO_URL, pool_size=adb.ARANGO_POOL_SIZE)
+
+
+class RecordingCollection:
+    """Hold documents in memory, recording each request."""
+
+    name = "vertex"
+
+    def __init__(self, documents):
+        self.documents = {document["_key"]: document for document in documents}
+        self.requests = []
+
+    def keys(self):
+        return iter(list(self.documents))
+
+    def has(self, key):
+        self.requests.append("has")
+        return key in self.documents
+
+    def get(self, key):
+        self.requests.append("get")
+        return dict(self.documents[key]) if key in self.documents else None
+
+    def import_bulk(self, documents, on_duplicate="error"):
+        self.requests.append("import_bulk")
+        for document in documents:
+            self.documents.setdefault(document["_key"], dict(document))
+        return {"created": len(documents), "errors": 0}
+
+    def update_many(self, documents, check_rev=True, keep_none=True):
+        self.requests.append("update_many")
+        for document in documents:
+            self.documents[document["_key"]].update(document)
+        return [{"_key": document["_key"]} for document in documents]
+
+
+class TestDocumentSet(unittest.TestCase):
+
+    def test_document_set_writes_in_bulk(self):
+
+        collection = RecordingCollection([{"_key": "loaded", "label": "loaded"}])
+        document_set = adb.DocumentSet(collection)
+
+        for label in ["first", "second"]:
+            metadata = document_set.insert({"_key": "inserted", "label": label})
+        self.assertEqual(metadata["_id"], "vertex/inserted")
+        self.assertEqual(document_set.get("inserted")["label"], "first")
+        self.assertTrue(document_set.has("loaded"))
+        document_set.update({"_key": "loaded", "definition": "updated"})
+        self.assertEqual(document_set.get("loaded")["definition"], "updated")
+        self.assertEqual(len(document_set), 2)
+
+        collection.requests = []
+        with adb.BatchWriter(verbose=False) as writer:
+            document_set.write(writer)
+        self.assertEqual(collection.requests, ["import_bulk", "update_many"])
+        self.assertEqual(
+            collection.documents,
+            {
+                "loaded": {
+                    "_key": "loaded",
+                    "_id": "vertex/loaded",
+                    "label": "loaded",
+                    "definition": "updated",
+                },
+                "inserted": {"_key": "inserted", "label": "first"},
+            },
+        )
+
+
+class TestBatchWriter(unittest.TestCase):
+
+    def test_batch_writer_discards_buffers_on_error(self):
+
+        collection = RecordingCollection([])
+
+        with self.assertRaises(KeyError):
+            with adb.BatchWriter(verbose=False) as writer:
+                writer.insert(collection, {"_key": "partial"})
+                raise KeyError("original")
+
+        self.assertEqual(collection.requests, [])
+        self.assertEqual(writer.buffers, {})
+        with self.assertRaises(ValueError):
+            writer.insert(collection, {"_key": "late"})
+
+    def test_collection_index_raises_after_writer_closes(self):
+
+        collection = RecordingCollection([{"_key": "a"}])
+        with adb.BatchWriter(verbose=False) as writer:
+            index = adb.CollectionIndex(collection, writer=writer)
+            index.insert({"_key": "b"})
+        self.assertEqual(len(collection.requests), 1)
+
+        with self.assertRaises(ValueError):
+            index.insert({"_key": "c"})
+        with self.assertRaises(ValueError):
+            index.update({"_key": "a", "label": "a"})
+        self.assertFalse(index.has("c"))
+        self.assertEqual(len(collection.requests), 1)
+
+
+class RecordingDatabase:
+    """Record each AQL query, and its bind parameters."""
+
+    def __init__(self):
+        self.aql = self
+        self.queries = []
+
+    def execute(self, query, bind_vars=None, **kwargs):
+        self.queries.append((query, bind_vars))
+        return self
+
+    def statistics(self):
+        return {"modified": 1, "ignored": 0}
+
+
+class TestBatchWriterMerge(unittest.TestCase):
+
+    def setUp(self):
+
+        # Documents of one key from two ontologies, with conflicting
+        # scalar, and list values
+        self.first = {
+            "_key": "CL_0000000",
+            "label": "cell",
+            "definition": "A material entity",
+            "synonym": ["cell"],
+            "comment": "first",
+        }
+        self.second = {
+            "_key": "CL_0000000",
+            "label": "native cell",
+            "definition": "A material entity",
+            "synonym": "biological cell",
+            "xref": ["FMA:68646"],
+        }
+        self.merged = {
+            "_key": "CL_0000000",
+            "label": ["cell", "native cell"],
+            "definition": "A material entity",
+            "synonym": ["biological cell", "cell"],
+            "comment": "first",
+            "xref": ["FMA:68646"],
+        }
+
+    def test_merge_documents_does_not_depend_on_order(self):
+
+        self.assertEqual(adb.merge_documents(self.first, self.second), self.merged)
+        self.assertEqual(adb.merge_documents(self.second, self.first), self.merged)
+
+    def test_merge_writes_the_same_document_in_either_order(self):
+
+        for documents in [[self.first, self.second], [self.second, self.first]]:
+            db = RecordingDatabase()
+            collection = RecordingCollection([])
+            collection.db_name = "database"
+
+            with patch.object(adb, "get_database", return_value=db) as get_database:
+                with adb.BatchWriter(verbose=False) as writer:
+                    for document in documents:
+                        writer.merge(collection, document)
+
+            get_database.assert_called_once_with("database")
+            self.assertEqual(len(db.queries), 1)
+            query, bind_vars = db.queries[0]
+            self.assertEqual(query, adb.MERGE_DOCUMENTS_QUERY)
+            self.assertEqual(bind_vars["@collection"], "vertex")
+            self.assertEqual(bind_vars["documents"], [self.merged])
+            self.assertEqual(collection.requests, [])
+
+
+class RecordingGraph:
+    """Hold edge definitions in memory."""
+
+    def has_edge_definition(self, name):
+        return True
+
+    def edge_collection(self, name):
+        return name
+
+
+class TestDeriveEdges(unittest.TestCase):
+
+    def test_derive_edges_binds_used_parameters(self):
+
+        db = RecordingDatabase()
+        derivation = {
+            "from": "ontogpt",
+            "to": "cell",
+            "query": """
+                FOR ontogpt IN @@from_collection
+                    FILTER DOCUMENT(@to_collection, ontogpt.cell_id) != null
+                    LET from_key = ontogpt._key
+                    LET to_key = ontogpt.cell_id
+            """,
+        }
+
+        adb.derive_edges(db, RecordingGraph(), derivation)
+
+        query, bind_vars = db.queries[0]
+        self.assertIn("INTO @@edge_collection", query)
+        self.assertEqual(
+            bind_vars,
+            {
+                "@from_collection": "ontogpt",
+                "from_collection": "ontogpt",
+                "to_collection": "cell",
+                "@edge_collection": "ontogpt-cell",
+            },
+        )
@@ -0,0 +1,107 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Lock, Thread
+from time import sleep
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from AsyncArangoDB import AsyncArangoDB
+
+
+class ArangoHandler(BaseHTTPRequestHandler):
+    """Serve the few ArangoDB endpoints used, counting requests in
+    flight."""
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/_db/_system/_api/database":
+            self.send_json(200, {"result": sorted(self.server.databases)})
+        else:
+            self.send_json(404, {"error": True})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if path == "/_db/_system/_api/database":
+            self.server.databases.add(body["name"])
+            self.send_json(201, {"result": True})
+        elif path.endswith("/_api/import"):
+            with self.server.lock:
+                self.server.in_flight += 1
+                self.server.max_in_flight = max(
+                    self.server.max_in_flight, self.server.in_flight
+                )
+            sleep(0.05)
+            collection = parse_qs(urlparse(self.path).query)["collection"][0]
+            self.server.documents.setdefault(collection, []).extend(body)
+            with self.server.lock:
+                self.server.in_flight -= 1
+            self.send_json(201, {"created": len(body), "errors": 0})
+        else:
+            self.send_json(404, {"error": True})
+
+    def send_json(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestAsyncArangoDB(unittest.TestCase):
+
+    def setUp(self):
+
+        # Serve ArangoDB endpoints from a local HTTP stand-in
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ArangoHandler)
+        self.server.databases = {"_system"}
+        self.server.documents = {}
+        self.server.lock = Lock()
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.hosts = f"http://127.0.0.1:{self.server.server_port}"
+
+    def test_create_or_get_database(self):
+
+        async def create_or_get_database():
+            client = AsyncArangoDB(hosts=self.hosts, password="")
+            db = await client.create_or_get_database("database")
+            client.close()
+            return db
+
+        db = asyncio.run(create_or_get_database())
+
+        self.assertEqual(db.name, "database")
+        self.assertIn("database", self.server.databases)
+
+    def test_insert_documents(self):
+
+        async def insert_documents(documents):
+            client = AsyncArangoDB(hosts=self.hosts, password="", max_concurrency=2)
+            db = await client.create_or_get_database("database")
+            counts = await client.insert_documents(
+                db.collection("collection"), documents, batch_size=2
+            )
+            client.close()
+            return counts
+
+        documents = [{"_key": str(i_doc)} for i_doc in range(10)]
+        counts = asyncio.run(insert_documents(documents))
+
+        self.assertEqual(counts["created"], 10)
+        self.assertEqual(
+            sorted(self.server.documents["collection"], key=lambda d: int(d["_key"])),
+            documents,
+        )
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def tearDown(self):
+
+        # Stop the HTTP stand-in
+        self.server.shutdown()
+        self.server.server_close()
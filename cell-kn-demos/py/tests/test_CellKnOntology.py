@@ -0,0 +1,53 @@
+import unittest
+
+import pandas as pd
+from rdflib.term import Literal, URIRef
+
+import CellKnOntology as ckno
+
+OBO = "http://purl.obolibrary.org/obo/"
+RDFS_LABEL = URIRef("http://www.w3.org/2000/01/rdf-schema#label")
+RDFS_SUBCLASSOF = URIRef("http://www.w3.org/2000/01/rdf-schema#subClassOf")
+
+
+class TestCreateTriples(unittest.TestCase):
+
+    def setUp(self):
+
+        self.schema = pd.DataFrame(
+            {
+                "Subject Node": ["cell", "cell", "missing"],
+                "Predicate Relation": ["part_of", "is_a", "part_of"],
+                "Object Node": ["organ", "missing", "organ"],
+            }
+        )
+        self.relations = pd.DataFrame(
+            {
+                "Name": ["cell_class", "organ_class", "part_of", "is_a"],
+                "Label": ["cell", "organ", "part of", "is a"],
+                "CURIE": [
+                    "CL:0000000",
+                    "UBERON:0000062",
+                    "BFO:0000050",
+                    "rdfs:subClassOf",
+                ],
+            }
+        )
+
+    def test_create_triples(self):
+
+        triples, ids = ckno.create_triples(self.schema, self.relations)
+
+        cell = URIRef(f"{OBO}CL_0000000")
+        organ = URIRef(f"{OBO}UBERON_0000062")
+        self.assertEqual(
+            triples,
+            [
+                (cell, RDFS_LABEL, Literal("cell")),
+                (organ, RDFS_LABEL, Literal("organ")),
+                (cell, URIRef(f"{OBO}BFO_0000050"), organ),
+                (cell, RDFS_LABEL, Literal("cell")),
+            ],
+        )
+        self.assertIsInstance(triples[0][2], Literal)
+        self.assertEqual(ids, {"CL", "UBERON", "BFO", None})
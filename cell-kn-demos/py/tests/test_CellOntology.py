@@ -0,0 +1,695 @@
+from contextlib import redirect_stdout
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+from pathlib import Path
+import shutil
+import tempfile
+from threading import enumerate as enumerate_threads, Thread
+import unittest
+from unittest.mock import patch
+from xml.sax import SAXParseException
+
+from rdflib import Graph
+from rdflib.compare import isomorphic
+from rdflib.term import BNode, Literal, URIRef
+
+import ArangoDB as adb
+from benchmark_parse_term import parse_term_without_cache
+import CellOntology as co
+
+ONTOLOGY_XML = """<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">
+    <owl:Ontology rdf:about="http://purl.obolibrary.org/obo/cl.owl">
+        <owl:versionIRI rdf:resource="http://purl.obolibrary.org/obo/cl/releases/{version}/cl.owl"/>
+        <owl:versionInfo>{version}</owl:versionInfo>
+    </owl:Ontology>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/CL_0000000">
+        <rdfs:label>cell</rdfs:label>
+    </owl:Class>
+</rdf:RDF>
+"""
+
+
+VERSION_IRI_XML = """<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+    <owl:Ontology rdf:about="http://purl.obolibrary.org/obo/cl.owl">
+        <owl:versionIRI rdf:resource="http://purl.obolibrary.org/obo/cl/releases/{version}/cl.owl"/>
+    </owl:Ontology>
+</rdf:RDF>
+"""
+
+UNVERSIONED_XML = """<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">
+    <owl:Ontology rdf:about="http://purl.obolibrary.org/obo/cl.owl"/>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/CL_0000000">
+        <rdfs:label>cell {version}</rdfs:label>
+    </owl:Class>
+</rdf:RDF>
+"""
+
+
+class OntologyHandler(BaseHTTPRequestHandler):
+    """Serve the current ontology XML, honoring If-None-Match."""
+
+    def do_GET(self):
+        self.server.n_requests += 1
+        content = self.server.xml.format(version=self.server.version).encode()
+        etag = f'"{md5(content).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestUpdateOntologies(unittest.TestCase):
+
+    def setUp(self):
+
+        # Serve ontologies from a local HTTP stand-in
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), OntologyHandler)
+        self.server.xml = ONTOLOGY_XML
+        self.server.version = "2024-01-01"
+        self.server.n_requests = 0
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.obo_purl = f"http://127.0.0.1:{self.server.server_port}/obo/cl.owl"
+
+        # Download ontologies to a temporary directory
+        self.obo_dirpath = Path(tempfile.mkdtemp())
+        self.obo_filepath = self.obo_dirpath / "cl.owl"
+
+    def test_update_ontologies_downloads_new_ontology(self):
+
+        co.update_ontologies(obo_purls=[self.obo_purl], obo_dirpath=self.obo_dirpath)
+
+        self.assertEqual(co.read_ontology_version(self.obo_filepath), "2024-01-01")
+        with open(self.obo_dirpath / co.UPDATE_MANIFEST_FILENAME) as fp:
+            manifest = json.load(fp)
+        self.assertIsNotNone(manifest[self.obo_purl]["etag"])
+
+    def test_update_ontologies_skips_unmodified_ontology(self):
+
+        co.update_ontologies(obo_purls=[self.obo_purl], obo_dirpath=self.obo_dirpath)
+        mtime = self.obo_filepath.stat().st_mtime_ns
+
+        co.update_ontologies(obo_purls=[self.obo_purl], obo_dirpath=self.obo_dirpath)
+
+        self.assertEqual(self.server.n_requests, 2)
+        self.assertEqual(self.obo_filepath.stat().st_mtime_ns, mtime)
+        self.assertFalse((self.obo_dirpath / "cl-new.owl").exists())
+
+    def test_update_ontologies_replaces_older_ontology(self):
+
+        co.update_ontologies(obo_purls=[self.obo_purl], obo_dirpath=self.obo_dirpath)
+
+        self.server.version = "2024-02-01"
+        co.update_ontologies(obo_purls=[self.obo_purl], obo_dirpath=self.obo_dirpath)
+
+        self.assertEqual(co.read_ontology_version(self.obo_filepath), "2024-02-01")
+        self.assertEqual(
+            co.read_ontology_version(self.obo_dirpath / "cl-2024-01-01.owl"),
+            "2024-01-01",
+        )
+
+    def test_update_ontologies_replaces_ontology_with_only_version_iri(self):
+
+        self.server.xml = VERSION_IRI_XML
+        co.update_ontologies(obo_purls=[self.obo_purl], obo_dirpath=self.obo_dirpath)
+
+        self.server.version = "2024-02-01"
+        co.update_ontologies(obo_purls=[self.obo_purl], obo_dirpath=self.obo_dirpath)
+
+        self.assertEqual(co.read_ontology_version(self.obo_filepath), "2024-02-01")
+        self.assertEqual(
+            co.read_ontology_version(self.obo_dirpath / "cl-2024-01-01.owl"),
+            "2024-01-01",
+        )
+        self.assertFalse((self.obo_dirpath / "cl-new.owl").exists())
+
+    def test_update_ontologies_keeps_archives_of_unversioned_ontology(self):
+
+        self.server.xml = UNVERSIONED_XML
+        for version in ["2024-01-01", "2024-02-01", "2024-03-01"]:
+            self.server.version = version
+            co.update_ontologies(
+                obo_purls=[self.obo_purl], obo_dirpath=self.obo_dirpath
+            )
+
+        self.assertEqual(len(list(self.obo_dirpath.glob("cl-previous-*.owl"))), 2)
+
+    def tearDown(self):
+
+        # Stop the HTTP stand-in, and remove the temporary directory
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.obo_dirpath)
+
+
+LABELS_XML = """<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">
+    <owl:ObjectProperty rdf:about="http://purl.obolibrary.org/obo/RO_0002202">
+        <rdfs:label xml:lang="en">develops from</rdfs:label>
+    </owl:ObjectProperty>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/CL_0000000">
+        <rdfs:label>cell</rdfs:label>
+        <rdfs:label>native cell</rdfs:label>
+    </owl:Class>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/CL_0000540">
+        <rdfs:label>neuron</rdfs:label>
+        <rdfs:label xml:lang="fr">neurone</rdfs:label>
+    </owl:Class>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/UBERON_0002048">
+        <rdfs:label>lung</rdfs:label>
+    </owl:Class>
+    <owl:NamedIndividual rdf:about="http://purl.obolibrary.org/obo/NCBITaxon_9606">
+        <rdfs:label>Homo sapiens</rdfs:label>
+    </owl:NamedIndividual>
+</rdf:RDF>
+"""
+
+
+class TestParseTriples(unittest.TestCase):
+
+    def setUp(self):
+
+        # Write ontology XML to a temporary directory
+        self.obo_dirpath = Path(tempfile.mkdtemp())
+        (self.obo_dirpath / "labels.owl").write_text(LABELS_XML)
+
+    def test_parse_triples_equals_parse_obo(self):
+
+        triples, t2l, l2t, ids = co.parse_ontology(
+            self.obo_dirpath, "labels.owl", use_cache=False
+        )
+
+        self.assertEqual((t2l, l2t, ids), co.parse_obo(self.obo_dirpath, "labels.owl"))
+        self.assertEqual(t2l["CL_0000000"], "cell")
+        self.assertEqual(t2l["CL_0000540"], "neuron")
+        self.assertEqual(t2l["RO_0002202"], "develops from")
+        self.assertNotIn("NCBITaxon_9606", t2l)
+        self.assertNotIn("NCBITaxon", ids)
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.obo_dirpath)
+
+
+NESTED_XML = """<?xml version="1.0"?>
+<rdf:RDF xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+     xmlns:oboInOwl="http://www.geneontology.org/formats/oboInOwl#">
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/CL_0000540">
+        <rdfs:label>neuron</rdfs:label>
+        <rdfs:subClassOf rdf:resource="http://purl.obolibrary.org/obo/CL_0000000"/>
+        <rdfs:subClassOf>
+            <owl:Restriction>
+                <owl:onProperty rdf:resource="http://purl.obolibrary.org/obo/RO_0002202"/>
+                <owl:someValuesFrom rdf:resource="http://purl.obolibrary.org/obo/CL_0000047"/>
+            </owl:Restriction>
+        </rdfs:subClassOf>
+        <rdfs:subClassOf>
+            <owl:Restriction>
+                <owl:onProperty rdf:resource="http://purl.obolibrary.org/obo/BFO_0000050"/>
+                <owl:someValuesFrom>
+                    <owl:Restriction>
+                        <owl:onProperty rdf:resource="http://purl.obolibrary.org/obo/RO_0002202"/>
+                        <owl:someValuesFrom rdf:resource="http://purl.obolibrary.org/obo/UBERON_0001016"/>
+                    </owl:Restriction>
+                </owl:someValuesFrom>
+            </owl:Restriction>
+        </rdfs:subClassOf>
+    </owl:Class>
+    <owl:Axiom>
+        <owl:annotatedSource rdf:resource="http://purl.obolibrary.org/obo/CL_0000540"/>
+        <owl:annotatedProperty rdf:resource="http://www.w3.org/2000/01/rdf-schema#label"/>
+        <owl:annotatedTarget>neuron</owl:annotatedTarget>
+        <oboInOwl:hasDbXref>FMA:54527</oboInOwl:hasDbXref>
+    </owl:Axiom>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/CL_0000047">
+        <rdfs:label>neuronal stem cell</rdfs:label>
+    </owl:Class>
+</rdf:RDF>
+"""
+
+
+class TestStreamTriples(unittest.TestCase):
+
+    def setUp(self):
+
+        # Write ontology XML to a temporary directory
+        self.obo_dirpath = Path(tempfile.mkdtemp())
+        (self.obo_dirpath / "nested.owl").write_text(NESTED_XML)
+        self.ro = {"RO_0002202": "develops from", "BFO_0000050": "part of"}
+
+    def test_stream_triples_equals_graph_parse(self):
+
+        rdf_graph = Graph().parse(self.obo_dirpath / "nested.owl")
+
+        # Pass one triple at a time through a queue of one chunk, so
+        # that the parser thread blocks on the consumer
+        for chunk_size, queue_size in [(1, 1), (co.STREAM_CHUNK_SIZE, 1)]:
+            with self.subTest(chunk_size=chunk_size, queue_size=queue_size):
+                triples = list(
+                    co.stream_triples(
+                        self.obo_dirpath,
+                        "nested.owl",
+                        chunk_size=chunk_size,
+                        queue_size=queue_size,
+                    )
+                )
+                streamed_graph = Graph()
+                for triple in triples:
+                    streamed_graph.add(triple)
+
+                self.assertEqual(len(triples), len(rdf_graph))
+                self.assertTrue(isomorphic(streamed_graph, rdf_graph))
+
+    def test_stream_triples_raises_parser_error(self):
+
+        (self.obo_dirpath / "invalid.owl").write_text(NESTED_XML[:-20])
+
+        with self.assertRaises(SAXParseException):
+            list(co.stream_triples(self.obo_dirpath, "invalid.owl", chunk_size=1))
+
+    def test_stream_triples_stops_parser_when_closed(self):
+
+        # Close the generator while the parser thread blocks on a full
+        # queue of one chunk
+        triples = co.stream_triples(
+            self.obo_dirpath, "nested.owl", chunk_size=1, queue_size=1
+        )
+        next(triples)
+        triples.close()
+
+        self.assertNotIn(
+            "stream_triples-nested.owl", [thread.name for thread in enumerate_threads()]
+        )
+
+    def test_stream_fnode_and_bnode_triples_equals_graph_parse(self):
+
+        rdf_graph = Graph().parse(self.obo_dirpath / "nested.owl")
+        _, fnode_triples, bnode_triple_sets = co.classify_triples(rdf_graph, ro=self.ro)
+        bnode_triples, _ = co.create_bnode_triples_from_bnode_triple_sets(
+            bnode_triple_sets, ro=self.ro
+        )
+        expected = sorted(fnode_triples + bnode_triples)
+
+        # Triples sharing a BNode are contiguous, so one open BNode
+        # suffices
+        for max_open_bnodes in [co.MAX_OPEN_BNODES, 1]:
+            with self.subTest(max_open_bnodes=max_open_bnodes):
+                triples = co.stream_fnode_and_bnode_triples(
+                    co.stream_triples(self.obo_dirpath, "nested.owl"),
+                    ro=self.ro,
+                    max_open_bnodes=max_open_bnodes,
+                )
+                self.assertEqual(sorted(triples), expected)
+
+    def test_stream_fnode_and_bnode_triples_evicts_least_recently_used(self):
+
+        obo = "http://purl.obolibrary.org/obo/"
+        owl = "http://www.w3.org/2002/07/owl#"
+        neuron = URIRef(f"{obo}CL_0000540")
+        sub_class_of = URIRef("http://www.w3.org/2000/01/rdf-schema#subClassOf")
+        on_property = URIRef(f"{owl}onProperty")
+        some_values_from = URIRef(f"{owl}someValuesFrom")
+        a = BNode("a")
+        b = BNode("b")
+
+        # Interleave the triples of two BNodes
+        triples = [
+            (neuron, sub_class_of, a),
+            (neuron, sub_class_of, b),
+            (a, on_property, URIRef(f"{obo}RO_0002202")),
+            (b, on_property, URIRef(f"{obo}BFO_0000050")),
+            (a, some_values_from, URIRef(f"{obo}CL_0000047")),
+            (b, some_values_from, URIRef(f"{obo}UBERON_0001016")),
+        ]
+
+        self.assertEqual(
+            list(
+                co.stream_fnode_and_bnode_triples(
+                    triples, ro=self.ro, max_open_bnodes=2
+                )
+            ),
+            [
+                (neuron, URIRef(f"{obo}RO_0002202"), URIRef(f"{obo}CL_0000047")),
+                (neuron, URIRef(f"{obo}BFO_0000050"), URIRef(f"{obo}UBERON_0001016")),
+            ],
+        )
+
+        # Sets evicted before complete create no triples
+        self.assertEqual(
+            list(
+                co.stream_fnode_and_bnode_triples(
+                    triples, ro=self.ro, max_open_bnodes=1
+                )
+            ),
+            [],
+        )
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.obo_dirpath)
+
+
+class TestParseTerm(unittest.TestCase):
+
+    def setUp(self):
+
+        # Terms parsed by the OBO PURL prefix, and by urlparse
+        obo = "http://purl.obolibrary.org/obo/"
+        self.terms = [
+            URIRef(f"{obo}CL_0000540"),
+            URIRef(f"{obo}RO_0002202"),
+            URIRef(f"{obo}GOREL_0000040"),
+            URIRef(f"{obo}cl#has_part"),
+            URIRef(f"{obo}CL_0000540?version=1"),
+            URIRef(f"{obo}CL_0000540;parameter"),
+            URIRef(f"{obo}_0000540"),
+            URIRef("http://www.w3.org/2000/01/rdf-schema#label"),
+            URIRef("http://www.geneontology.org/formats/oboInOwl#hasExactSynonym"),
+            URIRef("http://www.ebi.ac.uk/efo/EFO_0000001"),
+            BNode("n0123"),
+            Literal("cell"),
+            Literal("http://purl.obolibrary.org/obo/CL_0000540"),
+            "http://purl.obolibrary.org/obo/UBERON_0002048",
+            "n0123",
+        ]
+        self.ro = {"RO_0002202": "develops from"}
+
+    def test_parse_term_equals_urlparse(self):
+
+        for ro in [None, self.ro]:
+            for term in self.terms:
+                with self.subTest(term=term, ro=ro):
+                    with redirect_stdout(io.StringIO()) as expected_stdout:
+                        expected = parse_term_without_cache(term, ro=ro)
+                    with redirect_stdout(io.StringIO()) as stdout:
+                        self.assertEqual(co.parse_term(term, ro=ro), expected)
+                    self.assertEqual(stdout.getvalue(), expected_stdout.getvalue())
+
+    def test_classify_term_is_cached(self):
+
+        co.classify_term.cache_clear()
+        with redirect_stdout(io.StringIO()):
+            for term in self.terms + self.terms:
+                co.parse_term(term)
+        cache_info = co.classify_term.cache_info()
+
+        self.assertEqual(cache_info.misses, len(self.terms))
+        self.assertEqual(cache_info.hits, len(self.terms))
+
+    def test_classify_term_distinguishes_term_types(self):
+
+        # Equal strings of different types are cached separately
+        co.classify_term.cache_clear()
+
+        self.assertEqual(co.parse_term(BNode("n0123"))[4], "class")
+        self.assertEqual(co.parse_term("n0123")[4], "literal")
+
+
+class TestClassifyTriples(unittest.TestCase):
+
+    def test_classify_triples_equals_multiple_passes(self):
+
+        obo = "http://purl.obolibrary.org/obo/"
+        owl = "http://www.w3.org/2002/07/owl#"
+        rdfs = "http://www.w3.org/2000/01/rdf-schema#"
+        oio = "http://www.geneontology.org/formats/oboInOwl#"
+        neuron = URIRef(f"{obo}CL_0000540")
+        cell = URIRef(f"{obo}CL_0000000")
+        restriction = BNode("restriction")
+        axiom = BNode("axiom")
+        rdf_graph = Graph()
+        for triple in [
+            (neuron, URIRef(f"{rdfs}label"), Literal("neuron")),
+            (neuron, URIRef(f"{rdfs}subClassOf"), cell),
+            (neuron, URIRef(f"{rdfs}subClassOf"), restriction),
+            (restriction, URIRef(f"{owl}onProperty"), URIRef(f"{obo}RO_0002202")),
+            (restriction, URIRef(f"{owl}someValuesFrom"), cell),
+            (axiom, URIRef(f"{owl}annotatedSource"), neuron),
+            (axiom, URIRef(f"{owl}annotatedProperty"), URIRef(f"{rdfs}label")),
+            (axiom, URIRef(f"{owl}annotatedTarget"), Literal("neuron")),
+            (axiom, URIRef(f"{oio}hasDbXref"), Literal("FMA:54527")),
+            (axiom, URIRef(f"{rdfs}comment"), restriction),
+        ]:
+            rdf_graph.add(triple)
+        ro = {"RO_0002202": "develops from"}
+
+        fp = io.StringIO()
+        triple_types, fnode_triples, bnode_triple_sets = co.classify_triples(
+            rdf_graph, ro=ro, fp=fp
+        )
+
+        expected_bnode_triple_sets = {}
+        co.collect_bnode_triple_sets(
+            rdf_graph, expected_bnode_triple_sets, use="subject", ro=ro
+        )
+        co.collect_bnode_triple_sets(
+            rdf_graph, expected_bnode_triple_sets, use="object", ro=ro
+        )
+        self.assertEqual(triple_types, co.count_triple_types(rdf_graph))
+        self.assertEqual(fnode_triples, co.collect_fnode_triples(rdf_graph))
+        self.assertEqual(
+            {
+                n: {k: sorted(v) for k, v in triple_set.items()}
+                for n, triple_set in bnode_triple_sets.items()
+            },
+            {
+                n: {k: sorted(v) for k, v in triple_set.items()}
+                for n, triple_set in expected_bnode_triple_sets.items()
+            },
+        )
+        self.assertEqual(set(bnode_triple_sets), {restriction, axiom})
+        self.assertEqual(len(fp.getvalue().splitlines()), len(rdf_graph))
+
+
+class TestLoadTriples(unittest.TestCase):
+
+    def test_load_triples_aggregates_annotations_in_one_pass(self):
+
+        cell = URIRef("http://purl.obolibrary.org/obo/CL_0000000")
+        neuron = URIRef("http://purl.obolibrary.org/obo/CL_0000540")
+        synonym = URIRef("http://www.geneontology.org/formats/oboInOwl#hasExactSynonym")
+        label = URIRef("http://www.w3.org/2000/01/rdf-schema#label")
+        sub_class_of = URIRef("http://www.w3.org/2000/01/rdf-schema#subClassOf")
+        triples = [
+            (cell, label, Literal("cell")),
+            (cell, synonym, Literal("a cell")),
+            (neuron, sub_class_of, cell),
+            (cell, synonym, Literal("the cell")),
+            (cell, synonym, Literal("a cell")),
+        ]
+
+        # Load triples from a generator, which can be consumed once
+        with patch.object(
+            co, "create_or_get_vertices_from_triple"
+        ) as create_or_get_vertices, patch.object(
+            co, "create_or_get_edge_from_triple"
+        ) as create_or_get_edge, patch.object(
+            co, "update_vertex_from_annotation"
+        ) as update_vertex:
+            co.load_triples_into_adb_graph(iter(triples), None, {}, {})
+
+        self.assertEqual(
+            [c.args[2:5] for c in create_or_get_vertices.call_args_list],
+            [(neuron, sub_class_of, cell)],
+        )
+        self.assertEqual(
+            [c.args[3:6] for c in create_or_get_edge.call_args_list],
+            [(neuron, sub_class_of, cell)],
+        )
+        update_vertex.assert_called_once()
+        self.assertEqual(
+            update_vertex.call_args.args[2:5],
+            (
+                "CL",
+                "0000000",
+                {
+                    "_key": "0000000",
+                    "term": "CL_0000000",
+                    "label": "cell",
+                    "hasExactSynonym": ["a cell", "the cell"],
+                },
+            ),
+        )
+
+
+class FlakyCollection:
+    """Record imported batches, failing on a given request."""
+
+    name = "CL"
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.n_requests = 0
+        self.batches = []
+
+    def import_bulk(self, documents, on_duplicate="error"):
+        self.n_requests += 1
+        if self.n_requests == self.fail_on:
+            raise ConnectionError("Transient error")
+        self.batches.append([document["_key"] for document in documents])
+        return {"created": len(documents), "errors": 0}
+
+
+class TestImportDocumentBatches(unittest.TestCase):
+
+    def setUp(self):
+
+        # Checkpoint to a temporary directory
+        self.checkpoint_dirpath = Path(tempfile.mkdtemp())
+        self.checkpoint_filepath = self.checkpoint_dirpath / "checkpoint.sqlite"
+        self.documents = [{"_key": f"{i_doc:07d}"} for i_doc in range(10)][::-1]
+
+    def test_import_document_batches_resumes_after_error(self):
+
+        collection = FlakyCollection(fail_on=3)
+        checkpoint = adb.open_checkpoint(self.checkpoint_filepath)
+        with self.assertRaises(ConnectionError):
+            co.import_document_batches(
+                self.documents,
+                collection,
+                "upsert",
+                batch_size=3,
+                checkpoint=checkpoint,
+            )
+        checkpoint.close()
+
+        checkpoint = adb.open_checkpoint(self.checkpoint_filepath)
+        co.import_document_batches(
+            self.documents, collection, "upsert", batch_size=3, checkpoint=checkpoint
+        )
+        checkpoint.close()
+
+        self.assertEqual(
+            collection.batches,
+            [
+                ["0000000", "0000001", "0000002"],
+                ["0000003", "0000004", "0000005"],
+                ["0000006", "0000007", "0000008"],
+                ["0000009"],
+            ],
+        )
+
+    def test_import_document_batches_rewrites_changed_batches(self):
+
+        collection = FlakyCollection()
+        checkpoint = adb.open_checkpoint(self.checkpoint_filepath)
+        co.import_document_batches(
+            self.documents, collection, "upsert", batch_size=3, checkpoint=checkpoint
+        )
+
+        # Change a document in the second batch, then resume
+        self.documents[5]["label"] = "changed"
+        collection.batches = []
+        co.import_document_batches(
+            self.documents, collection, "upsert", batch_size=3, checkpoint=checkpoint
+        )
+        checkpoint.close()
+
+        self.assertEqual(collection.batches, [["0000003", "0000004", "0000005"]])
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.checkpoint_dirpath)
+
+
+class TestDiffDocuments(unittest.TestCase):
+
+    def test_diff_documents(self):
+
+        old_vertices = {
+            "CL": {
+                "0000001": {"_key": "0000001", "label": "a", "synonym": ["b", "c"]},
+                "0000002": {"_key": "0000002", "label": "d"},
+                "0000003": {"_key": "0000003", "label": "e", "synonym": "f"},
+            }
+        }
+        fingerprints = co.fingerprint_documents(old_vertices, {})
+        new_vertices = {
+            "CL": {
+                "0000001": {"_key": "0000001", "label": "a", "synonym": ["c", "b"]},
+                "0000003": {"_key": "0000003", "label": "e"},
+                "0000004": {"_key": "0000004", "label": "g"},
+            }
+        }
+
+        diff, new_fingerprints = co.diff_documents(fingerprints, new_vertices, {})
+
+        self.assertEqual(
+            diff,
+            {
+                "CL": {
+                    "added": [{"_key": "0000004", "label": "g"}],
+                    "changed": [{"_key": "0000003", "label": "e", "synonym": None}],
+                    "removed": ["0000002"],
+                }
+            },
+        )
+        self.assertEqual(co.diff_documents(new_fingerprints, new_vertices, {})[0], {})
+
+    def test_diff_documents_removes_collection(self):
+
+        vertices = {
+            "CL": {"0000001": {"_key": "0000001", "label": "a"}},
+            "UBERON": {"0000002": {"_key": "0000002", "label": "b"}},
+        }
+        checkpoint_dirpath = Path(tempfile.mkdtemp())
+        checkpoint = adb.open_checkpoint(checkpoint_dirpath / "checkpoint.sqlite")
+        try:
+            adb.write_fingerprints(checkpoint, co.fingerprint_documents(vertices, {}))
+
+            # Remove all documents of a collection
+            uberon = vertices.pop("UBERON")
+            diff, fingerprints = co.diff_documents(
+                adb.read_fingerprints(checkpoint), vertices, {}
+            )
+            self.assertEqual(
+                diff, {"UBERON": {"added": [], "changed": [], "removed": ["0000002"]}}
+            )
+            adb.write_fingerprints(checkpoint, fingerprints)
+            self.assertEqual(list(adb.read_fingerprints(checkpoint)), ["CL"])
+            self.assertEqual(
+                co.diff_documents(adb.read_fingerprints(checkpoint), vertices, {})[0],
+                {},
+            )
+
+            # Restore the collection, which is added again
+            vertices["UBERON"] = uberon
+            diff, _ = co.diff_documents(adb.read_fingerprints(checkpoint), vertices, {})
+            self.assertEqual(
+                diff,
+                {
+                    "UBERON": {
+                        "added": [{"_key": "0000002", "label": "b"}],
+                        "changed": [],
+                        "removed": [],
+                    }
+                },
+            )
+
+        finally:
+            checkpoint.close()
+            shutil.rmtree(checkpoint_dirpath)
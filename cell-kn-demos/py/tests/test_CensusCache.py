@@ -0,0 +1,169 @@
+import ast
+from pathlib import Path
+import re
+import shutil
+import tempfile
+from types import SimpleNamespace
+import unittest
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import CensusCache as cc
+
+
+class StubObs:
+    """Stand in for a Census obs DataFrame, returning the rows of the
+    filtered tissues in chunks, and recording each read."""
+
+    def __init__(self, table, chunk_size=2):
+        self.table = table
+        self.chunk_size = chunk_size
+        self.reads = []
+
+    def read(self, value_filter=None, column_names=None):
+        self.reads.append((value_filter, column_names))
+        tissues = ast.literal_eval(re.search(r"\[.*?\]", value_filter).group())
+        table = self.table.filter(pc.field("tissue_general").isin(tissues))
+        table = table.select(column_names)
+        for offset in range(0, len(table), self.chunk_size):
+            yield table.slice(offset, self.chunk_size)
+
+
+class TestCensusCache(unittest.TestCase):
+
+    def setUp(self):
+
+        # Write to a temporary directory
+        self.dataset_dirpath = Path(tempfile.mkdtemp()) / "obs"
+        self.obs = StubObs(
+            pa.table(
+                {
+                    "soma_joinid": [0, 1, 2, 3, 4],
+                    "cell_type": ["a", "b", "a", "c", "b"],
+                    "tissue_general": ["lung", "eye", "lung", "lung", "eye"],
+                    "raw_sum": [1.0, 2.0, 3.0, 4.0, 5.0],
+                }
+            )
+        )
+        self.census = {"census_data": {"homo_sapiens": SimpleNamespace(obs=self.obs)}}
+        self.column_names = ["soma_joinid", "cell_type", "tissue_general"]
+
+    def test_write_batches_partitions_obs(self):
+
+        n_rows = cc.write_batches(
+            cc.read_obs_batches(
+                self.census, "homo_sapiens", ["lung", "eye"], self.column_names
+            ),
+            self.dataset_dirpath,
+        )
+
+        self.assertEqual(n_rows, 5)
+        self.assertEqual(self.obs.reads[0][1], self.column_names)
+        self.assertEqual(
+            sorted(
+                str(path.relative_to(self.dataset_dirpath))
+                for path in self.dataset_dirpath.glob("*/*")
+            ),
+            [
+                "organism=homo_sapiens/tissue_general=eye",
+                "organism=homo_sapiens/tissue_general=lung",
+            ],
+        )
+        obs = pd.read_parquet(self.dataset_dirpath).sort_values("soma_joinid")
+        self.assertEqual(obs["soma_joinid"].to_list(), [0, 1, 2, 3, 4])
+        self.assertEqual(obs["cell_type"].dtype, "category")
+        self.assertNotIn("raw_sum", obs.columns)
+
+    def write_missing_partitions(self, tissues, column_names):
+        missing = cc.get_missing_partitions(
+            self.dataset_dirpath, ["homo_sapiens"], tissues, column_names
+        )
+        for organism, missing_tissues in missing.items():
+            columns = cc.get_partition_columns(
+                self.dataset_dirpath, organism, missing_tissues, column_names
+            )
+            cc.write_batches(
+                cc.read_obs_batches(self.census, organism, missing_tissues, columns),
+                self.dataset_dirpath,
+            )
+            cc.update_manifest(self.dataset_dirpath, organism, missing_tissues, columns)
+        return missing
+
+    def test_query_obs_reads_missing_partitions(self):
+
+        missing = self.write_missing_partitions(["lung"], self.column_names)
+        self.assertEqual(missing, {"homo_sapiens": ["lung"]})
+
+        # A subset of the columns written is present
+        missing = self.write_missing_partitions(["lung"], ["soma_joinid"])
+        self.assertEqual(missing, {})
+
+        # A new column, or tissue is missing, and rewriting a partition
+        # keeps the columns written before
+        missing = self.write_missing_partitions(
+            ["eye"], ["soma_joinid", "tissue_general", "raw_sum"]
+        )
+        self.assertEqual(missing, {"homo_sapiens": ["eye"]})
+        missing = self.write_missing_partitions(["lung", "eye"], self.column_names)
+        self.assertEqual(missing, {"homo_sapiens": ["eye"]})
+        manifest = cc.read_manifest(self.dataset_dirpath)
+        self.assertEqual(
+            set(manifest["homo_sapiens/eye"]), set(self.column_names + ["raw_sum"])
+        )
+
+        obs = cc.query_obs(
+            self.dataset_dirpath,
+            organisms=["homo_sapiens"],
+            tissues=["lung"],
+            columns=["soma_joinid", "tissue_general"],
+            filters=[("cell_type", "==", "a")],
+        )
+        self.assertEqual(obs["soma_joinid"].to_list(), [0, 2])
+        self.assertEqual(list(obs.columns), ["soma_joinid", "tissue_general"])
+        self.assertEqual(obs["tissue_general"].dtype, "category")
+
+        # Columns missing from a partition are read as null
+        obs = cc.query_obs(self.dataset_dirpath, columns=["soma_joinid", "raw_sum"])
+        obs = obs.sort_values("soma_joinid")
+        self.assertEqual(
+            obs["raw_sum"].isna().to_list(), [True, False, True, True, False]
+        )
+
+    def test_write_batches_reads_partition_columns(self):
+
+        # Columns requested without the partition column
+        missing = self.write_missing_partitions(["lung"], ["soma_joinid"])
+        self.assertEqual(missing, {"homo_sapiens": ["lung"]})
+        self.assertEqual(self.obs.reads[0][1], ["soma_joinid", "tissue_general"])
+        self.assertEqual(
+            cc.read_manifest(self.dataset_dirpath)["homo_sapiens/lung"],
+            ["soma_joinid", "tissue_general"],
+        )
+
+        obs = cc.query_obs(self.dataset_dirpath, columns=["soma_joinid"])
+        self.assertEqual(sorted(obs["soma_joinid"].to_list()), [0, 2, 3])
+
+    def test_query_obs_reads_no_cells(self):
+
+        # No cells are written for a tissue without primary cells
+        missing = self.write_missing_partitions(["brain"], self.column_names)
+        self.assertEqual(missing, {"homo_sapiens": ["brain"]})
+        self.assertEqual(self.write_missing_partitions(["brain"], ["soma_joinid"]), {})
+
+        for dataset_dirpath in [self.dataset_dirpath, self.dataset_dirpath / "none"]:
+            with self.subTest(dataset_dirpath=dataset_dirpath):
+                obs = cc.query_obs(
+                    dataset_dirpath,
+                    organisms=["homo_sapiens"],
+                    tissues=["brain"],
+                    columns=["soma_joinid", "organism"],
+                )
+                self.assertTrue(obs.empty)
+                self.assertEqual(list(obs.columns), ["soma_joinid", "organism"])
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.dataset_dirpath.parent)
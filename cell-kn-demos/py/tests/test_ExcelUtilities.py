@@ -0,0 +1,78 @@
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+import ExcelUtilities as eu
+
+
+class TestReadWorkbook(unittest.TestCase):
+
+    def setUp(self):
+
+        # Write a workbook to a temporary directory
+        self.excel_dirpath = Path(tempfile.mkdtemp())
+        self.excel_filepath = self.excel_dirpath / "workbook.xlsx"
+        self.write_workbook("a")
+        self.sheets = {
+            0: dict(usecols=["name", "label"]),
+            "relations": dict(header=1, usecols=[0, 1]),
+        }
+
+    def write_workbook(self, label):
+        with pd.ExcelWriter(self.excel_filepath) as writer:
+            pd.DataFrame(
+                {"name": ["x", "y"], "label": [label, "b"], "unused": [1, 2]}
+            ).to_excel(writer, sheet_name="schema", index=False)
+            pd.DataFrame(
+                [["title", None, None], ["s", "o", "unused"], ["x", "y", 3]]
+            ).to_excel(writer, sheet_name="relations", index=False, header=False)
+
+    def test_read_workbook_caches_sheets(self):
+
+        data = eu.read_workbook(self.excel_filepath, self.sheets)
+        self.assertEqual(list(data[0].columns), ["name", "label"])
+        self.assertEqual(list(data["relations"].columns), ["s", "o"])
+        self.assertEqual(len(list(self.excel_dirpath.glob("*.parquet"))), 2)
+
+        with patch.object(eu.pd, "ExcelFile") as excel_file:
+            cached = eu.read_workbook(self.excel_filepath, self.sheets)
+        excel_file.assert_not_called()
+        for sheet in self.sheets:
+            pd.testing.assert_frame_equal(cached[sheet], data[sheet])
+
+    def test_read_workbook_rereads_changed_workbook(self):
+
+        eu.read_workbook(self.excel_filepath, self.sheets)
+        self.write_workbook("c")
+
+        data = eu.read_workbook(self.excel_filepath, self.sheets)
+        self.assertEqual(data[0]["label"].to_list(), ["c", "b"])
+        self.assertEqual(len(list(self.excel_dirpath.glob("*.parquet"))), 2)
+
+    def test_read_workbook_keeps_caches_of_other_arguments(self):
+
+        other_sheets = {0: dict(usecols=["name"])}
+        eu.read_workbook(self.excel_filepath, self.sheets)
+        eu.read_workbook(self.excel_filepath, other_sheets)
+        self.assertEqual(len(list(self.excel_dirpath.glob("*.parquet"))), 3)
+
+        with patch.object(eu.pd, "ExcelFile") as excel_file:
+            eu.read_workbook(self.excel_filepath, self.sheets)
+            data = eu.read_workbook(self.excel_filepath, other_sheets)
+        excel_file.assert_not_called()
+        self.assertEqual(list(data[0].columns), ["name"])
+
+        # Changed content removes the caches of the sheet read with any
+        # arguments
+        self.write_workbook("c")
+        eu.read_workbook(self.excel_filepath, other_sheets)
+        self.assertEqual(len(list(self.excel_dirpath.glob("workbook-0-*"))), 1)
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.excel_dirpath)
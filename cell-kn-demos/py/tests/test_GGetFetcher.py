@@ -0,0 +1,114 @@
+from pathlib import Path
+import shutil
+import sqlite3
+import tempfile
+from threading import Lock
+import unittest
+
+import requests
+
+from GGetFetcher import GGetFetcher
+
+
+class StubOpenTargets:
+    """Stand in for gget.opentargets, failing the first call for some
+    gene ids."""
+
+    def __init__(self, flaky_gene_ids=()):
+        self.flaky_gene_ids = set(flaky_gene_ids)
+        self.calls = []
+        self.lock = Lock()
+
+    def __call__(self, gene_id, resource):
+        with self.lock:
+            self.calls.append((gene_id, resource))
+            if gene_id in self.flaky_gene_ids:
+                self.flaky_gene_ids.remove(gene_id)
+                raise requests.exceptions.ConnectionError("Transient error")
+        return [{"id": gene_id, "resource": resource}]
+
+
+class TestGGetFetcher(unittest.TestCase):
+
+    def setUp(self):
+
+        # Cache to a temporary directory
+        self.cache_dirpath = Path(tempfile.mkdtemp())
+        self.cache_filepath = self.cache_dirpath / "gget.sqlite"
+        self.resources = ["diseases", "drugs"]
+
+    def create_fetcher(self, function):
+        return GGetFetcher(
+            self.cache_filepath, function=function, rate=1000, backoff=0, verbose=False
+        )
+
+    def test_fetch_retries_and_caches(self):
+
+        function = StubOpenTargets(flaky_gene_ids=["ENSG1"])
+        fetcher = self.create_fetcher(function)
+        results = fetcher.fetch(["ENSG1", "ENSG2"], self.resources)
+        fetcher.close()
+
+        self.assertEqual(
+            results["ENSG1"]["drugs"], [{"id": "ENSG1", "resource": "drugs"}]
+        )
+        self.assertEqual(len(function.calls), 5)
+        self.assertEqual(fetcher.metrics["fetched"], 4)
+        self.assertEqual(fetcher.metrics["retried"], 1)
+
+        function = StubOpenTargets()
+        fetcher = self.create_fetcher(function)
+        cached = fetcher.fetch(["ENSG2", "ENSG1", "ENSG3"], self.resources)
+        fetcher.close()
+
+        self.assertEqual(function.calls, [("ENSG3", "diseases"), ("ENSG3", "drugs")])
+        self.assertEqual(cached["ENSG1"], results["ENSG1"])
+        self.assertEqual(fetcher.metrics["cached"], 4)
+
+    def test_fetch_gives_up_after_retries(self):
+
+        def function(gene_id, resource):
+            raise requests.exceptions.ConnectionError("Persistent error")
+
+        fetcher = self.create_fetcher(function)
+        results = fetcher.fetch(["ENSG1"], self.resources)
+
+        self.assertEqual(results, {"ENSG1": {"diseases": {}, "drugs": {}}})
+        self.assertEqual(fetcher.metrics["failed"], 2)
+        self.assertIsNone(fetcher.read("ENSG1", "diseases"))
+        self.assertEqual(
+            sorted(fetcher.update(["ENSG1"], self.resources)),
+            [("ENSG1", "diseases"), ("ENSG1", "drugs")],
+        )
+        fetcher.close()
+
+    def test_fetch_does_not_retry_other_errors(self):
+
+        function = StubOpenTargets()
+
+        def parse_error(gene_id, resource):
+            function(gene_id, resource)
+            raise ValueError("Parse error")
+
+        fetcher = self.create_fetcher(parse_error)
+        results = fetcher.fetch(["ENSG1"], self.resources)
+        fetcher.close()
+
+        self.assertEqual(results, {"ENSG1": {"diseases": {}, "drugs": {}}})
+        self.assertEqual(len(function.calls), 2)
+        self.assertEqual(fetcher.metrics["retried"], 0)
+        self.assertEqual(fetcher.metrics["failed"], 2)
+
+    def test_context_manager_closes_cache_on_error(self):
+
+        with self.assertRaises(KeyError):
+            with self.create_fetcher(StubOpenTargets()) as fetcher:
+                raise KeyError("original")
+
+        with self.assertRaises(sqlite3.ProgrammingError):
+            fetcher.read("ENSG1", "diseases")
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.cache_dirpath)
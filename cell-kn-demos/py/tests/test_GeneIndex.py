@@ -0,0 +1,52 @@
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from GeneIndex import GeneIndex
+
+
+class TestGeneIndex(unittest.TestCase):
+
+    def setUp(self):
+
+        # Save to a temporary directory
+        self.index_dirpath = Path(tempfile.mkdtemp())
+        self.index_filepath = self.index_dirpath / "gene-index.json"
+        self.annot = pd.DataFrame(
+            {
+                "ensembl_gene_id": ["ENSG1", "ENSG1", "ENSG2", "ENSG3", "ENSG4"],
+                "external_gene_name": ["SFTPC", "SFTPC", "AGER", "AGER", "CD3E"],
+                "external_synonym": ["SP-C", "PSP-C", "RAGE", None, "T3E"],
+            }
+        )
+
+    def test_lookup(self):
+
+        gene_index = GeneIndex.from_biomart(self.annot)
+
+        self.assertEqual(gene_index.lookup("SFTPC"), ("ENSG1",))
+        self.assertEqual(gene_index.lookup("AGER"), ("ENSG2", "ENSG3"))
+        self.assertEqual(gene_index.lookup("PSP-C"), ("ENSG1",))
+        self.assertEqual(gene_index.lookup("cd3e"), ("ENSG4",))
+        self.assertEqual(gene_index.lookup("rage"), ("ENSG2",))
+        self.assertEqual(gene_index.lookup("MISSING"), ())
+        with self.assertRaises(TypeError):
+            gene_index.symbols["MISSING"] = ("ENSG5",)
+
+    def test_save_and_load(self):
+
+        gene_index = GeneIndex.from_biomart(self.annot)
+        gene_index.save(self.index_filepath)
+
+        loaded = GeneIndex.load(self.index_filepath)
+        self.assertEqual(loaded.symbols, gene_index.symbols)
+        self.assertEqual(loaded.synonyms, gene_index.synonyms)
+        self.assertEqual(loaded.created, gene_index.created)
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.index_dirpath)
@@ -0,0 +1,64 @@
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+
+import NcbiCell as nc
+
+
+class TestJoinCellxgeneCellEdges(unittest.TestCase):
+
+    def test_join_cellxgene_cell_edges(self):
+
+        cellxgene_rows = [["c1", "d1"], ["c2", "d2"], ["c3", "d3"]]
+        cell_rows = [["a", ["d1", "d2", "d1"]], ["b", ["d2"]], ["c", None]]
+
+        edges = nc.join_cellxgene_cell_edges(cellxgene_rows, cell_rows)
+
+        self.assertEqual(
+            [(edge["_from"], edge["_to"]) for edge in edges],
+            [
+                ("cellxgene/c1", "cell/a"),
+                ("cellxgene/c2", "cell/a"),
+                ("cellxgene/c2", "cell/b"),
+            ],
+        )
+        self.assertEqual(edges[0]["_key"], "c1-a")
+
+
+class TestReadNsforestDocuments(unittest.TestCase):
+
+    def setUp(self):
+
+        # Write results to a temporary directory
+        self.results_dirpath = Path(tempfile.mkdtemp())
+        self.results_filepath = self.results_dirpath / "cell_type_results.csv"
+        self.results_filepath.write_text(
+            "clusterName,f_score,PPV,NSForest_markers,binary_genes\n"
+            "\"T cell, CD4\",0.75,0.5,\"['CD4', 'IL7R']\",\"['CD4']\"\n"
+            "B cell,0.25,,['MS4A1'],\n"
+        )
+
+    def test_read_nsforest_documents(self):
+
+        documents = nc.read_nsforest_documents(self.results_filepath, "d1")
+
+        self.assertEqual(
+            documents[0],
+            {
+                "clusterName": "T cell, CD4",
+                "f_score": 0.75,
+                "PPV": 0.5,
+                "NSForest_markers": ["CD4", "IL7R"],
+                "binary_genes": ["CD4"],
+                "_key": "d1:T-cell:-CD4",
+                "dataset_id": "d1",
+            },
+        )
+        self.assertIsNone(documents[1]["PPV"])
+        self.assertEqual(documents[1]["binary_genes"], [])
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.results_dirpath)
@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import ArangoDB as adb
+import SangerOntologies as so
+
+
+def put_batches(obo_filename, documents, batches, error=None):
+    """Put batches of vertex documents on the queue, then raise an
+    error, if given, signaling the writer when done, as
+    transform_ontology does."""
+    try:
+        for i_batch, batch in enumerate(batches):
+            documents.put((obo_filename, "CL", i_batch, batch))
+        if error is not None:
+            raise error
+
+    finally:
+        documents.put((obo_filename, None, None, None))
+
+    return {"ontology": obo_filename}
+
+
+def put_many_batches(obo_filename, documents, **kwargs):
+    """Put more batches of vertex documents on the queue than it holds,
+    signaling the writer when done, as transform_ontology does."""
+    return put_batches(
+        obo_filename, documents, [[{"_key": f"{i:07d}"}] for i in range(100)]
+    )
+
+
+def write_one_batch(documents, futures, adb_graph, **kwargs):
+    """Get one batch from the queue, then fail, as a writer does on an
+    ArangoDB error."""
+    documents.get()
+    raise RuntimeError("Writer failed")
+
+
+class TestWriteDocuments(unittest.TestCase):
+
+    def setUp(self):
+
+        # Checkpoint to a temporary directory
+        self.checkpoint_dirpath = Path(tempfile.mkdtemp())
+        self.checkpoint_filepath = self.checkpoint_dirpath / "checkpoint.sqlite"
+        self.batches = [
+            [{"_key": "0000000", "label": "cell"}],
+            [{"_key": "0000540", "label": "neuron"}],
+        ]
+        self.written = []
+
+    def import_vertex_documents(self, batch, *args, operation=None, **kwargs):
+        self.written.append(([d["_key"] for d in batch], operation))
+
+    def write_documents(self, workers, checkpoint):
+        documents = Queue()
+        with patch.object(so, "import_vertex_documents", self.import_vertex_documents):
+            with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+                futures = [
+                    executor.submit(put_batches, obo_filename, documents, *args)
+                    for obo_filename, *args in workers
+                ]
+                write_seconds = so.write_documents(
+                    documents, futures, None, batch_size=1, checkpoint=checkpoint
+                )
+        return futures, write_seconds
+
+    def test_write_documents_completes_failed_ontology_on_rerun(self):
+
+        checkpoint = adb.open_checkpoint(self.checkpoint_filepath)
+        try:
+            # One worker fails after putting its first batch
+            futures, write_seconds = self.write_documents(
+                [
+                    ("cl.owl", self.batches[:1], RuntimeError("Worker failed")),
+                    ("uberon.owl", self.batches),
+                ],
+                checkpoint,
+            )
+            self.assertIsInstance(futures[0].exception(), RuntimeError)
+            self.assertIsNone(futures[1].exception())
+            self.assertEqual(set(write_seconds), {"cl.owl", "uberon.owl"})
+            self.assertEqual(
+                sorted(self.written),
+                [
+                    (["0000000"], "merge"),
+                    (["0000000"], "merge"),
+                    (["0000540"], "merge"),
+                ],
+            )
+
+            # Running again writes only the remaining batch
+            self.written = []
+            self.write_documents(
+                [("cl.owl", self.batches), ("uberon.owl", self.batches)],
+                checkpoint,
+            )
+            self.assertEqual(self.written, [(["0000540"], "merge")])
+
+        finally:
+            checkpoint.close()
+
+    def tearDown(self):
+
+        # Remove the temporary directory
+        shutil.rmtree(self.checkpoint_dirpath)
+
+
+class TestLoadOntologies(unittest.TestCase):
+
+    def test_load_ontologies_raises_writer_error(self):
+
+        # Workers fill the queue of one batch while the writer fails,
+        # and one worker remains pending
+        with (
+            patch.object(so, "QUEUE_SIZE", 1),
+            patch.object(so, "transform_ontology", put_many_batches),
+            patch.object(so, "write_documents", write_one_batch),
+        ):
+            with self.assertRaisesRegex(RuntimeError, "Writer failed"):
+                so.load_ontologies(
+                    ["cl.owl", "uberon.owl", "go.owl"], None, n_workers=2
+                )